@@ -0,0 +1,16 @@
+from fastapi import Header
+from typing import Optional
+
+def use_result_cache(
+    x_cache_bypass: Optional[str] = Header(default=None),
+    cache_control: Optional[str] = Header(default=None)
+) -> bool:
+    """根据请求头判断是否使用结果缓存
+
+    发送 `X-Cache-Bypass: 1` 或 `Cache-Control: no-cache` 时跳过缓存，强制重新处理。
+    """
+    if x_cache_bypass and x_cache_bypass.strip().lower() in ("1", "true", "yes"):
+        return False
+    if cache_control and "no-cache" in cache_control.lower():
+        return False
+    return True
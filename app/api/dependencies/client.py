@@ -0,0 +1,16 @@
+from fastapi import Header, Request
+from typing import Optional
+
+def client_id(
+    request: Request,
+    x_client_id: Optional[str] = Header(default=None)
+) -> str:
+    """识别调用方，用于上游调度的按客户端公平排队
+
+    优先使用 `X-Client-ID` 请求头（截断到 64 个字符），否则使用客户端地址。
+    """
+    if x_client_id and x_client_id.strip():
+        return x_client_id.strip()[:64]
+    if request.client is not None:
+        return request.client.host
+    return "anonymous"
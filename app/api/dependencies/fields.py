@@ -0,0 +1,43 @@
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from typing import Callable, Iterable, Optional, Set, Type
+
+def _select_fields(fields: Optional[str], available: Iterable[str]) -> Optional[Set[str]]:
+    if not fields:
+        return None
+    selected = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = selected - set(available)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的字段: {', '.join(sorted(unknown))}")
+    return selected or None
+
+def response_fields(
+    model: Type[BaseModel],
+    **mode_models: Type[BaseModel]
+) -> Callable[..., Optional[Set[str]]]:
+    """构建字段选择依赖：`?fields=processed_text,ai_probability` 只返回指定字段
+
+    未指定时返回 None（输出全部字段），包含响应模型中不存在的字段时返回 400。
+    mode_models 为 response_mode 取值到响应模型的映射（如 diff=ProcessDiffResult），
+    此时按请求的 response_mode 选择校验所用的模型，其余取值使用 model。
+    """
+    description = f"逗号分隔的返回字段，可选: {', '.join(model.model_fields)}"
+    for mode, mode_model in mode_models.items():
+        description += f"；response_mode={mode} 时可选: {', '.join(mode_model.model_fields)}"
+
+    if not mode_models:
+        def dependency(
+            fields: Optional[str] = Query(default=None, description=description)
+        ) -> Optional[Set[str]]:
+            return _select_fields(fields, model.model_fields)
+
+        return dependency
+
+    def mode_dependency(
+        fields: Optional[str] = Query(default=None, description=description),
+        # 接口自身声明并文档化 response_mode，这里只读取其取值
+        response_mode: str = Query(default="full", include_in_schema=False)
+    ) -> Optional[Set[str]]:
+        return _select_fields(fields, mode_models.get(response_mode, model).model_fields)
+
+    return mode_dependency
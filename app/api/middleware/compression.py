@@ -0,0 +1,93 @@
+import gzip
+import io
+import zlib
+from typing import Dict
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只协商 gzip
+    brotli = None
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """解析 Accept-Encoding 请求头，返回 {编码: q 值}"""
+    encodings = {}
+    for item in value.split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[name.strip().lower()] = q
+    return encodings
+
+class GZipResponder(IdentityResponder):
+    """gzip 压缩；流式响应的每个数据块都做一次同步刷新，NDJSON 等逐行输出不会被压缩缓冲延迟"""
+
+    content_encoding = "gzip"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, level: int):
+        super().__init__(app, minimum_size)
+        self.buffer = io.BytesIO()
+        self.gzip_file = gzip.GzipFile(mode="wb", fileobj=self.buffer, compresslevel=level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        with self.buffer, self.gzip_file:
+            await super().__call__(scope, receive, send)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        self.gzip_file.write(body)
+        if more_body:
+            self.gzip_file.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            self.gzip_file.close()
+        body = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return body
+
+class BrotliResponder(IdentityResponder):
+    """brotli 压缩，压缩比高于 gzip，适合较大的 JSON 响应"""
+
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int):
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data = self.compressor.process(body)
+        return data + (self.compressor.flush() if more_body else self.compressor.finish())
+
+class CompressionMiddleware:
+    """按 Accept-Encoding 协商 brotli 或 gzip，只压缩不小于 minimum_size 字节的响应
+
+    SSE（text/event-stream）和已设置 Content-Encoding 的响应保持原样。
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 5, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = parse_accept_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+        if brotli is not None and accepted.get("br", 0) > 0:
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+        elif accepted.get("gzip", 0) > 0:
+            responder = GZipResponder(self.app, self.minimum_size, self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
@@ -0,0 +1,20 @@
+from typing import Any, Optional, Set
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时使用标准库 json
+    orjson = None
+
+class FastJSONResponse(JSONResponse):
+    """使用 orjson 序列化的 JSON 响应（未安装 orjson 时与 JSONResponse 相同）"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+def shape_response(model: BaseModel, fields: Optional[Set[str]] = None, **kwargs) -> FastJSONResponse:
+    """只输出 fields 中的字段（为空时输出全部），直接序列化模型，跳过 response_model 的二次校验"""
+    return FastJSONResponse(model.model_dump(mode="json", include=fields), **kwargs)
@@ -1,12 +1,20 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 import asyncio
 import hashlib
+import json
+import time
+from typing import Optional
 
-from app.models.schemas import TextRequest, ProcessResult, AsyncTaskResponse
-from app.models.database import get_db, ProcessingHistory
+from app.core.config import settings
+from app.models.schemas import TextRequest, ProcessResult, AsyncTaskResponse, ProcessingHistoryPage
+from app.api.dependencies.cache import use_result_cache
 from app.services.ai_processor import ai_processor
 from app.services.celery_app import celery_app, long_text_processing
+from app.services.history_store import history_store
+from app.services.history_writer import history_writer
+from app.services.task_events import task_event_hub
+from app.services.task_progress import task_progress_store
 
 router = APIRouter()
 
@@ -17,23 +25,23 @@ async def root():
 @router.post("/process", response_model=ProcessResult)
 async def process_text(
     request: TextRequest, 
-    db: Session = Depends(get_db)
+    response: Response,
+    use_cache: bool = Depends(use_result_cache)
 ):
     """同步文本处理接口"""
     try:
         # 处理文本
-        result = await ai_processor.process_text(request.content, request.style)
+        result = await ai_processor.process_text(request.content, request.style, use_cache=use_cache)
+        response.headers["X-Cache"] = "HIT" if result.get("cache_hit") else "MISS"
         
-        # 保存处理历史
-        db_history = ProcessingHistory(
+        # 保存处理历史（后台批量写入，不阻塞请求）
+        history_writer.enqueue(
             user_id="anonymous",  # 实际项目中从JWT token获取
             original_text=request.content,
             processed_text=result["text"],
             ai_probability=result["ai_score"],
             processing_time=result["processing_time"]
         )
-        db.add(db_history)
-        db.commit()
         
         return ProcessResult(
             original_text=request.content,
@@ -73,32 +81,155 @@ async def async_process_text(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"任务提交失败: {str(e)}")
 
+# 任务结束的状态，推送后关闭事件流
+_TERMINAL_STATUSES = ("completed", "failed")
+
+def _task_status(task_id: str) -> dict:
+    """从结果后端读取任务状态"""
+    task = celery_app.AsyncResult(task_id)
+    
+    if task.state == 'PENDING':
+        return {"task_id": task_id, "status": "pending", "message": "任务等待中"}
+    elif task.state == 'SUCCESS':
+        return {
+            "task_id": task_id, 
+            "status": "completed", 
+            "result": task.result
+        }
+    elif task.state == 'FAILURE':
+        return {
+            "task_id": task_id, 
+            "status": "failed", 
+            "error": str(task.info)
+        }
+    elif task.state == 'PROGRESS':
+        # 分发到多个 worker 的长文本任务：返回已完成的段数和已完成分段的结果
+        progress = task_progress_store.get(task_id)
+        if progress is None:
+            info = task.info if isinstance(task.info, dict) else {}
+            progress = {"completed": info.get("completed", 0), "total": info.get("total", 0), "segments": []}
+        return {
+            "task_id": task_id,
+            "status": "processing",
+            "progress": {"completed": progress["completed"], "total": progress["total"]},
+            "partial_result": progress["segments"]
+        }
+    else:
+        return {"task_id": task_id, "status": task.state}
+
+def _is_unknown_task(task_id: str) -> bool:
+    """结果后端中仍为 PENDING 且没有进度记录"""
+    return (
+        _task_status(task_id)["status"] == "pending"
+        and task_progress_store.get(task_id) is None
+    )
+
 @router.get("/task/{task_id}")
 async def get_task_status(task_id: str):
     """查询异步任务状态"""
     try:
-        task = celery_app.AsyncResult(task_id)
-        
-        if task.state == 'PENDING':
-            return {"task_id": task_id, "status": "pending", "message": "任务等待中"}
-        elif task.state == 'SUCCESS':
-            return {
-                "task_id": task_id, 
-                "status": "completed", 
-                "result": task.result
-            }
-        elif task.state == 'FAILURE':
-            return {
-                "task_id": task_id, 
-                "status": "failed", 
-                "error": str(task.info)
-            }
-        else:
-            return {"task_id": task_id, "status": task.state}
-            
+        return _task_status(task_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
 
+def _sse(event: dict) -> str:
+    data = json.dumps(event, ensure_ascii=False)
+    return f"event: {event['status']}\ndata: {data}\n\n"
+
+@router.get("/task/{task_id}/events")
+async def task_events(task_id: str):
+    """
+    订阅异步任务状态（SSE）
+    
+    worker 通过 Redis pub/sub 推送状态变化和进度，任务结束时推送结果并关闭连接；
+    订阅不可用时按间隔查询结果后端，订阅可用时也每隔 task_events_repoll_heartbeats 个心跳间隔查询一次，
+    结束事件丢失时仍能关闭连接。GET /task/{task_id} 轮询接口仍然可用。
+    Celery 无法区分不存在的任务和排队中的任务（都是 PENDING）：超过 task_events_pending_timeout
+    仍为 pending 且没有进度记录时推送 not_found 并关闭连接
+    """
+    async def event_stream():
+        async with task_event_hub.subscribe(task_id) as queue:
+            # 先订阅再查询一次当前状态，避免错过订阅前已结束的任务
+            try:
+                event = await asyncio.to_thread(_task_status, task_id)
+            except Exception as e:
+                yield _sse({"task_id": task_id, "status": "error", "error": str(e)})
+                return
+            yield _sse(event)
+            pending_deadline = time.monotonic() + settings.task_events_pending_timeout
+            repoll_interval = settings.task_events_heartbeat * settings.task_events_repoll_heartbeats
+            repoll_at = time.monotonic() + repoll_interval
+            
+            while event["status"] not in _TERMINAL_STATUSES:
+                if event["status"] == "pending" and time.monotonic() >= pending_deadline:
+                    try:
+                        unknown = await asyncio.to_thread(_is_unknown_task, task_id)
+                    except Exception as e:
+                        yield _sse({"task_id": task_id, "status": "error", "error": str(e)})
+                        return
+                    if unknown:
+                        yield _sse({"task_id": task_id, "status": "not_found", "error": "任务不存在或排队超时"})
+                        return
+                    pending_deadline = time.monotonic() + settings.task_events_pending_timeout
+                if task_event_hub.connected:
+                    if time.monotonic() >= repoll_at:
+                        # 结束事件可能没有送达（客户端过慢时队列已满被丢弃、chord 失败等），定期查询结果后端
+                        repoll_at = time.monotonic() + repoll_interval
+                        try:
+                            polled = await asyncio.to_thread(_task_status, task_id)
+                        except Exception as e:
+                            yield _sse({"task_id": task_id, "status": "error", "error": str(e)})
+                            return
+                        if polled["status"] in _TERMINAL_STATUSES:
+                            yield _sse(polled)
+                            return
+                    try:
+                        event = await asyncio.wait_for(queue.get(), settings.task_events_heartbeat)
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield _sse(event)
+                    continue
+                
+                # 订阅不可用时退回轮询结果后端
+                await asyncio.sleep(settings.task_events_poll_interval)
+                previous_status = event["status"]
+                try:
+                    event = await asyncio.to_thread(_task_status, task_id)
+                except Exception as e:
+                    yield _sse({"task_id": task_id, "status": "error", "error": str(e)})
+                    return
+                if event["status"] != previous_status:
+                    yield _sse(event)
+                else:
+                    yield ": keep-alive\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # 禁止反向代理缓冲
+        }
+    )
+
+@router.get("/history", response_model=ProcessingHistoryPage)
+async def list_history(
+    limit: int = Query(20, ge=1, le=100, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    include_text: bool = Query(True, description="是否返回原文和处理结果")
+):
+    """按时间倒序分页查询处理历史（游标分页）"""
+    try:
+        return await history_store.list_history(
+            user_id="anonymous",  # 实际项目中从JWT token获取
+            limit=limit,
+            cursor=cursor,
+            include_text=include_text
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/health")
 async def health_check():
     """健康检查接口"""
@@ -8,11 +8,14 @@ load_dotenv()
 
 class Settings(BaseSettings):
     app_name: str = "AI学术润色系统"
-    debug: bool = True
+    debug: bool = False  # 开发时通过 DEBUG=true 开启（SQL 日志、热重载）
     secret_key: str = "your-secret-key-here"
     
     # 数据库配置
     database_url: str = "sqlite:///./ai_processor.db"
+    database_pool_size: int = 10  # SQLite 不使用连接池参数
+    database_max_overflow: int = 10
+    database_pool_recycle: int = 1800
     
     # Redis配置
     redis_url: str = "redis://localhost:6379"
@@ -31,6 +34,145 @@ class Settings(BaseSettings):
     max_text_length: int = 10000
     request_timeout: int = 30
     
+    # 生产服务配置（python -m app.server）
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: Optional[int] = None  # 为空时使用 CPU 核数
+    server_backlog: int = 2048
+    server_keepalive_timeout: int = 5
+    
+    # 启动预热：worker 就绪前解析 DNS 并预先建立上游连接
+    upstream_warmup_enabled: bool = True
+    upstream_warmup_connections: int = 4
+    upstream_warmup_timeout: float = 5.0
+    
+    # 响应压缩配置（按 Accept-Encoding 协商 brotli / gzip）
+    response_compression_min_bytes: int = 1024
+    response_gzip_level: int = 5
+    response_brotli_quality: int = 4
+    
+    # 差异响应模式：编辑距离超过该 token 数时退化为整段替换
+    diff_max_cost: int = 2000
+    
+    # 上游连接池配置（每个 worker 一个共享客户端）
+    upstream_max_connections: int = 100
+    upstream_max_keepalive_connections: int = 20
+    upstream_keepalive_expiry: float = 60.0
+    upstream_http2: bool = False  # 需要安装 h2
+    upstream_connect_timeout: float = 5.0
+    upstream_read_timeout: float = 30.0
+    upstream_write_timeout: float = 10.0
+    upstream_pool_timeout: float = 10.0
+    
+    # 上游容错配置：客户端限流、重试和熔断
+    upstream_rate_limit_rps: float = 20.0
+    upstream_rate_limit_tpm: int = 500000
+    upstream_rate_limit_max_wait: float = 2.0  # 限流等待超过该值直接降级
+    upstream_retry_max_attempts: int = 3
+    upstream_retry_base_delay: float = 0.2
+    upstream_retry_max_delay: float = 5.0
+    upstream_retry_deadline: float = 45.0  # 含重试在内的总时间上限
+    circuit_breaker_window: int = 20
+    circuit_breaker_min_calls: int = 5
+    circuit_breaker_failure_rate: float = 0.5
+    circuit_breaker_slow_call_seconds: float = 20.0
+    circuit_breaker_slow_call_rate: float = 0.8
+    circuit_breaker_open_seconds: float = 30.0
+    circuit_breaker_half_open_calls: int = 2
+    
+    # 对冲请求配置（默认关闭）：主请求超过近期延迟的指定分位数仍未完成时，再发出一个相同请求
+    upstream_hedging_enabled: bool = False
+    upstream_hedge_percentile: float = 0.95
+    upstream_hedge_min_delay: float = 1.0  # 对冲等待时间的下限
+    upstream_hedge_min_samples: int = 20  # 样本不足时不对冲
+    upstream_hedge_window: int = 200  # 用于计算分位数的最近延迟样本数
+    upstream_hedge_max_ratio: float = 0.05  # 对冲请求占请求总数的上限
+    upstream_hedge_model_id: Optional[str] = None  # 对冲请求使用的备用模型，为空时与主请求相同
+    upstream_hedge_base_url: Optional[str] = None  # 对冲请求使用的备用接入点
+    
+    # 模型分流配置：短文本和口语化风格走非推理快速模型，学术风格和长文本走 DeepSeek-R1
+    model_routing_enabled: bool = True
+    fast_model_id: str = "deepseek-v3-250324"
+    fast_lane_short_tokens: int = 100  # 不超过该输入 token 数的请求任何风格都走快速通道
+    fast_lane_styles: str = "casual"  # 逗号分隔，这些风格在 fast_lane_max_tokens 以内走快速通道
+    fast_lane_max_tokens: int = 1000
+    fast_lane_concurrency: int = 32
+    reasoning_lane_concurrency: int = 16
+    
+    # 上游调度配置：按优先级（interactive > batch > background）和客户端公平排队
+    scheduler_enabled: bool = True
+    scheduler_max_in_flight: int = 32  # 进行中的上游请求数上限
+    scheduler_max_in_flight_bytes: int = 512 * 1024  # 进行中的上游请求文本字节数上限
+    scheduler_interactive_reserve: int = 4  # 只留给 interactive 请求的配额
+    scheduler_deadline_interactive: float = 10.0  # 排队期限（秒），超过后降级
+    scheduler_deadline_batch: float = 60.0  # 超过后降级
+    scheduler_deadline_background: float = 300.0  # 超过后放弃，任务失败
+    
+    # 结果缓存配置（进程内 LRU + 可选 Redis）
+    result_cache_enabled: bool = True
+    result_cache_max_entries: int = 2048
+    result_cache_max_bytes: int = 64 * 1024 * 1024
+    result_cache_ttl: int = 3600
+    result_cache_redis_enabled: bool = False
+    
+    # 批量处理配置
+    batch_max_items: int = 10
+    batch_stream_max_items: int = 100  # 流式（NDJSON）模式下的上限
+    batch_concurrency: int = 4
+    detect_batch_max_items: int = 100
+    
+    # 长文本分段处理配置
+    long_text_max_length: int = 200000
+    long_text_chunk_tokens: int = 800  # 每个分段的输入 token 预算
+    long_text_overlap_sentences: int = 1  # 作为只读上文的前文句子数
+    long_text_concurrency: int = 4
+
+    # 单次调用的 token 预算（按输入估算动态设置 max_tokens）
+    model_context_tokens: int = 65536  # 模型上下文窗口（输入 + 输出）
+    output_tokens_min: int = 256
+    output_tokens_max: int = 8192
+    output_token_margin: int = 64  # 在按风格估算的输出长度之外额外预留
+
+    # 文档会话配置（段落级增量润色）
+    document_session_ttl: int = 86400
+    document_session_max_documents: int = 1000  # 进程内保留的文档数
+    document_session_redis_enabled: bool = True  # 通过 Redis 在多个 worker 间共享会话，不可达时只保存在进程内
+    
+    # Celery worker 配置（threads 池可在同一事件循环中并发执行多个任务）
+    celery_worker_pool: str = "prefork"
+    celery_worker_concurrency: Optional[int] = None  # 为空时使用 CPU 核数
+    celery_worker_prefetch_multiplier: int = 4
+    celery_task_timeout: float = 600.0
+    
+    # 长文本异步任务分发：分段数达到阈值时以 chord 分发到多个 worker
+    long_text_fanout_enabled: bool = True
+    long_text_fanout_min_chunks: int = 8
+    long_text_fanout_chunks_per_task: int = 4  # 每个子任务处理的分段数
+    long_text_fanout_progress_ttl: int = 86400  # 进度和部分结果在 Redis 中的保留时间（秒）
+    
+    # Celery 消息与结果存储：msgpack + 压缩，大消息体存入 blob 存储只传引用
+    celery_serializer: str = "compact"  # compact 或 json
+    celery_payload_compress_min_bytes: int = 1024
+    celery_payload_inline_max_bytes: int = 64 * 1024  # 压缩后超过该值时存入 blob 存储
+    celery_payload_max_bytes: int = 16 * 1024 * 1024  # 压缩后超过该值拒绝编码（任务失败）
+    celery_blob_ttl: int = 86400  # 不应短于 celery_result_expires 和任务最长排队时间
+    celery_result_expires: int = 6 * 3600  # 任务结果在 Redis 中的保留时间（秒）
+    celery_result_max_count: int = 10000  # 保留的任务结果数上限，超过时删除最早的结果
+    celery_result_max_bytes: int = 256 * 1024 * 1024  # 任务结果总大小上限（按 JSON 大小估算）
+
+    # 任务事件推送配置（Redis pub/sub → SSE）
+    task_events_heartbeat: float = 15.0  # SSE 心跳间隔
+    task_events_poll_interval: float = 2.0  # 订阅不可用时退回轮询的间隔
+    task_events_queue_size: int = 100
+    task_events_repoll_heartbeats: int = 4  # 订阅可用时每隔若干个心跳间隔查询一次结果后端，避免错过结束事件
+    task_events_pending_timeout: float = 300.0  # 任务一直为 pending 且没有进度记录时关闭事件流（任务 ID 不存在或排队过久）
+
+    # 处理历史写入配置（后台批量写入）
+    history_batch_size: int = 100
+    history_flush_interval: float = 0.5  # 未攒满一批时的最长等待时间
+    history_queue_max_size: int = 10000  # 队列满时丢弃新记录，不阻塞请求
+    history_drain_timeout: float = 10.0  # 关闭时排空队列的时间上限
+
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -47,9 +189,3 @@ class Settings(BaseSettings):
 
 # 创建全局设置实例
 settings = Settings()
-
-# 调试输出
-if settings.debug:
-    print(f"DEBUG: ARK API Key loaded: {'Yes' if settings.ark_api_key else 'No'}")
-    print(f"DEBUG: ARK Base URL: {settings.ark_base_url}")
-    print(f"DEBUG: DeepSeek Model ID: {settings.deepseek_model_id}")
@@ -5,7 +5,10 @@ from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.api.v1.endpoints import router as api_v1_router
-from app.models.database import create_tables
+from app.models.database import async_engine, create_tables
+from app.services.history_writer import history_writer
+from app.services.result_cache import result_cache
+from app.services.task_events import task_event_hub
 
 # 配置日志
 logging.basicConfig(
@@ -20,9 +23,14 @@ async def lifespan(app: FastAPI):
     # 启动时创建数据库表
     logger.info("创建数据库表...")
     create_tables()
+    await history_writer.start()
     logger.info("应用启动完成")
     yield
-    # 关闭时的清理工作
+    # 关闭时的清理工作：先排空历史写入队列
+    await history_writer.stop()
+    await async_engine.dispose()
+    await result_cache.close()
+    await task_event_hub.close()
     logger.info("应用关闭")
 
 # 创建FastAPI应用
@@ -1,15 +1,39 @@
 # app/main_production.py
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Path, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import asyncio
+import json
 import logging
 import time
 import uuid
 from contextlib import asynccontextmanager
+from typing import Literal, Optional, Set
 
 from app.core.config import settings
+from app.api.dependencies.cache import use_result_cache
+from app.api.dependencies.client import client_id as client_identity
+from app.api.dependencies.fields import response_fields
+from app.api.middleware.compression import CompressionMiddleware
+from app.api.responses import FastJSONResponse, shape_response
+from app.services.ai_detector import ai_detector
 from app.services.deepseek_processor import deepseek_processor
-from app.models.schemas import TextRequest, ProcessResult
+from app.services.document_sessions import document_polisher, document_session_store
+from app.services.hedging import hedger
+from app.services.long_text_pipeline import long_text_pipeline
+from app.services.metrics import metrics
+from app.services.model_router import model_router
+from app.services.resilience import upstream_guard
+from app.services.result_cache import result_cache
+from app.services.scheduler import BATCH, PRIORITIES, scheduler
+from app.services.single_flight import single_flight
+from app.services.token_budget import ContextBudgetExceeded, plan_budget
+from app.services.upstream_client import upstream_client
+from app.utils.text_diff import diff_text
+from app.models.schemas import (
+    TextRequest, ProcessResult, ProcessDiffResult, LongTextRequest, LongProcessResult,
+    DocumentProcessResult, AIDetectionBatchRequest, AIDetectionBatchResult, AIDetectionResult
+)
 
 # 配置日志
 logging.basicConfig(
@@ -22,11 +46,26 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动时检查
+    app.state.ready = False
     logger.info("🚀 AI学术润色系统启动")
     logger.info(f"✅ 火山引擎 API: {'已配置' if settings.ark_api_key else '未配置'}")
     logger.info(f"✅ 模型: {settings.deepseek_model_id}")
+    deepseek_processor.log_config()
+    await upstream_client.start()
+    # 预热完成前 worker 不开始接受请求，避免扩容后的首批请求承担 DNS 和 TLS 握手延迟
+    if settings.upstream_warmup_enabled and deepseek_processor.has_valid_key:
+        await upstream_client.warm_up(
+            deepseek_processor.base_url,
+            settings.upstream_warmup_connections,
+            settings.upstream_warmup_timeout
+        )
+    app.state.ready = True
     yield
     # 关闭时的清理工作
+    app.state.ready = False
+    await upstream_client.close()
+    await result_cache.close()
+    await document_session_store.close()
     logger.info("🔒 应用关闭")
 
 # 创建FastAPI应用
@@ -36,9 +75,18 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
+# 响应压缩（按 Accept-Encoding 协商 brotli / gzip）
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.response_compression_min_bytes,
+    gzip_level=settings.response_gzip_level,
+    brotli_quality=settings.response_brotli_quality
+)
+
 # CORS中间件配置（适配所有前端）
 app.add_middleware(
     CORSMiddleware,
@@ -48,6 +96,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 运行状态指标（输出 /metrics 时读取）
+def _pool_connections() -> dict:
+    stats = upstream_client.stats()
+    return {
+        ("active",): stats["active_connections"],
+        ("idle",): stats["idle_connections"],
+        ("queued",): stats["queued_requests"]
+    }
+
+metrics.gauge("upstream_pool_connections", "上游连接池连接数", _pool_connections, labelnames=("state",))
+metrics.gauge("upstream_in_flight_requests", "进行中的上游请求数", lambda: upstream_client.in_flight)
+metrics.gauge(
+    "circuit_breaker_open", "熔断器是否处于打开或半开状态",
+    lambda: 0 if upstream_guard.breaker.state == "closed" else 1
+)
+metrics.gauge(
+    "model_lane_in_flight", "各模型通道进行中的上游调用数",
+    lambda: {(name,): lane.in_flight for name, lane in model_router.lanes.items()}, ("lane",)
+)
+metrics.gauge(
+    "scheduler_queue_depth", "上游调度器中各优先级排队的请求数",
+    lambda: {(priority,): scheduler.queue_depth(priority) for priority in PRIORITIES}, ("priority",)
+)
+metrics.gauge("scheduler_in_flight", "经调度器放行、进行中的上游请求数", lambda: scheduler.in_flight)
+metrics.gauge("single_flight_in_flight", "进行中的合并请求数", lambda: single_flight.stats()["in_flight"])
+metrics.gauge("result_cache_entries", "进程内结果缓存条目数", lambda: result_cache.stats()["entries"])
+
 # 请求日志中间件
 @app.middleware("http")
 async def log_requests(request, call_next):
@@ -61,6 +136,12 @@ async def log_requests(request, call_next):
     process_time = time.time() - start_time
     logger.info(f"✅ 响应 [{request_id}] {response.status_code} - {process_time:.2f}s")
     
+    # 使用路由模板作为标签，避免路径参数导致标签数量无限增长
+    route = request.scope.get("route")
+    route_path = getattr(route, "path", "unmatched")
+    metrics.request_latency.observe(process_time, method=request.method, route=route_path)
+    metrics.requests.inc(method=request.method, route=route_path, status=response.status_code)
+    
     response.headers["X-Request-ID"] = request_id
     return response
 
@@ -88,6 +169,33 @@ async def health_check():
         "version": "1.0.0"
     }
 
+# 就绪检查（负载均衡和自动扩容探针使用）
+@app.get("/api/v1/ready")
+async def readiness_check():
+    if not getattr(app.state, "ready", False):
+        raise HTTPException(status_code=503, detail="服务启动中")
+    return {"status": "ready", "timestamp": int(time.time())}
+
+# 运行状态统计
+@app.get("/api/v1/stats")
+async def get_stats():
+    return {
+        "upstream_pool": upstream_client.stats(),
+        "result_cache": result_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "upstream_guard": upstream_guard.stats(),
+        "hedging": hedger.stats(),
+        "model_router": model_router.stats(),
+        "scheduler": scheduler.stats(),
+        "document_sessions": document_session_store.stats(),
+        "timestamp": int(time.time())
+    }
+
+# Prometheus 指标
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # 获取支持的风格
 @app.get("/api/v1/styles")
 async def get_styles():
@@ -118,7 +226,22 @@ async def get_styles():
 
 # 主要文本处理接口
 @app.post("/api/v1/process", response_model=ProcessResult)
-async def process_text(request: TextRequest):
+async def process_text(
+    request: TextRequest,
+    http_response: Response,
+    use_cache: bool = Depends(use_result_cache),
+    client_id: str = Depends(client_identity),
+    fields: Optional[Set[str]] = Depends(response_fields(ProcessResult, diff=ProcessDiffResult)),
+    response_mode: Literal["full", "diff"] = Query(
+        default="full", description="full 返回完整文本，diff 只返回相对原文的编辑操作和改动统计"
+    )
+):
+    """
+    文本处理接口
+    
+    可通过 `?fields=processed_text,ai_probability` 只返回需要的字段，省去回传原文和思考过程；
+    `?response_mode=diff` 时返回编辑操作（原文中的字符偏移），客户端按顺序应用到原文即可得到润色结果
+    """
     # 确保风格不为空
     style = request.style or "academic"
     logger.info(f"🔄 处理请求: {len(request.content)}字符, 风格: {style}")
@@ -137,7 +260,19 @@ async def process_text(request: TextRequest):
             style = "academic"
         
         # 调用AI处理
-        result = await deepseek_processor.process_text(request.content, style)
+        try:
+            result = await deepseek_processor.process_text(
+                request.content, style, use_cache=use_cache,
+                preference=request.preference, client_id=client_id
+            )
+        except ContextBudgetExceeded as e:
+            # 超出单次调用的 token 上限时改走长文本分段，而不是发出一定会被截断的请求
+            logger.info(f"✂️ {e}，改用长文本分段处理")
+            result = await long_text_pipeline.process_text(
+                request.content, style, use_cache=use_cache,
+                preference=request.preference, client_id=client_id
+            )
+        http_response.headers["X-Cache"] = "HIT" if result.get("cache_hit") else "MISS"
         
         # 验证结果结构
         required_keys = ["text", "ai_score", "processing_time"]
@@ -172,7 +307,21 @@ async def process_text(request: TextRequest):
         if logger.isEnabledFor(logging.DEBUG):
             logger.debug(f"完整响应: {response.json(exclude={'original_text'})[:200]}...")
         
-        return response
+        if response_mode == "diff":
+            diff = await asyncio.to_thread(
+                diff_text, response.original_text, response.processed_text, settings.diff_max_cost
+            )
+            response = ProcessDiffResult(
+                edits=diff["edits"],
+                stats=diff["stats"],
+                reasoning_content=response.reasoning_content,
+                ai_probability=response.ai_probability,
+                processing_time=response.processing_time,
+                style_used=response.style_used,
+                api_used=response.api_used
+            )
+        
+        return shape_response(response, fields, headers={"X-Cache": http_response.headers["X-Cache"]})
         
     except HTTPException:
         raise  # 直接抛出已有的HTTP异常
@@ -184,81 +333,290 @@ async def process_text(request: TextRequest):
             detail=f"处理失败: {str(e)}"
         )
 
+# 流式文本处理接口（SSE）
+@app.post("/api/v1/process/stream")
+async def process_text_stream(request: TextRequest, client_id: str = Depends(client_identity)):
+    """
+    流式文本处理接口
+    
+    以 Server-Sent Events 逐步推送思考过程（reasoning）和润色结果（content），
+    最后推送包含 AI 概率、处理时间和所用 API 的 done 事件
+    """
+    style = request.style or "academic"
+    logger.info(f"🌊 流式处理请求: {len(request.content)}字符, 风格: {style}")
+    
+    # 流式输出无法中途切换为分段处理，超出单次调用上限时直接拒绝
+    try:
+        plan_budget(request.content, style)
+    except ContextBudgetExceeded as e:
+        raise HTTPException(status_code=413, detail=f"{e}，请使用 /api/v1/process/long")
+    
+    async def event_stream():
+        async for event in deepseek_processor.stream_text(
+            request.content, style, request.preference, client_id=client_id
+        ):
+            data = json.dumps(event["data"], ensure_ascii=False)
+            yield f"event: {event['event']}\ndata: {data}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # 禁止反向代理缓冲
+        }
+    )
+
+# 长文本分段处理接口
+@app.post("/api/v1/process/long", response_model=LongProcessResult)
+async def process_long_text(
+    request: LongTextRequest,
+    use_cache: bool = Depends(use_result_cache),
+    client_id: str = Depends(client_identity),
+    fields: Optional[Set[str]] = Depends(response_fields(LongProcessResult))
+):
+    """
+    长文本处理接口
+    
+    按段落和句子切分为多个分段并行润色，按原顺序拼接，突破单次请求的长度限制；
+    分段以 batch 优先级排队，不挤占交互请求的上游配额
+    """
+    style = request.style or "academic"
+    logger.info(f"📚 长文本处理请求: {len(request.content)}字符, 风格: {style}")
+    
+    try:
+        result = await long_text_pipeline.process_text(
+            request.content, style, use_cache=use_cache, preference=request.preference,
+            priority=BATCH, client_id=client_id
+        )
+    except Exception as e:
+        logger.exception("长文本处理失败")
+        raise HTTPException(status_code=500, detail=f"长文本处理失败: {str(e)}")
+    
+    logger.info(
+        f"✅ 长文本处理完成 - {len(result['chunks'])}段, 耗时: {result['processing_time']:.2f}s"
+    )
+    
+    response = LongProcessResult(
+        processed_text=result["text"],
+        ai_probability=result["ai_score"],
+        processing_time=result["processing_time"],
+        style_used=style,
+        api_used=result["api_used"],
+        chunk_count=len(result["chunks"]),
+        chunks=result["chunks"]
+    )
+    return shape_response(response, fields)
+
+# 文档ID：字母、数字、下划线和连字符
+DOCUMENT_ID = Path(..., pattern=r"^[A-Za-z0-9_-]{1,64}$", description="文档ID")
+
+# 文档增量润色接口
+@app.post("/api/v1/documents/{document_id}/process", response_model=DocumentProcessResult)
+async def process_document(
+    request: LongTextRequest,
+    document_id: str = DOCUMENT_ID,
+    use_cache: bool = Depends(use_result_cache),
+    client_id: str = Depends(client_identity),
+    fields: Optional[Set[str]] = Depends(response_fields(DocumentProcessResult))
+):
+    """
+    文档增量润色接口
+    
+    同一 document_id 再次提交时只重新润色发生变化的段落（相邻段落作为只读上下文），
+    其余段落复用上次的结果；响应中的 recomputed 列出本次重新润色的段落。
+    会话通过 Redis 在 worker 间共享；Redis 不可用时只保存在各 worker 进程内，
+    多 worker 部署需要按 document_id 粘性路由，否则再次提交会全部重新润色
+    """
+    style = request.style or "academic"
+    logger.info(f"📝 文档处理请求: {document_id}, {len(request.content)}字符, 风格: {style}")
+    
+    try:
+        result = await document_polisher.process_document(
+            document_id, request.content, style, use_cache=use_cache,
+            preference=request.preference, client_id=client_id
+        )
+    except Exception as e:
+        logger.exception("文档处理失败")
+        raise HTTPException(status_code=500, detail=f"文档处理失败: {str(e)}")
+    
+    logger.info(
+        f"✅ 文档处理完成 - 重新润色 {len(result['recomputed'])}/{len(result['paragraphs'])}段, "
+        f"耗时: {result['processing_time']:.2f}s"
+    )
+    
+    response = DocumentProcessResult(
+        document_id=document_id,
+        processed_text=result["text"],
+        ai_probability=result["ai_score"],
+        processing_time=result["processing_time"],
+        style_used=style,
+        api_used=result["api_used"],
+        paragraph_count=len(result["paragraphs"]),
+        recomputed=result["recomputed"],
+        paragraphs=result["paragraphs"]
+    )
+    return shape_response(response, fields)
+
+# 删除文档会话
+@app.delete("/api/v1/documents/{document_id}")
+async def delete_document(document_id: str = DOCUMENT_ID):
+    if not await document_session_store.delete(document_id):
+        raise HTTPException(status_code=404, detail="文档不存在")
+    return {"document_id": document_id, "deleted": True}
+
 # AI检测接口
-@app.post("/api/v1/detect")
+@app.post("/api/v1/detect", response_model=AIDetectionResult)
 async def detect_ai_text(request: TextRequest):
     """
     AI文本检测接口
     
-    分析文本的AI生成概率
+    使用本地检测引擎分析文本的AI生成概率，返回整篇和逐句结果，不调用上游API
     """
     logger.info(f"🔍 AI检测请求: {len(request.content)}字符")
     
     try:
-        # 这里可以集成专门的AI检测模型
-        # 暂时使用简单的检测逻辑
-        result = await deepseek_processor.process_text(request.content, "academic")
-        
-        return {
-            "content": request.content,
-            "ai_probability": result["ai_score"],
-            "confidence_level": "medium" if result["ai_score"] > 0.5 else "low",
-            "analysis": {
-                "pattern_score": result["ai_score"] * 0.6,
-                "complexity_score": result["ai_score"] * 0.4,
-                "semantic_score": result["ai_score"] * 0.5
-            },
-            "processing_time": result["processing_time"]
-        }
-        
+        return ai_detector.detect(request.content)
     except Exception as e:
         logger.error(f"❌ 检测失败: {str(e)}")
         raise HTTPException(status_code=500, detail="AI检测失败")
 
-# 批量处理接口
-@app.post("/api/v1/batch")
-async def batch_process(
-    requests: list[TextRequest], 
-    background_tasks: BackgroundTasks
-):
+# 批量AI检测接口
+@app.post("/api/v1/detect/batch", response_model=AIDetectionBatchResult)
+async def detect_ai_text_batch(request: AIDetectionBatchRequest):
     """
-    批量文本处理接口
+    批量AI文本检测接口
     
-    支持同时处理多个文本
+    所有文本的所有句子在一次向量化计算中完成打分
     """
-    if len(requests) > 10:
-        raise HTTPException(status_code=400, detail="批量处理最多支持10个文本")
+    if len(request.texts) > settings.detect_batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"批量检测最多支持{settings.detect_batch_max_items}个文本"
+        )
     
-    logger.info(f"📦 批量处理: {len(requests)}个文本")
+    logger.info(f"🔍 批量AI检测: {len(request.texts)}个文本")
     
+    start_time = time.time()
     try:
-        results = []
-        for i, req in enumerate(requests):
-            logger.info(f"🔄 处理第{i+1}个文本...")
-            style = req.style or "academic"
-            result = await deepseek_processor.process_text(req.content, style)
-            
-            results.append({
-                "index": i,
+        results = ai_detector.detect_batch([item.content for item in request.texts])
+    except Exception as e:
+        logger.error(f"❌ 批量检测失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="批量AI检测失败")
+    
+    return {
+        "total_count": len(results),
+        "processing_time": time.time() - start_time,
+        "results": results
+    }
+
+# 批量处理接口
+async def _process_batch_item(
+    index: int,
+    req: TextRequest,
+    semaphore: asyncio.Semaphore,
+    use_cache: bool,
+    client_id: str
+) -> dict:
+    """在并发限制内处理单个批量文本，失败只影响该条目"""
+    style = req.style or "academic"
+    queued_at = time.perf_counter()
+    async with semaphore:
+        metrics.queue_wait.observe(time.perf_counter() - queued_at, queue="batch")
+        logger.info(f"🔄 处理第{index+1}个文本...")
+        try:
+            result = await deepseek_processor.process_text(
+                req.content, style, use_cache=use_cache, preference=req.preference,
+                priority=BATCH, client_id=client_id
+            )
+            return {
+                "index": index,
+                "status": "success",
                 "original_text": req.content,
                 "processed_text": result["text"],
                 "ai_probability": result["ai_score"],
                 "processing_time": result["processing_time"],
+                "api_used": result.get("api_used", "unknown"),
                 "style": req.style
-            })
-        
-        total_time = sum(r["processing_time"] for r in results)
-        logger.info(f"✅ 批量处理完成: {total_time:.2f}s")
-        
-        return {
-            "total_count": len(results),
-            "total_time": total_time,
-            "results": results
-        }
+            }
+        except Exception as e:
+            logger.error(f"❌ 第{index+1}个文本处理失败: {str(e)}")
+            return {
+                "index": index,
+                "status": "failed",
+                "original_text": req.content,
+                "error": f"处理失败: {str(e)}",
+                "style": req.style
+            }
+
+def _batch_summary(results: list[dict], wall_time: float) -> dict:
+    succeeded = [r for r in results if r["status"] == "success"]
+    return {
+        "total_count": len(results),
+        "success_count": len(succeeded),
+        "failed_count": len(results) - len(succeeded),
+        "total_time": sum(r["processing_time"] for r in succeeded),
+        "wall_time": wall_time
+    }
+
+@app.post("/api/v1/batch")
+async def batch_process(
+    requests: list[TextRequest], 
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    stream: bool = False,
+    use_cache: bool = Depends(use_result_cache),
+    client_id: str = Depends(client_identity)
+):
+    """
+    批量文本处理接口
+    
+    多个文本在并发上限（settings.batch_concurrency）内同时处理，单条失败不影响其他条目；
+    上游调用以 batch 优先级排队，同一客户端的批量条目与其他客户端轮流获得配额。
+    传入 stream=true 或 Accept: application/x-ndjson 时，每条结果完成后立即以 NDJSON 行输出，
+    最后一行为汇总信息
+    """
+    stream = stream or "application/x-ndjson" in http_request.headers.get("accept", "")
+    max_items = settings.batch_stream_max_items if stream else settings.batch_max_items
+    if len(requests) > max_items:
+        raise HTTPException(status_code=400, detail=f"批量处理最多支持{max_items}个文本")
+    
+    logger.info(f"📦 批量处理: {len(requests)}个文本{'（流式）' if stream else ''}")
+    
+    start_time = time.time()
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+    tasks = [
+        asyncio.create_task(_process_batch_item(i, req, semaphore, use_cache, client_id))
+        for i, req in enumerate(requests)
+    ]
+    
+    if stream:
+        async def ndjson_stream():
+            results = []
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    item = await next_done
+                    results.append(item)
+                    yield json.dumps({"type": "result", **item}, ensure_ascii=False) + "\n"
+                
+                summary = _batch_summary(results, time.time() - start_time)
+                logger.info(f"✅ 批量处理完成: {summary['wall_time']:.2f}s")
+                yield json.dumps({"type": "summary", **summary}, ensure_ascii=False) + "\n"
+            finally:
+                # 客户端断开时取消尚未完成的条目
+                for task in tasks:
+                    task.cancel()
         
-    except Exception as e:
-        logger.error(f"❌ 批量处理失败: {str(e)}")
-        raise HTTPException(status_code=500, detail="批量处理失败")
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+    
+    results = await asyncio.gather(*tasks)
+    summary = _batch_summary(results, time.time() - start_time)
+    logger.info(
+        f"✅ 批量处理完成: {summary['wall_time']:.2f}s, "
+        f"成功 {summary['success_count']}/{summary['total_count']}"
+    )
+    
+    return {**summary, "results": results}
 
 # 错误处理
 @app.exception_handler(HTTPException)
@@ -288,10 +646,6 @@ async def general_exception_handler(request, exc):
     )
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "app.main_production:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=settings.debug
-    )
\ No newline at end of file
+    # 生产环境使用 python -m app.server（多 worker）
+    from app.server import main
+    main()
\ No newline at end of file
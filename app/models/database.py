@@ -1,25 +1,108 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, Float, DateTime
+import logging
+from sqlalchemy import (
+    create_engine, event, inspect, insert, select, update, bindparam,
+    Column, Integer, String, Float, DateTime, ForeignKey, Index, LargeBinary, MetaData, Table
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from datetime import datetime
+from typing import Optional
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+# 同步驱动 → 异步驱动
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def async_database_url(url: str) -> str:
+    """把 settings.database_url 转换为对应的异步驱动 URL（已指定驱动时原样返回）"""
+    parsed = make_url(url)
+    if "+" in parsed.drivername:
+        return url
+    drivername = _ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+def _engine_options(url: str) -> dict:
+    if _is_sqlite(url):
+        return {}
+    return {
+        "pool_size": settings.database_pool_size,
+        "max_overflow": settings.database_max_overflow,
+        "pool_recycle": settings.database_pool_recycle,
+        "pool_pre_ping": True,
+    }
+
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    # WAL 模式下读写互不阻塞，写入只需在提交时同步
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
 # 数据库引擎
-engine = create_engine(settings.database_url, echo=settings.debug)
+engine = create_engine(settings.database_url, echo=settings.debug, **_engine_options(settings.database_url))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步数据库引擎（请求路径上的写入使用，不阻塞事件循环）
+async_engine = create_async_engine(
+    async_database_url(settings.database_url),
+    echo=settings.debug,
+    **_engine_options(settings.database_url)
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+if _is_sqlite(settings.database_url):
+    event.listen(engine, "connect", _enable_sqlite_wal)
+    event.listen(async_engine.sync_engine, "connect", _enable_sqlite_wal)
+
 Base = declarative_base()
 
+class TextBlob(Base):
+    """按内容哈希寻址的文本存储，相同文本只存一份"""
+    __tablename__ = "text_blobs"
+    
+    hash = Column(String(64), primary_key=True)  # UTF-8 文本的 SHA-256
+    codec = Column(String(8), nullable=False)  # raw / zlib / zstd
+    size = Column(Integer, nullable=False)  # 原文字节数
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class ProcessingHistory(Base):
     __tablename__ = "processing_history"
+    __table_args__ = (
+        # 按用户、时间倒序的游标分页
+        Index("ix_processing_history_user_created", "user_id", "created_at", "id"),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, index=True)
-    original_text = Column(Text)
-    processed_text = Column(Text)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String, nullable=False)
+    original_hash = Column(String(64), ForeignKey("text_blobs.hash"), nullable=False)
+    processed_hash = Column(String(64), ForeignKey("text_blobs.hash"), nullable=False)
     ai_probability = Column(Float)
     processing_time = Column(Float)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+def insert_ignore(table, dialect: Optional[str] = None):
+    """忽略主键冲突的 INSERT（内容寻址写入时重复内容直接跳过），dialect 默认取异步引擎的方言"""
+    dialect = dialect or async_engine.dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(table).prefix_with("IGNORE")
+    return dialect_insert(table).on_conflict_do_nothing()
 
 # 依赖注入：获取数据库会话
 def get_db():
@@ -29,6 +112,96 @@ def get_db():
     finally:
         db.close()
 
+# 旧版历史表每次回填的行数
+_MIGRATE_BATCH_SIZE = 500
+
+def migrate_history_table(connection):
+    """把旧版 processing_history（original_text / processed_text 正文列）升级为按哈希引用 text_blobs
+
+    create_all 不会修改已存在的表：旧表先加上哈希列，按批把正文写入 text_blobs 并回填哈希，
+    再删除正文列、补上非空约束和外键（SQLite 由 Alembic batch 模式重建表）。已是新结构时不做任何操作。
+    """
+    inspector = inspect(connection)
+    if "processing_history" not in inspector.get_table_names():
+        return
+    columns = {column["name"] for column in inspector.get_columns("processing_history")}
+    if "original_text" not in columns:
+        return
+
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    from app.services.history_store import history_store
+
+    ops = Operations(MigrationContext.configure(connection))
+    if "original_hash" not in columns:
+        with ops.batch_alter_table("processing_history") as batch:
+            batch.add_column(Column("original_hash", String(64)))
+            batch.add_column(Column("processed_hash", String(64)))
+
+    table = Table("processing_history", MetaData(), autoload_with=connection)
+    migrated = 0
+    while True:
+        rows = connection.execute(
+            select(
+                table.c.id, table.c.user_id, table.c.original_text, table.c.processed_text,
+                table.c.ai_probability, table.c.processing_time, table.c.created_at
+            ).where(table.c.original_hash.is_(None)).limit(_MIGRATE_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        now = datetime.utcnow()
+        blobs, prepared = history_store.prepare([
+            {
+                "user_id": row.user_id,
+                "original_text": row.original_text or "",
+                "processed_text": row.processed_text or "",
+                "ai_probability": row.ai_probability,
+                "processing_time": row.processing_time,
+                "created_at": row.created_at or now
+            }
+            for row in rows
+        ])
+        connection.execute(insert_ignore(TextBlob.__table__, connection.dialect.name), blobs)
+        connection.execute(
+            update(table).where(table.c.id == bindparam("row_id")).values(
+                user_id=bindparam("new_user_id"),
+                original_hash=bindparam("new_original_hash"),
+                processed_hash=bindparam("new_processed_hash"),
+                created_at=bindparam("new_created_at")
+            ),
+            [
+                {
+                    "row_id": row.id,
+                    "new_user_id": row.user_id or "anonymous",
+                    "new_original_hash": item["original_hash"],
+                    "new_processed_hash": item["processed_hash"],
+                    "new_created_at": item["created_at"]
+                }
+                for row, item in zip(rows, prepared)
+            ]
+        )
+        migrated += len(rows)
+
+    with ops.batch_alter_table("processing_history") as batch:
+        batch.drop_column("original_text")
+        batch.drop_column("processed_text")
+        batch.alter_column("user_id", existing_type=String, nullable=False)
+        batch.alter_column("created_at", existing_type=DateTime, nullable=False)
+        batch.alter_column("original_hash", existing_type=String(64), nullable=False)
+        batch.alter_column("processed_hash", existing_type=String(64), nullable=False)
+        batch.create_foreign_key(
+            "fk_processing_history_original_hash", "text_blobs", ["original_hash"], ["hash"]
+        )
+        batch.create_foreign_key(
+            "fk_processing_history_processed_hash", "text_blobs", ["processed_hash"], ["hash"]
+        )
+    logger.info(f"🗄️ 历史表已升级为按哈希存储正文: 回填 {migrated} 条记录")
+
 # 创建所有表
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        migrate_history_table(connection)
+        # 升级后的旧表没有由 create_all 创建的分页索引
+        for index in ProcessingHistory.__table__.indexes:
+            index.create(connection, checkfirst=True)
@@ -1,10 +1,14 @@
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional, Literal
 from datetime import datetime
+from app.core.config import settings
 
 class TextRequest(BaseModel):
     content: str = Field(..., min_length=1, max_length=10000, description="要处理的文本内容")
     style: Optional[str] = Field(default="academic", description="润色风格")
+    preference: Literal["auto", "quality", "speed"] = Field(
+        default="auto", description="模型偏好：quality 使用推理模型，speed 使用快速模型，auto 自动选择"
+    )
     
     @field_validator('style')
     @classmethod
@@ -30,6 +34,75 @@ class ProcessResult(BaseModel):
     style_used: Optional[str] = Field(None, description="使用的润色风格")
     api_used: Optional[str] = Field(None, description="使用的API服务")
 
+class EditOperation(BaseModel):
+    op: Literal["insert", "delete", "replace"] = Field(..., description="操作类型")
+    start: int = Field(..., ge=0, description="在原文中的起始偏移（Unicode 字符）")
+    end: int = Field(..., ge=0, description="在原文中的结束偏移（不含）")
+    text: str = Field("", description="插入或替换后的文本")
+
+class DiffStats(BaseModel):
+    original_length: int = Field(..., description="原文字符数")
+    processed_length: int = Field(..., description="润色结果字符数")
+    edit_count: int = Field(..., description="编辑操作数")
+    inserted_chars: int = Field(..., description="新增字符数")
+    deleted_chars: int = Field(..., description="删除字符数")
+    unchanged_chars: int = Field(..., description="保留字符数")
+    similarity: float = Field(..., ge=0.0, le=1.0, description="相似度（2 × 保留字符数 / 两文本总字符数）")
+    exact: bool = Field(..., description="差异过大时退化为整段替换，此时为 False")
+
+class ProcessDiffResult(BaseModel):
+    edits: list[EditOperation] = Field(..., description="按顺序应用到原文即可得到润色结果的编辑操作")
+    stats: DiffStats = Field(..., description="改动统计")
+    reasoning_content: Optional[str] = Field(None, description="AI思考过程")
+    ai_probability: float = Field(..., ge=0.0, le=1.0, description="AI生成概率")
+    processing_time: float = Field(..., ge=0.0, description="处理时间（秒）")
+    style_used: Optional[str] = Field(None, description="使用的润色风格")
+    api_used: Optional[str] = Field(None, description="使用的API服务")
+
+class LongTextRequest(TextRequest):
+    content: str = Field(
+        ...,
+        min_length=1,
+        max_length=settings.long_text_max_length,
+        description="要分段处理的长文本内容"
+    )
+
+class ChunkReport(BaseModel):
+    index: int = Field(..., description="分段序号")
+    input_chars: int = Field(..., description="分段输入字符数")
+    output_chars: int = Field(..., description="分段输出字符数")
+    estimated_tokens: int = Field(..., description="分段估算 token 数")
+    processing_time: float = Field(..., ge=0.0, description="分段处理时间（秒）")
+    api_used: Optional[str] = Field(None, description="使用的API服务")
+    cache_hit: bool = Field(False, description="是否命中结果缓存")
+
+class LongProcessResult(BaseModel):
+    processed_text: str = Field(..., description="拼接后的处理结果")
+    ai_probability: float = Field(..., ge=0.0, le=1.0, description="AI生成概率（按分段长度加权）")
+    processing_time: float = Field(..., ge=0.0, description="总处理时间（秒）")
+    style_used: Optional[str] = Field(None, description="使用的润色风格")
+    api_used: Optional[str] = Field(None, description="使用的API服务")
+    chunk_count: int = Field(..., description="分段数量")
+    chunks: list[ChunkReport] = Field(..., description="各分段处理情况")
+
+class ParagraphReport(BaseModel):
+    index: int = Field(..., description="段落序号")
+    recomputed: bool = Field(..., description="是否重新润色（否则复用上次提交的结果）")
+    input_chars: int = Field(..., description="段落输入字符数")
+    output_chars: int = Field(..., description="段落输出字符数")
+    api_used: Optional[str] = Field(None, description="使用的API服务")
+
+class DocumentProcessResult(BaseModel):
+    document_id: str = Field(..., description="文档ID")
+    processed_text: str = Field(..., description="拼接后的处理结果")
+    ai_probability: float = Field(..., ge=0.0, le=1.0, description="AI生成概率（按段落长度加权）")
+    processing_time: float = Field(..., ge=0.0, description="总处理时间（秒）")
+    style_used: Optional[str] = Field(None, description="使用的润色风格")
+    api_used: Optional[str] = Field(None, description="使用的API服务")
+    paragraph_count: int = Field(..., description="段落数量")
+    recomputed: list[int] = Field(..., description="本次重新润色的段落序号")
+    paragraphs: list[ParagraphReport] = Field(..., description="各段落处理情况")
+
 class AsyncTaskResponse(BaseModel):
     task_id: str = Field(..., description="任务ID")
     status: str = Field(..., description="任务状态")
@@ -38,27 +111,47 @@ class AsyncTaskResponse(BaseModel):
 class ProcessingHistoryResponse(BaseModel):
     id: int
     user_id: str
-    original_text: str
-    processed_text: str
+    original_text: Optional[str] = None  # include_text=false 时不返回正文
+    processed_text: Optional[str] = None
     ai_probability: float
     processing_time: float
     created_at: datetime
     
     model_config = {"from_attributes": True}
 
+class ProcessingHistoryPage(BaseModel):
+    items: list[ProcessingHistoryResponse] = Field(..., description="本页历史记录（按时间倒序）")
+    next_cursor: Optional[str] = Field(None, description="下一页游标，为空表示没有更多记录")
+
 class BatchProcessRequest(BaseModel):
     texts: list[TextRequest] = Field(..., description="批量处理的文本列表")
 
 class AIDetectionRequest(BaseModel):
     content: str = Field(..., min_length=1, max_length=10000, description="要检测的文本内容")
 
+class AIDetectionBatchRequest(BaseModel):
+    texts: list[AIDetectionRequest] = Field(..., min_length=1, description="批量检测的文本列表")
+
+class SentenceScore(BaseModel):
+    index: int = Field(..., description="句子序号")
+    text: str = Field(..., description="句子文本")
+    start: int = Field(..., description="在原文中的起始位置")
+    end: int = Field(..., description="在原文中的结束位置")
+    ai_probability: float = Field(..., ge=0.0, le=1.0, description="句子的AI生成概率")
+
 class AIDetectionResult(BaseModel):
     content: str = Field(..., description="检测的文本")
     ai_probability: float = Field(..., ge=0.0, le=1.0, description="AI生成概率")
     confidence_level: Literal["low", "medium", "high"] = Field(..., description="置信度等级")
     analysis: dict = Field(..., description="详细分析结果")
+    sentences: list[SentenceScore] = Field(default_factory=list, description="逐句检测结果")
     processing_time: float = Field(..., ge=0.0, description="处理时间（秒）")
 
+class AIDetectionBatchResult(BaseModel):
+    total_count: int = Field(..., description="检测的文本数量")
+    processing_time: float = Field(..., ge=0.0, description="总处理时间（秒）")
+    results: list[AIDetectionResult] = Field(..., description="各文本的检测结果")
+
 class StyleInfo(BaseModel):
     id: str = Field(..., description="风格ID")
     name: str = Field(..., description="风格名称")
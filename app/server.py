@@ -0,0 +1,64 @@
+"""生产环境启动入口
+
+    python -m app.server --workers 4 --port 8000
+
+以多个 worker 进程运行 app.main_production，已安装 uvloop / httptools 时自动启用。
+父进程只负责监听端口和管理 worker，不导入应用；每个 worker 在 lifespan 中完成上游预热后才开始接受请求。
+"""
+import argparse
+import importlib.util
+import logging
+import os
+from typing import Dict, Optional
+import uvicorn
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+APP_PATH = "app.main_production:app"
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+def build_options(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    workers: Optional[int] = None
+) -> Dict:
+    """构建 uvicorn 运行参数"""
+    options = {
+        "host": host or settings.server_host,
+        "port": port or settings.server_port,
+        "loop": "uvloop" if _available("uvloop") else "asyncio",
+        "http": "httptools" if _available("httptools") else "h11",
+        # 应用中间件已记录每个请求，关闭 uvicorn 的访问日志
+        "access_log": False,
+        "backlog": settings.server_backlog,
+        "timeout_keep_alive": settings.server_keepalive_timeout,
+        "proxy_headers": True,
+        "lifespan": "on"
+    }
+    if settings.debug:
+        # 开发模式：单进程热重载
+        options["reload"] = True
+    else:
+        options["workers"] = workers or settings.server_workers or os.cpu_count() or 1
+    return options
+
+def main():
+    parser = argparse.ArgumentParser(description="AI学术润色系统生产服务")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    options = build_options(args.host, args.port, args.workers)
+    logger.info(
+        f"🚀 启动生产服务: {options['host']}:{options['port']}, "
+        f"worker {options.get('workers', 1)}, 事件循环 {options['loop']}, HTTP {options['http']}"
+    )
+    uvicorn.run(APP_PATH, **options)
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,46 @@
-import asyncio
 from typing import Dict, Optional
 import time
-import random
+from app.services.ai_detector import ai_detector
+from app.services.result_cache import result_cache
+from app.services.rewrite_engine import rewrite_engine
+
+# 模拟处理器的模型标识和提示词版本（用于缓存键）
+MODEL_ID = "local-mock"
+PROMPT_VERSION = "v2"
 
 class AIProcessor:
-    def __init__(self):
-        self.processing_delay = 0.5  # 模拟处理时间
-    
-    async def process_text(self, text: str, style: str = "academic") -> Dict:
+    async def process_text(self, text: str, style: str = "academic", use_cache: bool = True) -> Dict:
         """AI文本处理主函数"""
         start_time = time.time()
         
-        # 模拟异步AI处理
-        await asyncio.sleep(self.processing_delay)
+        cache_key = result_cache.make_key("mock", text, style, MODEL_ID, PROMPT_VERSION)
+        if use_cache:
+            cached = await result_cache.get(cache_key)
+            if cached is not None:
+                return {**cached, "processing_time": time.time() - start_time, "cache_hit": True}
         
-        # 模拟不同风格的处理结果
+        # 使用本地改写引擎处理
         processed_text = await self._apply_style(text, style)
         ai_score = await self._calculate_ai_probability(processed_text)
         
         end_time = time.time()
         
-        return {
+        output = {
             "text": processed_text,
-            "ai_score": ai_score,
-            "processing_time": end_time - start_time
+            "ai_score": ai_score
         }
+        # 跳过缓存的请求也会刷新缓存项
+        await result_cache.set(cache_key, output)
+        
+        return {**output, "processing_time": end_time - start_time, "cache_hit": False}
     
     async def _apply_style(self, text: str, style: str) -> str:
         """根据风格调整文本"""
-        style_prefixes = {
-            "academic": "[学术润色]",
-            "formal": "[正式润色]", 
-            "casual": "[通俗润色]",
-            "creative": "[创意润色]"
-        }
-        
-        prefix = style_prefixes.get(style, "[默认润色]")
-        
-        # 模拟文本处理逻辑
-        if "人工智能" in text:
-            processed = text.replace("人工智能", "AI技术")
-        else:
-            processed = text
-            
-        return f"{prefix} {processed}"
+        return rewrite_engine.rewrite(text, style)["text"]
     
     async def _calculate_ai_probability(self, text: str) -> float:
-        """计算AI生成概率"""
-        # 简单的AI检测逻辑模拟
-        ai_indicators = ["首先", "其次", "最后", "综上所述", "总而言之"]
-        score = 0.0
-        
-        for indicator in ai_indicators:
-            if indicator in text:
-                score += 0.1
-        
-        # 添加随机因素模拟真实检测结果
-        score += random.uniform(0.1, 0.3)
-        
-        return min(score, 1.0)
+        """计算AI生成概率（使用本地检测引擎）"""
+        return ai_detector.detect(text)["ai_probability"]
 
 # 全局AI处理器实例
 ai_processor = AIProcessor()
@@ -0,0 +1,82 @@
+import hashlib
+import logging
+import time
+from typing import Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 键前缀，完整键名为 blob:{sha256}
+KEY_PREFIX = "blob:"
+# Redis 出错后暂停访问的时间（秒）
+_REDIS_RETRY_INTERVAL = 30.0
+
+def blob_key(digest: str) -> str:
+    return f"{KEY_PREFIX}{digest}"
+
+class BlobStore:
+    """按内容寻址的 Redis 大对象存储（Celery 消息和任务结果中的大正文只传引用）
+
+    键为内容的 SHA-256，相同内容只存一份，每次写入刷新过期时间。
+    同步接口：kombu 的序列化在生产者和 worker 的同步代码中执行。
+    """
+
+    def __init__(self):
+        self._redis = None
+        self._retry_at = 0.0
+        self.counters = {
+            "stored": 0,
+            "loaded": 0,
+            "errors": 0
+        }
+
+    def _get_redis(self):
+        if time.monotonic() < self._retry_at:
+            return None
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(
+                settings.redis_url,
+                socket_connect_timeout=0.5,
+                socket_timeout=2.0
+            )
+        return self._redis
+
+    def _failed(self, e: Exception):
+        self.counters["errors"] += 1
+        self._retry_at = time.monotonic() + _REDIS_RETRY_INTERVAL
+        logger.warning(f"⚠️ Blob 存储不可用，{_REDIS_RETRY_INTERVAL:.0f}s 内跳过: {e}")
+
+    def put(self, data: bytes, ttl: int) -> Optional[str]:
+        """存储数据并返回其 SHA-256，不可用时返回 None（调用方改为内联传输）"""
+        redis = self._get_redis()
+        if redis is None:
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+        try:
+            redis.set(blob_key(digest), data, ex=ttl)
+        except Exception as e:
+            self._failed(e)
+            return None
+        self.counters["stored"] += 1
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """读取数据，已过期或不可用时抛出 LookupError"""
+        redis = self._get_redis()
+        if redis is None:
+            raise LookupError("Blob 存储暂不可用")
+        try:
+            data = redis.get(blob_key(digest))
+        except Exception as e:
+            self._failed(e)
+            raise LookupError(f"Blob 存储不可用: {e}") from e
+        if data is None:
+            raise LookupError(f"Blob {digest[:12]} 不存在或已过期")
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise LookupError(f"Blob {digest[:12]} 内容校验失败")
+        self.counters["loaded"] += 1
+        return data
+
+# 全局 Blob 存储实例
+blob_store = BlobStore()
@@ -1,5 +1,26 @@
-from celery import Celery
+import asyncio
+import logging
+import time
+from typing import Dict, List
+from celery import Celery, chord, group, states
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_shutdown
+)
 from app.core.config import settings
+from app.services.result_retention import result_retention
+from app.services.scheduler import QueueTimeout
+from app.services.task_events import task_event_publisher
+from app.services.task_progress import task_progress_store
+from app.services.task_serializer import RESULT_SERIALIZER_NAME, SERIALIZER_NAME, register_compact_serializer
+from app.services.worker_runtime import worker_runtime
+from app.utils.text_segmenter import TextChunk
+
+logger = logging.getLogger(__name__)
 
 # Celery配置
 celery_app = Celery(
@@ -9,42 +30,193 @@ celery_app = Celery(
     include=['app.services.celery_app']
 )
 
+register_compact_serializer()
+
 # Celery配置
 celery_app.conf.update(
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
+    task_serializer=settings.celery_serializer,
+    # compact 结果引用的 blob 过期时间不超过 result_expires
+    result_serializer=RESULT_SERIALIZER_NAME if settings.celery_serializer == SERIALIZER_NAME else settings.celery_serializer,
+    # 同时接受 json，升级前已入队的消息和已写入的结果仍可读取
+    accept_content=[SERIALIZER_NAME, 'json'],
+    result_accept_content=[RESULT_SERIALIZER_NAME, SERIALIZER_NAME, 'json'],
+    result_expires=settings.celery_result_expires,
     timezone='UTC',
     enable_utc=True,
     task_routes={
         'app.services.celery_app.long_text_processing': 'long-running',
-    }
+        'app.services.celery_app.long_text_segment': 'long-running',
+        'app.services.celery_app.long_text_merge': 'long-running',
+    },
+    worker_pool=settings.celery_worker_pool,
+    worker_concurrency=settings.celery_worker_concurrency,
+    worker_prefetch_multiplier=settings.celery_worker_prefetch_multiplier
 )
 
-@celery_app.task
-def long_text_processing(text: str, user_id: str, style: str = "academic"):
-    """长文本处理异步任务"""
-    from app.services.ai_processor import ai_processor
-    import asyncio
-    
-    # 在Celery任务中运行异步函数
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
-    try:
-        result = loop.run_until_complete(
-            ai_processor.process_text(text, style)
+def _is_prefork(pool_cls) -> bool:
+    name = pool_cls if isinstance(pool_cls, str) else getattr(pool_cls, "__module__", "")
+    return "prefork" in name
+
+@worker_init.connect
+def _start_runtime_in_main_process(sender=None, **kwargs):
+    """threads / solo 池的任务在主进程中执行，启动时即创建运行时"""
+    # prefork 池在子进程中创建，避免 fork 前在父进程中启动线程
+    if sender is not None and not _is_prefork(sender.pool_cls):
+        worker_runtime.start()
+
+@worker_process_init.connect
+def _start_runtime_in_child_process(**kwargs):
+    worker_runtime.start()
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _stop_runtime(**kwargs):
+    worker_runtime.stop()
+
+@task_prerun.connect
+def _publish_task_started(task_id=None, **kwargs):
+    task_event_publisher.publish(task_id, "started")
+
+@task_postrun.connect
+def _publish_task_finished(task_id=None, retval=None, state=None, **kwargs):
+    """任务结束时推送结果（结果已先写入 backend，错过推送的客户端仍可轮询）"""
+    if state == states.SUCCESS:
+        task_event_publisher.publish(task_id, "completed", result=retval)
+    elif state == states.FAILURE:
+        task_event_publisher.publish(task_id, "failed", error=str(retval))
+
+@task_postrun.connect
+def _track_task_result(task_id=None, task=None, retval=None, state=None, **kwargs):
+    """登记已写入结果后端的结果，超出总量上限时删除最早的结果"""
+    if state not in (states.SUCCESS, states.FAILURE) or task is None:
+        return
+    if task.request.is_eager or task.ignore_result:
+        return
+    result_retention.track(task_id, celery_app.backend.get_key_for_task)
+
+def _chunk_payload(chunk) -> Dict:
+    """分段的可序列化形式（不含切分时的句子单元）"""
+    return {
+        "index": chunk.index,
+        "text": chunk.text,
+        "separator": chunk.separator,
+        "trailing": chunk.trailing,
+        "context": chunk.context,
+        "estimated_tokens": chunk.estimated_tokens
+    }
+
+def _fanout_chord(task_id: str, total: int, groups: List[List[Dict]], user_id: str, style: str, started_at: float):
+    """各组分段并行处理后由 long_text_merge 合并；任一子任务失败时 chord 不执行合并，由 long_text_failed 收尾"""
+    return chord(
+        group(
+            long_text_segment.s(task_id, total, payloads, user_id, style)
+            for payloads in groups
+        ),
+        long_text_merge.s(task_id, user_id, style, started_at).on_error(long_text_failed.s(task_id))
+    )
+
+@celery_app.task(bind=True)
+def long_text_processing(self, text: str, user_id: str, style: str = "academic"):
+    """长文本处理异步任务
+
+    分段数不少于 long_text_fanout_min_chunks 时，把分段分组后以 chord 分发到 long-running 队列上的
+    多个 worker 并行处理，由 long_text_merge 按原顺序合并；合并任务继承本任务的 ID，
+    结果仍通过 GET /task/{task_id} 查询，处理中返回已完成的段数和部分结果。
+    两种方式成功时都返回 {"status": "completed", ...}；处理出错时任务失败（状态为 FAILURE，
+    分发方式下为 ChordError），查询接口返回 {"status": "failed", "error": ...}。
+    """
+    from app.services.long_text_pipeline import long_text_pipeline
+    from app.services.scheduler import BACKGROUND
+
+    task_id = self.request.id
+    started_at = time.time()
+
+    chunks = long_text_pipeline.split(text)
+    if settings.long_text_fanout_enabled and len(chunks) >= settings.long_text_fanout_min_chunks:
+        size = settings.long_text_fanout_chunks_per_task
+        groups = [
+            [_chunk_payload(chunk) for chunk in chunks[i:i + size]]
+            for i in range(0, len(chunks), size)
+        ]
+        task_progress_store.start(task_id, len(chunks))
+        if not self.request.is_eager:
+            self.update_state(state="PROGRESS", meta={"completed": 0, "total": len(chunks)})
+        logger.info(f"🌐 长文本任务 {task_id}: {len(chunks)}段分为 {len(groups)} 个子任务")
+        return self.replace(_fanout_chord(task_id, len(chunks), groups, user_id, style, started_at))
+
+    async def publish_progress(completed: int, total: int):
+        # 在 worker 事件循环内调用，发布放到线程池中执行
+        await task_event_publisher.publish_async(task_id, "progress", completed=completed, total=total)
+
+    # 在 worker 常驻事件循环中运行，复用上游连接池
+    result = worker_runtime.run(
+        long_text_pipeline.process_text(
+            text, style, on_progress=publish_progress, priority=BACKGROUND, client_id=user_id
+        ),
+        timeout=settings.celery_task_timeout
+    )
+    return {
+        "user_id": user_id,
+        "status": "completed",
+        "result": result
+    }
+
+@celery_app.task(autoretry_for=(QueueTimeout,), max_retries=2, retry_backoff=True)
+def long_text_segment(parent_id: str, total: int, payloads: List[Dict], user_id: str, style: str = "academic"):
+    """处理长文本任务的一组分段，每完成一个分段记录进度并推送事件"""
+    from app.services.long_text_pipeline import long_text_pipeline
+    from app.services.scheduler import BACKGROUND
+
+    chunks = [TextChunk(**payload) for payload in payloads]
+
+    def record_and_publish(index: int, text: str):
+        completed = task_progress_store.record(parent_id, index, text)
+        if completed is not None:
+            task_event_publisher.publish(
+                parent_id, "progress", completed=completed, total=total
+            )
+
+    async def record_chunk(chunk: TextChunk, result: Dict):
+        # 在 worker 事件循环内调用，同步的 Redis 调用放到线程池中执行
+        await asyncio.get_running_loop().run_in_executor(
+            None, record_and_publish, chunk.index, result["text"]
         )
-        return {
-            "user_id": user_id,
-            "status": "completed",
-            "result": result
-        }
-    except Exception as e:
-        return {
-            "user_id": user_id,
-            "status": "failed",
-            "error": str(e)
-        }
-    finally:
-        loop.close()
+
+    results = worker_runtime.run(
+        long_text_pipeline.process_chunks(
+            chunks, style, on_chunk_done=record_chunk, priority=BACKGROUND, client_id=user_id
+        ),
+        timeout=settings.celery_task_timeout
+    )
+    return [{"chunk": payload, "result": result} for payload, result in zip(payloads, results)]
+
+@celery_app.task
+def long_text_merge(segments: List[List[Dict]], parent_id: str, user_id: str, style: str, started_at: float):
+    """按原顺序合并各子任务的结果（以父任务 ID 执行，返回值即父任务的结果）"""
+    from app.services.long_text_pipeline import long_text_pipeline
+
+    items = sorted(
+        (item for segment in segments for item in segment),
+        key=lambda item: item["chunk"]["index"]
+    )
+    chunks = [TextChunk(**item["chunk"]) for item in items]
+    result = long_text_pipeline.assemble(chunks, [item["result"] for item in items], style, started_at)
+    task_progress_store.clear(parent_id)
+    logger.info(f"✅ 长文本任务 {parent_id} 合并完成: {len(chunks)}段, {result['processing_time']:.2f}s")
+    return {
+        "user_id": user_id,
+        "status": "completed",
+        "result": result
+    }
+
+@celery_app.task
+def long_text_failed(request, exc, traceback, parent_id: str):
+    """分发的长文本任务失败时的回调
+
+    子任务失败时 chord 直接把父任务标记为失败，long_text_merge 不会执行，task_postrun 也不会为父任务
+    推送结束事件：在这里推送 failed 并清除进度记录。
+    """
+    task_progress_store.clear(parent_id)
+    task_event_publisher.publish(parent_id, "failed", error=str(exc))
+    logger.warning(f"❌ 长文本任务 {parent_id} 失败: {exc}")
+
@@ -1,21 +1,42 @@
-import httpx
 import asyncio
+import httpx
 import logging
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, Optional, Tuple
 import time
 import json
 from app.core.config import settings
+from app.services.ai_detector import ai_detector
+from app.services.hedging import hedger
+from app.services.metrics import metrics
+from app.services.model_router import ModelLane, model_router
+from app.services.resilience import (
+    CircuitOpenError, RateLimitExceeded, UpstreamError, parse_retry_after, upstream_guard
+)
+from app.services.result_cache import result_cache
+from app.services.rewrite_engine import rewrite_engine
+from app.services.scheduler import BACKGROUND, INTERACTIVE, QueueTimeout, scheduler
+from app.services.single_flight import single_flight
+from app.services.token_budget import TokenBudget, plan_budget
+from app.services.upstream_client import upstream_client
 
 logger = logging.getLogger(__name__)
 
+# 提示词版本：修改提示词或请求参数时递增，使旧的缓存结果失效
+PROMPT_VERSION = "v3"
+FALLBACK_API = "Fallback Mode"
+
 class DeepSeekProcessor:
     def __init__(self):
         self.api_key = settings.ark_api_key
         self.base_url = settings.ark_base_url
         self.model_id = settings.deepseek_model_id
-        self.timeout = 30
-        
-        # 调试信息
+
+    @property
+    def has_valid_key(self) -> bool:
+        return bool(self.api_key) and len(self.api_key) > 10
+
+    def log_config(self):
+        """输出处理器配置（由应用 lifespan 调用，导入模块时不产生日志）"""
         logger.info(f"火山引擎 DeepSeek Processor初始化:")
         logger.info(f"  ARK API Key: {'已配置' if self.api_key else '未配置'}")
         logger.info(f"  ARK Base URL: {self.base_url}")
@@ -24,35 +45,141 @@ class DeepSeekProcessor:
         if not self.api_key:
             logger.warning("⚠️ ARK API Key未配置，将使用模拟模式")
 
-    async def process_text(self, text: str, style: str = "academic") -> Dict:
-        """处理文本的主要方法"""
+    async def process_text(
+        self,
+        text: str,
+        style: str = "academic",
+        use_cache: bool = True,
+        context: str = "",
+        preference: str = "auto",
+        priority: str = INTERACTIVE,
+        client_id: str = "anonymous"
+    ) -> Dict:
+        """处理文本的主要方法
+
+        context 为只读上下文（如长文本分段时的前文、文档中相邻的段落），只用于保持衔接，不会被润色输出。
+        preference 为客户端的 quality/speed 偏好，由 model_router 据此选择模型通道。
+        priority 和 client_id 决定上游调用在 scheduler 中的排队顺序。
+        估算的 token 数超出单次调用上限时抛出 ContextBudgetExceeded，由调用方拒绝或改走长文本分段。
+        """
         start_time = time.time()
+        # 在访问缓存和网络之前完成准入检查
+        budget = plan_budget(text, style, context)
+        lane = model_router.route(text, style, preference)
         
+        cache_key = self._cache_key(text, style, lane.model_id, context)
+        if use_cache:
+            cached = await result_cache.get(cache_key)
+            if cached is not None:
+                logger.info("⚡ 命中结果缓存")
+                metrics.api_used.inc(api=cached.get("api_used", "未知"))
+                return {**cached, "processing_time": time.time() - start_time, "cache_hit": True}
+        
+        # 相同的进行中请求共享一次上游调用
+        output, coalesced = await single_flight.do(
+            cache_key,
+            lambda: self._process_uncached(
+                text, style, context, cache_key, budget, lane, priority, client_id
+            )
+        )
+        metrics.api_used.inc(api=output["api_used"])
+        
+        return {
+            **output,
+            "processing_time": time.time() - start_time,
+            "cache_hit": False,
+            "coalesced": coalesced
+        }
+    
+    async def _process_uncached(
+        self,
+        text: str,
+        style: str,
+        context: str,
+        cache_key: str,
+        budget: TokenBudget,
+        lane: ModelLane,
+        priority: str = INTERACTIVE,
+        client_id: str = "anonymous"
+    ) -> Dict:
+        """在调度器配额和模型通道的并发上限内调用上游（失败时降级）并写入结果缓存"""
+        size = len(text.encode("utf-8")) + len(context.encode("utf-8"))
         try:
-            if self.api_key and len(self.api_key) > 10:  # 确保API Key有效
-                result = await self._call_ark_api(text, style)
-                logger.info("✅ 使用DeepSeek API处理成功")
+            if self.has_valid_key:  # 确保API Key有效
+                async with scheduler.slot(priority, client_id, size, lane):
+                    hedge_won, result = await upstream_guard.call(
+                        lambda: hedger.run(
+                            lambda: self._call_ark_api(text, style, context, budget.max_tokens, lane.model_id),
+                            lambda: self._call_ark_api(
+                                text, style, context, budget.max_tokens,
+                                *hedger.target(lane.model_id, self.base_url)
+                            ),
+                            tokens=budget.total
+                        ),
+                        tokens=budget.total
+                    )
+                if hedge_won:
+                    # 对冲请求可能指向备用模型：按实际产出结果的模型标注，并写入该模型的缓存项
+                    hedge_model_id, _ = hedger.target(lane.model_id, self.base_url)
+                    result["api_used"] = f"火山引擎 {hedge_model_id} API（对冲请求）"
+                    cache_key = self._cache_key(text, style, hedge_model_id, context)
+                else:
+                    result["api_used"] = lane.api_used
+                logger.info(f"✅ 使用DeepSeek API处理成功（{lane.title}）")
             else:
                 logger.warning("⚠️ API Key无效，使用降级模式")
-                result = await self._fallback_processing(text, style)
+                result = await self._fallback_processing(text, style, reason="no_api_key")
                 
+        except CircuitOpenError as e:
+            logger.warning(f"⚡ {e}")
+            result = await self._fallback_processing(text, style, reason="circuit_open")
+        except QueueTimeout as e:
+            logger.warning(f"⏳ {e}")
+            if priority == BACKGROUND:
+                # 后台任务没有用户在等待，放弃而不是返回降级结果
+                raise
+            result = await self._fallback_processing(text, style, reason="queue_timeout")
         except Exception as e:
             logger.error(f"❌ API调用失败: {e}")
-            result = await self._fallback_processing(text, style)
+            result = await self._fallback_processing(text, style, reason=self._fallback_reason(e))
         
-        end_time = time.time()
-        
-        return {
+        output = {
             "text": result["text"],
             "reasoning": result.get("reasoning", ""),
             "ai_score": result.get("ai_score", 0.3),
-            "processing_time": end_time - start_time,
             "api_used": result.get("api_used", "未知"),  # 保持原始的api_used
             "style_used": style
         }
+        
+        # 降级结果和被截断的结果不写入缓存，避免之后一直返回不完整的内容；
+        # 跳过缓存的请求也会刷新缓存项
+        if output["api_used"] != FALLBACK_API and not result.get("truncated"):
+            await result_cache.set(cache_key, output)
+        
+        return output
     
-    async def _call_ark_api(self, text: str, style: str) -> Dict:
-        """调用火山引擎 DeepSeek API"""
+    def _cache_key(self, text: str, style: str, model_id: str, context: str) -> str:
+        return result_cache.make_key("deepseek", text, style, model_id, PROMPT_VERSION, context)
+
+    def _fallback_reason(self, error: Exception) -> str:
+        if isinstance(error, CircuitOpenError):
+            return "circuit_open"
+        if isinstance(error, RateLimitExceeded):
+            return "rate_limited"
+        if isinstance(error, UpstreamError):
+            return "upstream_error"
+        return "error"
+
+    def _build_request(
+        self,
+        text: str,
+        style: str,
+        max_tokens: int,
+        stream: bool = False,
+        context: str = "",
+        model_id: Optional[str] = None
+    ) -> Tuple[Dict, Dict]:
+        """构建火山引擎 API 请求头和请求体（max_tokens 由 plan_budget 按输入长度给出）"""
         # 根据风格构建提示
         style_prompts = {
             "academic": "请将以下文本润色为学术论文风格，保持原意，提高专业性和严谨性：",
@@ -68,69 +195,238 @@ class DeepSeekProcessor:
             "Content-Type": "application/json"
         }
         
+        user_content = f"{prompt}\n\n{text}"
+        if context:
+            user_content = (
+                f"{prompt}只输出润色后的待润色文本，不要输出上下文。\n\n"
+                f"上下文（仅供参考）：\n{context}\n\n待润色文本：\n{text}"
+            )
+        
         payload = {
-            "model": self.model_id,
+            "model": model_id or self.model_id,
             "messages": [
                 {"role": "system", "content": "你是一个专业的学术文本润色助手。"},
-                {"role": "user", "content": f"{prompt}\n\n{text}"}
+                {"role": "user", "content": user_content}
             ],
-            "max_tokens": 2000,
+            "max_tokens": max_tokens,
             "temperature": 0.3
         }
+        if stream:
+            payload["stream"] = True
+            # 在最后一个数据块中返回 usage，用于统计 token 用量
+            payload["stream_options"] = {"include_usage": True}
+        
+        return headers, payload
+
+    async def _call_ark_api(
+        self,
+        text: str,
+        style: str,
+        context: str,
+        max_tokens: int,
+        model_id: Optional[str] = None,
+        base_url: Optional[str] = None
+    ) -> Dict:
+        """调用火山引擎 DeepSeek API（model_id、base_url 为空时使用主模型和接入点）"""
+        headers, payload = self._build_request(text, style, max_tokens, context=context, model_id=model_id)
         
         logger.info(f"📡 正在调用火山引擎 DeepSeek API...")
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=payload
-                )
-                
-                logger.info(f"📡 API响应状态: {response.status_code}")
+            response = await upstream_client.post(
+                f"{base_url or self.base_url}/chat/completions",
+                headers=headers,
+                json=payload
+            )
+        except httpx.TimeoutException as e:
+            # 读取超时不重试，避免在上游变慢时成倍放大等待时间
+            logger.error(f"❌ API调用超时: {e!r}")
+            metrics.upstream_errors.inc(status="timeout")
+            raise UpstreamError(f"火山引擎 API超时: {e!r}", retryable=isinstance(e, httpx.ConnectTimeout))
+        except httpx.TransportError as e:
+            logger.error(f"❌ API调用异常: {e!r}")
+            metrics.upstream_errors.inc(status="network")
+            raise UpstreamError(f"火山引擎 API网络错误: {e!r}")
+        
+        logger.info(f"📡 API响应状态: {response.status_code}")
+        
+        if response.status_code != 200:
+            logger.error(f"❌ API错误 {response.status_code}: {response.text}")
+            metrics.upstream_errors.inc(status=response.status_code)
+            raise UpstreamError(
+                f"火山引擎 API错误: {response.status_code}",
+                status_code=response.status_code,
+                retry_after=parse_retry_after(response.headers.get("Retry-After"))
+            )
+        
+        data = response.json()
+        metrics.record_usage(data.get("usage"))
+        choice = data["choices"][0]
+        processed_text = choice["message"]["content"].strip()
+        
+        # 🧠 获取思考过程
+        reasoning_content = choice["message"].get("reasoning_content", "")
+        
+        truncated = choice.get("finish_reason") == "length"
+        if truncated:
+            logger.warning(f"⚠️ 输出达到 max_tokens={max_tokens} 被截断")
+            metrics.truncations.inc(mode="request")
+        
+        return {
+            "text": processed_text,
+            "reasoning": reasoning_content,  # 新增思考过程
+            "ai_score": 0.15,
+            "truncated": truncated
+        }
+            
+    async def stream_text(
+        self,
+        text: str,
+        style: str = "academic",
+        preference: str = "auto",
+        client_id: str = "anonymous"
+    ) -> AsyncIterator[Dict]:
+        """流式处理文本，逐步产出思考过程和润色结果
+
+        产出的事件格式为 {"event": 类型, "data": 数据}，类型包括
+        reasoning（思考增量）、content（正文增量）、done（结束汇总）和 error。
+        与 process_text 相同，估算的 token 数超出单次调用上限时在产出任何事件之前抛出 ContextBudgetExceeded。
+        """
+        start_time = time.time()
+        budget = plan_budget(text, style)
+        lane = model_router.route(text, style, preference)
+        api_used = lane.api_used
+        ai_score = 0.15
+        content_parts = []
+        
+        try:
+            if not self.has_valid_key:
+                logger.warning("⚠️ API Key无效，使用降级模式")
+                raise ValueError("API Key无效")
+            
+            async with scheduler.slot(INTERACTIVE, client_id, len(text.encode("utf-8")), lane):
+                await upstream_guard.admit(budget.total)
+                call_start = time.monotonic()
+                first_event_latency = None
+                try:
+                    async for event in hedger.stream(
+                        lambda: self._stream_ark_api(text, style, budget.max_tokens, lane.model_id),
+                        lambda: self._stream_ark_api(
+                            text, style, budget.max_tokens, *hedger.target(lane.model_id, self.base_url)
+                        ),
+                        tokens=budget.total
+                    ):
+                        if first_event_latency is None:
+                            first_event_latency = time.monotonic() - call_start
+                        if event["event"] == "content":
+                            content_parts.append(event["data"]["delta"])
+                        yield event
+                except (asyncio.CancelledError, GeneratorExit):
+                    upstream_guard.breaker.record_cancelled()
+                    raise
+                except Exception as e:
+                    upstream_guard.breaker.record_error(e)
+                    raise
+                # 流式调用按首个事件的延迟判断是否为慢调用
+                upstream_guard.breaker.record_success(first_event_latency or time.monotonic() - call_start)
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    processed_text = data["choices"][0]["message"]["content"].strip()
-                    
-                    # 🧠 获取思考过程
-                    reasoning_content = data["choices"][0]["message"].get("reasoning_content", "")
-                    
-                    return {
-                        "text": processed_text,
-                        "reasoning": reasoning_content,  # 新增思考过程
-                        "ai_score": 0.15,
-                        "api_used": "火山引擎 DeepSeek-R1 API"
-                    }
-                else:
-                    logger.error(f"❌ API错误 {response.status_code}: {response.text}")
-                    raise Exception(f"火山引擎 API错误: {response.status_code}")
-                    
         except Exception as e:
-            logger.error(f"❌ API调用异常: {str(e)}")
-            raise e
+            if content_parts:
+                # 已经向客户端输出了部分内容，无法再切换到降级结果
+                logger.error(f"❌ 流式输出中断: {e}")
+                yield {"event": "error", "data": {"message": f"流式输出中断: {str(e)}"}}
+                return
             
-    async def _fallback_processing(self, text: str, style: str) -> Dict:
-        """降级处理模式"""
-        await asyncio.sleep(0.5)  # 模拟处理时间
-        
-        style_prefixes = {
-            "academic": "[学术润色]",
-            "formal": "[正式润色]",
-            "casual": "[通俗润色]",
-            "creative": "[创意润色]"
+            logger.error(f"❌ 流式API调用失败: {e}")
+            if not self.has_valid_key:
+                reason = "no_api_key"
+            elif isinstance(e, QueueTimeout):
+                # 流式请求在调度器中排队超时
+                reason = "queue_timeout"
+            else:
+                reason = self._fallback_reason(e)
+            result = await self._fallback_processing(text, style, reason=reason)
+            api_used = result.get("api_used", "未知")
+            ai_score = result.get("ai_score", 0.3)
+            content_parts.append(result["text"])
+            yield {"event": "content", "data": {"delta": result["text"]}}
+        
+        metrics.api_used.inc(api=api_used)
+        yield {
+            "event": "done",
+            "data": {
+                "ai_probability": ai_score,
+                "processing_time": time.time() - start_time,
+                "api_used": api_used,
+                "style_used": style,
+                "text_length": len("".join(content_parts))
+            }
         }
+
+    async def _stream_ark_api(
+        self,
+        text: str,
+        style: str,
+        max_tokens: int,
+        model_id: Optional[str] = None,
+        base_url: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """以 stream=True 调用火山引擎 API，解析 SSE 增量"""
+        headers, payload = self._build_request(text, style, max_tokens, stream=True, model_id=model_id)
         
-        prefix = style_prefixes.get(style, "[默认润色]")
+        logger.info(f"📡 正在以流式方式调用火山引擎 DeepSeek API...")
         
-        # 简单的文本处理
-        processed = text.replace("人工智能", "AI技术").replace("。", "。")
+        async with upstream_client.stream(
+            "POST",
+            f"{base_url or self.base_url}/chat/completions",
+            headers=headers,
+            json=payload
+        ) as response:
+            logger.info(f"📡 API响应状态: {response.status_code}")
+            
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error(f"❌ API错误 {response.status_code}: {body[:500]!r}")
+                metrics.upstream_errors.inc(status=response.status_code)
+                raise UpstreamError(
+                    f"火山引擎 API错误: {response.status_code}",
+                    status_code=response.status_code,
+                    retry_after=parse_retry_after(response.headers.get("Retry-After"))
+                )
+            
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                
+                chunk = json.loads(data)
+                if chunk.get("usage"):
+                    metrics.record_usage(chunk["usage"])
+                if not chunk.get("choices"):
+                    continue
+                
+                if chunk["choices"][0].get("finish_reason") == "length":
+                    logger.warning(f"⚠️ 流式输出达到 max_tokens={max_tokens} 被截断")
+                    metrics.truncations.inc(mode="stream")
+                
+                delta = chunk["choices"][0].get("delta", {})
+                if delta.get("reasoning_content"):
+                    yield {"event": "reasoning", "data": {"delta": delta["reasoning_content"]}}
+                if delta.get("content"):
+                    yield {"event": "content", "data": {"delta": delta["content"]}}
+            
+    async def _fallback_processing(self, text: str, style: str, reason: str = "error") -> Dict:
+        """降级处理模式：使用本地改写引擎"""
+        metrics.fallbacks.inc(reason=reason)
+        result = rewrite_engine.rewrite(text, style)
         
         return {
-            "text": f"{prefix} {processed}",
-            "ai_score": 0.25,
-            "api_used": "Fallback Mode"
+            "text": result["text"],
+            "ai_score": ai_detector.detect(result["text"])["ai_probability"],
+            "api_used": FALLBACK_API
         }
 
 # 全局处理器实例
@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.services.deepseek_processor import FALLBACK_API, deepseek_processor
+from app.services.long_text_pipeline import long_text_pipeline
+from app.services.result_cache import normalize_text
+from app.services.token_budget import ContextBudgetExceeded
+from app.utils.text_segmenter import split_paragraphs
+
+logger = logging.getLogger(__name__)
+
+# Redis 不可用时，暂停访问的时间（秒）
+_REDIS_RETRY_INTERVAL = 30.0
+
+def paragraph_hash(paragraph: str) -> str:
+    return hashlib.sha256(normalize_text(paragraph).encode("utf-8")).hexdigest()
+
+class DocumentSessionStore:
+    """文档会话存储：document_id → {风格, 段落哈希 → 润色结果}
+
+    进程内按文档数 LRU 淘汰并带 TTL；document_session_redis_enabled（默认开启）时同时写入 Redis，
+    使多个 worker 共享同一文档的会话。Redis 不可达时会话只保存在处理该请求的 worker 内，
+    同一文档的后续请求落到其他 worker 时全部重新润色（结果仍然正确，只是没有增量效果）。
+    """
+
+    def __init__(self):
+        # document_id -> (过期时间, 会话)
+        self._sessions: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._redis = None
+        self._redis_retry_at = 0.0
+
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "redis_errors": 0
+        }
+
+    @staticmethod
+    def _redis_key(document_id: str) -> str:
+        return f"document-session:{document_id}"
+
+    def _get_redis(self):
+        if not settings.document_session_redis_enabled or time.monotonic() < self._redis_retry_at:
+            return None
+        if self._redis is None:
+            try:
+                import redis.asyncio as aioredis
+            except ImportError:
+                logger.warning("⚠️ 未安装 redis，文档会话仅保存在进程内")
+                self._redis_retry_at = float("inf")
+                return None
+            self._redis = aioredis.from_url(
+                settings.redis_url,
+                socket_connect_timeout=0.5,
+                socket_timeout=0.5
+            )
+        return self._redis
+
+    def _redis_failed(self, e: Exception):
+        self.counters["redis_errors"] += 1
+        self._redis_retry_at = time.monotonic() + _REDIS_RETRY_INTERVAL
+        logger.warning(f"⚠️ Redis 文档会话不可用，{_REDIS_RETRY_INTERVAL:.0f}s 内跳过: {e}")
+
+    async def get(self, document_id: str) -> Optional[Dict]:
+        entry = self._sessions.get(document_id)
+        if entry is not None:
+            expires_at, session = entry
+            if expires_at > time.monotonic():
+                self._sessions.move_to_end(document_id)
+                self.counters["hits"] += 1
+                return session
+            del self._sessions[document_id]
+
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                data = await redis.get(self._redis_key(document_id))
+            except Exception as e:
+                self._redis_failed(e)
+                data = None
+            if data:
+                session = json.loads(data)
+                self._memory_set(document_id, session)
+                self.counters["hits"] += 1
+                return session
+
+        self.counters["misses"] += 1
+        return None
+
+    def _memory_set(self, document_id: str, session: Dict):
+        self._sessions.pop(document_id, None)
+        self._sessions[document_id] = (time.monotonic() + settings.document_session_ttl, session)
+        while len(self._sessions) > settings.document_session_max_documents:
+            self._sessions.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    async def set(self, document_id: str, session: Dict):
+        self._memory_set(document_id, session)
+        redis = self._get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.set(
+                self._redis_key(document_id),
+                json.dumps(session, ensure_ascii=False),
+                ex=settings.document_session_ttl
+            )
+        except Exception as e:
+            self._redis_failed(e)
+
+    async def delete(self, document_id: str) -> bool:
+        removed = self._sessions.pop(document_id, None) is not None
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                removed = bool(await redis.delete(self._redis_key(document_id))) or removed
+            except Exception as e:
+                self._redis_failed(e)
+        return removed
+
+    async def close(self):
+        """关闭 Redis 连接（lifespan 关闭时调用）"""
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def stats(self) -> Dict:
+        return {
+            "documents": len(self._sessions),
+            "redis_enabled": settings.document_session_redis_enabled,
+            **self.counters
+        }
+
+class DocumentPolisher:
+    """文档增量润色
+
+    按段落切分文档，段落哈希已在会话中的直接复用上次结果，只把变化的段落（附带相邻段落作为只读上下文）
+    发往上游。上游成本和延迟与改动量成正比，而不是与文档长度成正比。
+    """
+
+    def __init__(self, store: DocumentSessionStore, processor=deepseek_processor, pipeline=long_text_pipeline):
+        self.store = store
+        self.processor = processor
+        self.pipeline = pipeline
+
+    @staticmethod
+    def _neighbour_context(paragraphs: List[Tuple[str, str]], index: int) -> str:
+        neighbours = []
+        if index > 0:
+            neighbours.append(paragraphs[index - 1][1].strip())
+        if index + 1 < len(paragraphs):
+            neighbours.append(paragraphs[index + 1][1].strip())
+        return "\n\n".join(neighbours)
+
+    async def _polish_paragraph(
+        self,
+        paragraph: str,
+        context: str,
+        style: str,
+        use_cache: bool,
+        preference: str,
+        client_id: str,
+        semaphore: asyncio.Semaphore
+    ) -> Dict:
+        async with semaphore:
+            try:
+                result = await self.processor.process_text(
+                    paragraph, style, use_cache=use_cache, context=context,
+                    preference=preference, client_id=client_id
+                )
+            except ContextBudgetExceeded:
+                # 单个段落超出单次调用上限时按长文本分段处理
+                result = await self.pipeline.process_text(
+                    paragraph, style, use_cache=use_cache, preference=preference, client_id=client_id
+                )
+        return {
+            "text": result["text"],
+            "ai_score": result["ai_score"],
+            "api_used": result.get("api_used", "未知")
+        }
+
+    async def process_document(
+        self,
+        document_id: str,
+        text: str,
+        style: str = "academic",
+        use_cache: bool = True,
+        preference: str = "auto",
+        client_id: str = "anonymous"
+    ) -> Dict:
+        """润色文档，只重新计算与上次提交相比发生变化的段落"""
+        start_time = time.time()
+        paragraphs = split_paragraphs(text)
+        # split_paragraphs 不返回最后一个段落之后的空白，拼接结果时原样补回
+        trailing = text[sum(len(separator) + len(paragraph) for separator, paragraph in paragraphs):]
+        hashes = [paragraph_hash(paragraph) for _, paragraph in paragraphs]
+
+        session = await self.store.get(document_id) if use_cache else None
+        previous = session["paragraphs"] if session and session.get("style") == style else {}
+
+        results: List[Optional[Dict]] = [previous.get(digest) for digest in hashes]
+        changed = [i for i, result in enumerate(results) if result is None]
+        logger.info(
+            f"📝 文档 {document_id}: {len(paragraphs)}段, 需重新润色 {len(changed)}段"
+        )
+
+        semaphore = asyncio.Semaphore(settings.long_text_concurrency)
+        polished = await asyncio.gather(*[
+            self._polish_paragraph(
+                paragraphs[i][1], self._neighbour_context(paragraphs, i),
+                style, use_cache, preference, client_id, semaphore
+            )
+            for i in changed
+        ])
+        for i, result in zip(changed, polished):
+            results[i] = result
+
+        # 降级结果不写入会话，上游恢复后再次提交时重新润色
+        await self.store.set(document_id, {
+            "style": style,
+            "paragraphs": {
+                digest: result
+                for digest, result in zip(hashes, results)
+                if result["api_used"] != FALLBACK_API
+            }
+        })
+
+        processed_text = "".join(
+            separator + result["text"]
+            for (separator, _), result in zip(paragraphs, results)
+        ) + trailing
+        total_chars = sum(len(paragraph) for _, paragraph in paragraphs) or 1
+        ai_score = sum(
+            result["ai_score"] * len(paragraph)
+            for (_, paragraph), result in zip(paragraphs, results)
+        ) / total_chars
+        changed_set = set(changed)
+
+        return {
+            "text": processed_text,
+            "ai_score": min(max(ai_score, 0.0), 1.0),
+            "processing_time": time.time() - start_time,
+            "api_used": " + ".join(sorted({result["api_used"] for result in results})) or "未知",
+            "style_used": style,
+            "recomputed": changed,
+            "paragraphs": [
+                {
+                    "index": i,
+                    "recomputed": i in changed_set,
+                    "input_chars": len(paragraph),
+                    "output_chars": len(result["text"]),
+                    "api_used": result["api_used"]
+                }
+                for i, ((_, paragraph), result) in enumerate(zip(paragraphs, results))
+            ]
+        }
+
+# 全局文档会话实例
+document_session_store = DocumentSessionStore()
+document_polisher = DocumentPolisher(document_session_store)
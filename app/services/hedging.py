@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+from app.core.config import settings
+from app.services.metrics import metrics
+from app.services.resilience import upstream_guard
+
+logger = logging.getLogger(__name__)
+
+# 流已结束、没有任何事件
+_END = object()
+
+class LatencyTracker:
+    """保存最近 window 次调用的延迟，按最近邻排名计算分位数"""
+
+    def __init__(self, window: int):
+        self._samples: deque = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, latency: float):
+        self._samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+class HedgeBudget:
+    """对冲额度：每个请求累积 ratio 个额度，每次对冲消耗 1 个，使对冲占比不超过 ratio"""
+
+    def __init__(self, ratio: float, max_credits: float = 10.0):
+        self.ratio = ratio
+        self.max_credits = max_credits
+        self.credits = 0.0
+
+    def on_request(self):
+        self.credits = min(self.max_credits, self.credits + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.credits < 1:
+            return False
+        self.credits -= 1
+        return True
+
+    def refund(self):
+        self.credits = min(self.max_credits, self.credits + 1)
+
+class Hedger:
+    """对冲请求（默认关闭）
+
+    主请求超过近期延迟的 upstream_hedge_percentile 分位数仍未完成（流式为未收到首个事件）时，
+    再发出一个相同请求（可指向备用模型或接入点），先成功的结果胜出，另一个被取消。
+    对冲请求受额度限制，且只在限流器无需等待时发出，不会放大上游排队。
+    """
+
+    def __init__(self):
+        self.trackers = {
+            "request": LatencyTracker(settings.upstream_hedge_window),
+            "stream": LatencyTracker(settings.upstream_hedge_window)
+        }
+        self.budget = HedgeBudget(settings.upstream_hedge_max_ratio)
+        self.counters = {
+            "requests": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "primary_wins": 0,
+            "budget_skipped": 0,
+            "rate_limited": 0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return settings.upstream_hedging_enabled
+
+    def target(self, model_id: str, base_url: str) -> Tuple[str, str]:
+        """对冲请求使用的 (模型, 接入点)"""
+        return (
+            settings.upstream_hedge_model_id or model_id,
+            settings.upstream_hedge_base_url or base_url
+        )
+
+    def hedge_delay(self, mode: str) -> Optional[float]:
+        """主请求等待多久后发出对冲请求，样本不足时返回 None（不对冲）"""
+        tracker = self.trackers[mode]
+        if len(tracker) < settings.upstream_hedge_min_samples:
+            return None
+        return max(settings.upstream_hedge_min_delay, tracker.percentile(settings.upstream_hedge_percentile))
+
+    def _allow_hedge(self, tokens: int) -> bool:
+        if not self.budget.try_spend():
+            self.counters["budget_skipped"] += 1
+            metrics.hedges.inc(outcome="budget_skipped")
+            return False
+        if not upstream_guard.limiter.try_acquire(tokens):
+            self.budget.refund()
+            self.counters["rate_limited"] += 1
+            metrics.hedges.inc(outcome="rate_limited")
+            return False
+        self.counters["hedged"] += 1
+        metrics.hedges.inc(outcome="sent")
+        return True
+
+    async def _race(
+        self,
+        mode: str,
+        primary: Callable[[], Awaitable[Any]],
+        hedge: Callable[[], Awaitable[Any]],
+        tokens: int
+    ) -> Tuple[bool, Any]:
+        """执行主请求，超时后发出对冲请求，返回 (是否由对冲请求胜出, 结果)"""
+        self.counters["requests"] += 1
+        self.budget.on_request()
+        delay = self.hedge_delay(mode)
+        start_time = time.monotonic()
+
+        primary_task = asyncio.ensure_future(primary())
+        hedge_task = None
+        try:
+            if delay is not None:
+                await asyncio.wait({primary_task}, timeout=delay)
+            if delay is None or primary_task.done() or not self._allow_hedge(tokens):
+                result = await primary_task
+                self.trackers[mode].record(time.monotonic() - start_time)
+                return False, result
+
+            logger.info(f"🪝 主请求 {delay:.2f}s 未完成，发出对冲请求（{mode}）")
+            hedge_task = asyncio.ensure_future(hedge())
+            pending = {primary_task, hedge_task}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in (primary_task, hedge_task):
+                    if task in done and task.exception() is None:
+                        hedge_won = task is hedge_task
+                        # 对冲胜出时主请求被取消，记录的是其延迟的下限
+                        self.trackers[mode].record(time.monotonic() - start_time)
+                        self.counters["hedge_wins" if hedge_won else "primary_wins"] += 1
+                        metrics.hedges.inc(outcome="won" if hedge_won else "lost")
+                        return hedge_won, task.result()
+            # 两个请求都失败时抛出主请求的错误
+            raise primary_task.exception()
+        finally:
+            losers = [task for task in (primary_task, hedge_task) if task is not None and not task.done()]
+            for task in losers:
+                task.cancel()
+            # 等待被取消的请求释放连接
+            await asyncio.gather(*losers, return_exceptions=True)
+
+    async def run(
+        self,
+        primary: Callable[[], Awaitable[Any]],
+        hedge: Callable[[], Awaitable[Any]],
+        tokens: int
+    ) -> Tuple[bool, Any]:
+        """对冲执行非流式调用，返回 (是否由对冲请求胜出, 结果)；未启用时直接执行主请求"""
+        if not self.enabled:
+            return False, await primary()
+        return await self._race("request", primary, hedge, tokens)
+
+    async def stream(
+        self,
+        primary: Callable[[], AsyncIterator[Dict]],
+        hedge: Callable[[], AsyncIterator[Dict]],
+        tokens: int
+    ) -> AsyncIterator[Dict]:
+        """对冲执行流式调用：以首个事件决定胜出的流，之后只读取该流"""
+        if not self.enabled:
+            async for event in primary():
+                yield event
+            return
+
+        streams = {"primary": primary(), "hedge": None}
+
+        async def first_event(name: str):
+            try:
+                return await streams[name].__anext__()
+            except StopAsyncIteration:
+                return _END
+
+        def start_hedge():
+            streams["hedge"] = hedge()
+            return first_event("hedge")
+
+        try:
+            hedge_won, first = await self._race(
+                "stream", lambda: first_event("primary"), start_hedge, tokens
+            )
+            winner = streams["hedge" if hedge_won else "primary"]
+            if first is _END:
+                return
+            yield first
+            async for event in winner:
+                yield event
+        finally:
+            for stream in streams.values():
+                if stream is not None:
+                    await stream.aclose()
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "request_delay": self.hedge_delay("request"),
+            "stream_delay": self.hedge_delay("stream"),
+            "credits": round(self.budget.credits, 3),
+            **self.counters
+        }
+
+# 全局对冲实例
+hedger = Hedger()
@@ -0,0 +1,125 @@
+import asyncio
+import base64
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, insert, or_, select
+from app.models.database import AsyncSessionLocal, ProcessingHistory, TextBlob, insert_ignore
+from app.utils.compression import compress, decompress
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """把最后一条记录的 (created_at, id) 编码为不透明的分页游标"""
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析分页游标，格式错误时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+class HistoryStore:
+    """处理历史存储
+
+    正文按 SHA-256 存入 text_blobs 表并压缩（zstd 或 zlib），重复的输入和输出只存一份；
+    历史表只保存哈希。列表接口按 (created_at, id) 游标分页，只解压当前页用到的正文。
+    """
+
+    def prepare(self, records: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """计算哈希并压缩正文，返回 (正文行, 历史行)（CPU 密集，在线程池中执行）"""
+        blobs: Dict[str, Dict] = {}
+        rows = []
+        for record in records:
+            row = {
+                "user_id": record["user_id"],
+                "ai_probability": record["ai_probability"],
+                "processing_time": record["processing_time"],
+                "created_at": record["created_at"]
+            }
+            for field in ("original", "processed"):
+                text = record[f"{field}_text"]
+                digest = text_hash(text)
+                if digest not in blobs:
+                    data = text.encode("utf-8")
+                    codec, payload = compress(data)
+                    blobs[digest] = {
+                        "hash": digest,
+                        "codec": codec,
+                        "size": len(data),
+                        "data": payload,
+                        "created_at": record["created_at"]
+                    }
+                row[f"{field}_hash"] = digest
+            rows.append(row)
+        return list(blobs.values()), rows
+
+    async def write(self, records: List[Dict]):
+        """批量写入历史记录，已存在的正文跳过"""
+        if not records:
+            return
+        blobs, rows = await asyncio.to_thread(self.prepare, records)
+        async with AsyncSessionLocal() as session:
+            await session.execute(insert_ignore(TextBlob), blobs)
+            await session.execute(insert(ProcessingHistory), rows)
+            await session.commit()
+
+    async def list_history(
+        self,
+        user_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        include_text: bool = True
+    ) -> Dict:
+        """按时间倒序分页读取用户的处理历史"""
+        query = select(ProcessingHistory).where(ProcessingHistory.user_id == user_id)
+        if cursor:
+            created_at, last_id = decode_cursor(cursor)
+            query = query.where(or_(
+                ProcessingHistory.created_at < created_at,
+                and_(ProcessingHistory.created_at == created_at, ProcessingHistory.id < last_id)
+            ))
+        query = query.order_by(
+            ProcessingHistory.created_at.desc(),
+            ProcessingHistory.id.desc()
+        ).limit(limit + 1)
+
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(query)).scalars().all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+
+            texts: Dict[str, str] = {}
+            if include_text and rows:
+                hashes = {row.original_hash for row in rows} | {row.processed_hash for row in rows}
+                blobs = await session.execute(
+                    select(TextBlob.hash, TextBlob.codec, TextBlob.data).where(TextBlob.hash.in_(hashes))
+                )
+                texts = {
+                    blob.hash: decompress(blob.codec, blob.data).decode("utf-8")
+                    for blob in blobs
+                }
+
+        return {
+            "items": [
+                {
+                    "id": row.id,
+                    "user_id": row.user_id,
+                    "original_text": texts.get(row.original_hash),
+                    "processed_text": texts.get(row.processed_hash),
+                    "ai_probability": row.ai_probability,
+                    "processing_time": row.processing_time,
+                    "created_at": row.created_at
+                }
+                for row in rows
+            ],
+            "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+        }
+
+# 全局历史存储实例
+history_store = HistoryStore()
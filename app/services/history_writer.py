@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.services.history_store import history_store
+
+logger = logging.getLogger(__name__)
+
+# 关闭信号，放入队列后写入器排空剩余记录并退出
+_STOP = object()
+
+class HistoryWriter:
+    """处理历史的后台批量写入器（write-behind）
+
+    请求只把记录放入内存队列，后台任务攒够 history_batch_size 条或等待 history_flush_interval
+    秒后，通过 history_store 一次批量插入。数据库延迟不再计入请求耗时；队列满时丢弃新记录而不阻塞请求。
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.counters = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "dropped": 0,
+            "failed": 0
+        }
+        self.last_flush_ms = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """启动后台写入任务（lifespan 启动时调用）"""
+        if self.is_running:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.history_queue_max_size)
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"🗄️ 历史写入器已启动: 批量 {settings.history_batch_size}, "
+            f"间隔 {settings.history_flush_interval}s"
+        )
+
+    def enqueue(
+        self,
+        user_id: str,
+        original_text: str,
+        processed_text: str,
+        ai_probability: float,
+        processing_time: float
+    ) -> bool:
+        """记录一条处理历史（不等待写入），返回是否已入队"""
+        if self._closing:
+            self.counters["dropped"] += 1
+            return False
+        if not self.is_running:
+            # 未经 lifespan 启动时（如脚本中直接调用）在当前事件循环中按需启动
+            self._queue = asyncio.Queue(maxsize=settings.history_queue_max_size)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+        record = {
+            "user_id": user_id,
+            "original_text": original_text,
+            "processed_text": processed_text,
+            "ai_probability": ai_probability,
+            "processing_time": processing_time,
+            "created_at": datetime.utcnow()
+        }
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+            logger.warning("⚠️ 历史写入队列已满，丢弃记录")
+            return False
+
+        self.counters["enqueued"] += 1
+        return True
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + settings.history_flush_interval
+            while len(batch) < settings.history_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+        # 排空关闭信号之前已入队的记录
+        remaining_records = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining_records.append(item)
+        for i in range(0, len(remaining_records), settings.history_batch_size):
+            await self._flush(remaining_records[i:i + settings.history_batch_size])
+
+    async def _flush(self, batch: List[Dict]):
+        start_time = time.perf_counter()
+        try:
+            await history_store.write(batch)
+        except Exception as e:
+            self.counters["failed"] += len(batch)
+            logger.error(f"❌ 历史记录写入失败（{len(batch)}条）: {e}")
+            return
+
+        self.last_flush_ms = (time.perf_counter() - start_time) * 1000
+        self.counters["written"] += len(batch)
+        self.counters["batches"] += 1
+        logger.debug(f"🗄️ 写入历史记录 {len(batch)}条, 耗时 {self.last_flush_ms:.2f}ms")
+
+    async def stop(self):
+        """排空队列并停止后台任务（lifespan 关闭时调用）"""
+        if not self.is_running:
+            return
+
+        self._closing = True
+        await self._queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._task, settings.history_drain_timeout)
+        except asyncio.TimeoutError:
+            self.counters["dropped"] += self._queue.qsize()
+            logger.warning(f"⚠️ 历史写入器排空超时，丢弃 {self._queue.qsize()} 条记录")
+        self._task = None
+        logger.info(f"🗄️ 历史写入器已停止: 共写入 {self.counters['written']} 条")
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.is_running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            **self.counters
+        }
+
+# 全局历史写入器实例
+history_writer = HistoryWriter()
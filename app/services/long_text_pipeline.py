@@ -0,0 +1,161 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+from app.core.config import settings
+from app.services.deepseek_processor import deepseek_processor
+from app.services.metrics import metrics
+from app.services.scheduler import INTERACTIVE
+from app.utils.text_segmenter import TextChunk, chunk_text
+
+logger = logging.getLogger(__name__)
+
+# 进度回调可以是普通函数或协程函数（需要访问 Redis 等阻塞操作时在回调内自行放到线程池）
+ProgressCallback = Callable[..., Union[None, Awaitable[None]]]
+
+async def _notify(callback: ProgressCallback, *args: Any):
+    result = callback(*args)
+    if inspect.isawaitable(result):
+        await result
+
+class LongTextPipeline:
+    """长文本分段润色流水线
+
+    按段落和句子边界切分为 token 预算内的分段，在并发上限内并行润色，
+    再按原顺序拼接，并报告每个分段的耗时。
+    """
+
+    def __init__(self, processor=deepseek_processor):
+        self.processor = processor
+
+    def split(self, text: str) -> List[TextChunk]:
+        """按段落和句子边界切分为 token 预算内的分段"""
+        return chunk_text(
+            text,
+            max_tokens=settings.long_text_chunk_tokens,
+            overlap_sentences=settings.long_text_overlap_sentences
+        )
+
+    async def process_text(
+        self,
+        text: str,
+        style: str = "academic",
+        use_cache: bool = True,
+        on_progress: Optional[ProgressCallback] = None,
+        preference: str = "auto",
+        priority: str = INTERACTIVE,
+        client_id: str = "anonymous"
+    ) -> Dict:
+        """分段润色长文本，每完成一个分段以 (已完成数, 总段数) 调用 on_progress"""
+        start_time = time.time()
+
+        chunks = self.split(text)
+        logger.info(
+            f"✂️ 长文本分段: {len(text)}字符 → {len(chunks)}段, "
+            f"并发 {settings.long_text_concurrency}"
+        )
+
+        completed = 0
+
+        async def report(chunk: TextChunk, result: Dict):
+            nonlocal completed
+            completed += 1
+            if on_progress is not None:
+                await _notify(on_progress, completed, len(chunks))
+
+        results = await self.process_chunks(
+            chunks, style, use_cache, report, preference, priority, client_id
+        )
+        return self.assemble(chunks, results, style, start_time)
+
+    async def process_chunks(
+        self,
+        chunks: List[TextChunk],
+        style: str = "academic",
+        use_cache: bool = True,
+        on_chunk_done: Optional[ProgressCallback] = None,
+        preference: str = "auto",
+        priority: str = INTERACTIVE,
+        client_id: str = "anonymous"
+    ) -> List[Dict]:
+        """在并发上限内并行润色一组分段，按输入顺序返回结果，每完成一个分段调用 on_chunk_done"""
+        semaphore = asyncio.Semaphore(settings.long_text_concurrency)
+
+        async def process_and_report(chunk: TextChunk) -> Dict:
+            result = await self._process_chunk(
+                chunk, style, semaphore, use_cache, preference, priority, client_id
+            )
+            if on_chunk_done is not None:
+                await _notify(on_chunk_done, chunk, result)
+            return result
+
+        return await asyncio.gather(*[process_and_report(chunk) for chunk in chunks])
+
+    def assemble(self, chunks: List[TextChunk], results: List[Dict], style: str, start_time: float) -> Dict:
+        """按原顺序拼接各分段的结果"""
+        # 保留原文开头、段落之间和末尾的空白
+        processed_text = "".join(
+            chunk.separator + result["text"] + chunk.trailing
+            for chunk, result in zip(chunks, results)
+        )
+
+        # AI 概率按分段字符数加权平均
+        total_chars = sum(len(chunk.text) for chunk in chunks) or 1
+        ai_score = sum(
+            result["ai_score"] * len(chunk.text)
+            for chunk, result in zip(chunks, results)
+        ) / total_chars
+
+        api_used = sorted({result.get("api_used", "未知") for result in results})
+
+        return {
+            "text": processed_text,
+            "ai_score": min(max(ai_score, 0.0), 1.0),
+            "processing_time": time.time() - start_time,
+            "api_used": " + ".join(api_used),
+            "style_used": style,
+            "chunks": [
+                self._chunk_report(chunk, result)
+                for chunk, result in zip(chunks, results)
+            ]
+        }
+
+    async def _process_chunk(
+        self,
+        chunk: TextChunk,
+        style: str,
+        semaphore: asyncio.Semaphore,
+        use_cache: bool,
+        preference: str = "auto",
+        priority: str = INTERACTIVE,
+        client_id: str = "anonymous"
+    ) -> Dict:
+        queued_at = time.perf_counter()
+        async with semaphore:
+            metrics.queue_wait.observe(time.perf_counter() - queued_at, queue="long_text")
+            result = await self.processor.process_text(
+                chunk.text,
+                style,
+                use_cache=use_cache,
+                context=chunk.context,
+                preference=preference,
+                priority=priority,
+                client_id=client_id
+            )
+            logger.info(f"✅ 第{chunk.index+1}段完成: {result['processing_time']:.2f}s")
+            return result
+
+    def _chunk_report(self, chunk: TextChunk, result: Dict) -> Dict:
+        return {
+            "index": chunk.index,
+            "input_chars": len(chunk.text),
+            "output_chars": len(result["text"]),
+            "estimated_tokens": chunk.estimated_tokens,
+            "processing_time": result["processing_time"],
+            "api_used": result.get("api_used", "未知"),
+            "cache_hit": bool(result.get("cache_hit"))
+        }
+
+# 全局长文本流水线实例
+long_text_pipeline = LongTextPipeline()
@@ -0,0 +1,190 @@
+import bisect
+import math
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+# 延迟直方图的默认分桶（秒），覆盖本地处理的毫秒级到上游推理的数十秒
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Counter:
+    """单调递增计数器
+
+    记录只是一次字典读写，不加锁：API 进程中所有记录都在事件循环线程内完成。
+    """
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labelnames), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """直方图：每次观测只累加一个分桶，输出时再计算累计值"""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签对应 [各分桶计数..., +Inf 计数, 总和]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels.get(name, "")) for name in self.labelnames))
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class CallbackGauge:
+    """输出时调用回调取值的仪表，用于连接池、熔断器等已有状态
+
+    回调返回单个数值，或 {标签值元组: 数值} 字典。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        callback: Callable[[], Union[float, Dict[Tuple[str, ...], float]]],
+        labelnames: Sequence[str] = ()
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Metrics:
+    """进程内指标注册表，按 Prometheus 文本格式输出，不依赖外部服务"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Union[Counter, Histogram, CallbackGauge]] = {}
+
+        # 请求与上游耗时
+        self.request_latency = self._register(Histogram(
+            "http_request_duration_seconds", "按路由统计的请求耗时（流式响应为首字节时间）",
+            ("method", "route")
+        ))
+        self.requests = self._register(Counter(
+            "http_requests_total", "按路由和状态码统计的请求数", ("method", "route", "status")
+        ))
+        self.upstream_ttfb = self._register(Histogram(
+            "upstream_ttfb_seconds", "上游从发出请求到收到响应头的时间", ("mode",)
+        ))
+        self.upstream_latency = self._register(Histogram(
+            "upstream_request_duration_seconds", "上游请求总耗时（流式为读完响应体）", ("mode",)
+        ))
+        self.queue_wait = self._register(Histogram(
+            "queue_wait_seconds", "在各个排队点的等待时间", ("queue",)
+        ))
+
+        # 结果与错误
+        self.upstream_errors = self._register(Counter(
+            "upstream_errors_total", "上游错误数（status 为状态码、timeout 或 network）", ("status",)
+        ))
+        self.fallbacks = self._register(Counter(
+            "fallback_activations_total", "降级到本地改写引擎的次数", ("reason",)
+        ))
+        self.api_used = self._register(Counter(
+            "api_used_total", "按实际使用的服务统计的处理结果数", ("api",)
+        ))
+        self.cache_lookups = self._register(Counter(
+            "result_cache_lookups_total", "结果缓存查询数（memory_hit、redis_hit 或 miss）", ("result",)
+        ))
+        self.hedges = self._register(Counter(
+            "upstream_hedges_total", "对冲请求数（sent、won、lost、budget_skipped、rate_limited）", ("outcome",)
+        ))
+        self.truncations = self._register(Counter(
+            "upstream_truncations_total", "因达到 max_tokens 被截断的上游输出数", ("mode",)
+        ))
+        self.tokens = self._register(Counter(
+            "upstream_tokens_total", "上游返回的 usage 中的 token 数", ("type",)
+        ))
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def gauge(self, name: str, help_text: str, callback: Callable, labelnames: Sequence[str] = ()):
+        """注册回调仪表（同名重复注册时覆盖）"""
+        self._register(CallbackGauge(name, help_text, callback, labelnames))
+
+    def record_usage(self, usage: Dict):
+        """累加火山引擎 API 返回的 usage 字段"""
+        if not usage:
+            return
+        self.tokens.inc(usage.get("prompt_tokens", 0), type="prompt")
+        self.tokens.inc(usage.get("completion_tokens", 0), type="completion")
+        details = usage.get("completion_tokens_details") or {}
+        if details.get("reasoning_tokens"):
+            self.tokens.inc(details["reasoning_tokens"], type="reasoning")
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# 全局指标实例
+metrics = Metrics()
@@ -0,0 +1,101 @@
+import logging
+from typing import Dict
+from app.core.config import settings
+from app.utils.token_estimator import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+FAST_LANE = "fast"
+REASONING_LANE = "reasoning"
+
+# 客户端可以通过 preference 指定偏好，auto 表示由路由决定
+PREFERENCES = ("auto", "quality", "speed")
+
+class ModelLane:
+    """一条模型通道：对应一个模型 ID，并有独立的并发上限
+
+    并发上限由 scheduler 在放行请求时检查（与优先级排队在同一处决定顺序），in_flight 由其维护。
+    """
+
+    def __init__(self, name: str, title: str, model_id: str, concurrency: int):
+        self.name = name
+        self.title = title
+        self.model_id = model_id
+        self.concurrency = concurrency
+        self.in_flight = 0
+
+    @property
+    def api_used(self) -> str:
+        return f"火山引擎 {self.model_id} API（{self.title}）"
+
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight >= self.concurrency
+
+class ModelRouter:
+    """按请求选择模型通道
+
+    短文本和口语化风格走非推理的快速模型，学术风格和长文本走 DeepSeek-R1；
+    客户端的 quality/speed 偏好优先，未指定偏好时所选通道已满则溢出到另一条有空闲的通道。
+    """
+
+    def __init__(self):
+        self.lanes = {
+            FAST_LANE: ModelLane(
+                FAST_LANE, "快速通道", settings.fast_model_id, settings.fast_lane_concurrency
+            ),
+            REASONING_LANE: ModelLane(
+                REASONING_LANE, "推理通道", settings.deepseek_model_id, settings.reasoning_lane_concurrency
+            )
+        }
+        self.counters = {
+            FAST_LANE: 0,
+            REASONING_LANE: 0,
+            "spilled": 0
+        }
+
+    def _preferred_lane(self, text: str, style: str, preference: str) -> str:
+        if preference == "quality":
+            return REASONING_LANE
+        if preference == "speed":
+            return FAST_LANE
+
+        tokens = estimate_tokens(text)
+        if tokens <= settings.fast_lane_short_tokens:
+            return FAST_LANE
+        if style in settings.fast_lane_styles.split(",") and tokens <= settings.fast_lane_max_tokens:
+            return FAST_LANE
+        return REASONING_LANE
+
+    def route(self, text: str, style: str = "academic", preference: str = "auto") -> ModelLane:
+        """为一次请求选择模型通道"""
+        if not settings.model_routing_enabled:
+            return self.lanes[REASONING_LANE]
+
+        name = self._preferred_lane(text, style, preference)
+        if preference == "auto" and self.lanes[name].saturated:
+            other = FAST_LANE if name == REASONING_LANE else REASONING_LANE
+            if not self.lanes[other].saturated:
+                logger.info(f"🔀 {self.lanes[name].title}已满，溢出到{self.lanes[other].title}")
+                self.counters["spilled"] += 1
+                name = other
+
+        self.counters[name] += 1
+        return self.lanes[name]
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": settings.model_routing_enabled,
+            "lanes": {
+                name: {
+                    "model_id": lane.model_id,
+                    "in_flight": lane.in_flight,
+                    "concurrency": lane.concurrency
+                }
+                for name, lane in self.lanes.items()
+            },
+            "routed": dict(self.counters)
+        }
+
+# 全局模型路由实例
+model_router = ModelRouter()
@@ -0,0 +1,381 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from app.core.config import settings
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 可以重试的上游状态码
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class UpstreamError(Exception):
+    """上游调用失败
+
+    status_code 为空表示网络层错误；retry_after 为上游 Retry-After 头给出的等待秒数。
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        retryable: Optional[bool] = None
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        if retryable is None:
+            retryable = status_code is None or status_code in RETRYABLE_STATUS_CODES
+        self.retryable = retryable
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """是否计入熔断统计：5xx、超时和网络错误说明上游不健康；4xx（含 429 限流）和本地错误不计入"""
+    return isinstance(error, UpstreamError) and (error.status_code is None or error.status_code >= 500)
+
+class CircuitOpenError(Exception):
+    """熔断器打开，请求直接降级"""
+
+class RateLimitExceeded(Exception):
+    """客户端限流等待超时"""
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（仅支持秒数格式）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+class TokenBucket:
+    """令牌桶：rate 为每秒补充的令牌数，capacity 为桶容量"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, amount: float) -> float:
+        """预占令牌，返回需要等待的秒数（令牌可以透支，由等待时间偿还）"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+    @property
+    def saturation(self) -> float:
+        """桶的使用率：0 表示满桶，1 表示耗尽"""
+        self._refill()
+        return round(min(1.0, max(0.0, 1 - self.tokens / self.capacity)), 4)
+
+class RateLimiter:
+    """客户端限流：同时限制每秒请求数（RPS）和每分钟 token 数（TPM）"""
+
+    def __init__(self, rps: float, tpm: int, max_wait: float):
+        self.requests = TokenBucket(rate=rps, capacity=max(1.0, rps))
+        self.tokens = TokenBucket(rate=tpm / 60.0, capacity=float(tpm))
+        self.max_wait = max_wait
+
+        self.counters = {
+            "admitted": 0,
+            "delayed": 0,
+            "rejected": 0
+        }
+
+    async def acquire(self, tokens: int):
+        """获取一次请求和 tokens 个 token 的额度，等待超过 max_wait 时拒绝"""
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait > self.max_wait:
+            self.requests.refund(1)
+            self.tokens.refund(tokens)
+            self.counters["rejected"] += 1
+            raise RateLimitExceeded(f"上游限流，需等待 {wait:.2f}s")
+
+        metrics.queue_wait.observe(wait, queue="rate_limiter")
+        if wait > 0:
+            self.counters["delayed"] += 1
+            await asyncio.sleep(wait)
+        self.counters["admitted"] += 1
+
+    def try_acquire(self, tokens: int) -> bool:
+        """不等待地获取额度（用于对冲等可选请求），额度不足时返回 False"""
+        if max(self.requests.reserve(1), self.tokens.reserve(tokens)) > 0:
+            self.requests.refund(1)
+            self.tokens.refund(tokens)
+            return False
+        self.counters["admitted"] += 1
+        return True
+
+    def stats(self) -> Dict:
+        return {
+            "rps_saturation": self.requests.saturation,
+            "tpm_saturation": self.tokens.saturation,
+            **self.counters
+        }
+
+class CircuitBreaker:
+    """熔断器
+
+    在最近 window 次调用中，失败率或慢调用率超过阈值时打开；打开 open_seconds 后进入半开状态，
+    放行少量探测请求，全部成功则关闭，任一失败则重新打开。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        window: int,
+        min_calls: int,
+        failure_rate: float,
+        slow_call_seconds: float,
+        slow_call_rate: float,
+        open_seconds: float,
+        half_open_calls: int
+    ):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self.state = self.CLOSED
+        # 每次状态变化加一，重试据此判断首次放行时占用的探测名额是否仍然有效
+        self.generation = 0
+        self.opened_at = 0.0
+        # 每项为 (是否失败, 是否慢调用)
+        self._outcomes: deque = deque(maxlen=window)
+        self._probes_started = 0
+        self._probes_succeeded = 0
+
+        self.counters = {
+            "opened": 0,
+            "short_circuited": 0
+        }
+
+    def allow(self) -> bool:
+        """判断是否放行一次调用"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.counters["short_circuited"] += 1
+                return False
+            self._transition(self.HALF_OPEN)
+
+        if self.state == self.HALF_OPEN:
+            if self._probes_started >= self.half_open_calls:
+                self.counters["short_circuited"] += 1
+                return False
+            self._probes_started += 1
+
+        return True
+
+    def allow_retry(self, generation: int) -> bool:
+        """判断是否放行同一次调用的重试
+
+        重试沿用首次放行时占用的探测名额：熔断器关闭，或首次放行后状态未变化时放行，不再重新占用名额。
+        """
+        if self.state == self.CLOSED or (self.state == self.HALF_OPEN and self.generation == generation):
+            return True
+        self.counters["short_circuited"] += 1
+        return False
+
+    def record_success(self, latency: float):
+        slow = latency >= self.slow_call_seconds
+        if self.state == self.HALF_OPEN:
+            if slow:
+                self._transition(self.OPEN)
+                return
+            self._probes_succeeded += 1
+            if self._probes_succeeded >= self.half_open_calls:
+                self._transition(self.CLOSED)
+            return
+
+        self._outcomes.append((False, slow))
+        self._evaluate()
+
+    def record_failure(self):
+        if self.state == self.HALF_OPEN:
+            self._transition(self.OPEN)
+            return
+
+        self._outcomes.append((True, False))
+        self._evaluate()
+
+    def record_cancelled(self):
+        """调用被取消（如客户端断开）时归还半开探测名额"""
+        if self.state == self.HALF_OPEN and self._probes_started > 0:
+            self._probes_started -= 1
+
+    def record_error(self, error: BaseException):
+        """按错误类型记录：上游故障计为失败，其余错误不计入统计，只归还半开探测名额"""
+        if is_upstream_failure(error):
+            self.record_failure()
+        else:
+            self.record_cancelled()
+
+    def _evaluate(self):
+        if self.state != self.CLOSED or len(self._outcomes) < self.min_calls:
+            return
+
+        total = len(self._outcomes)
+        failures = sum(1 for failed, _ in self._outcomes if failed)
+        slow = sum(1 for _, is_slow in self._outcomes if is_slow)
+        if failures / total >= self.failure_rate or slow / total >= self.slow_call_rate:
+            self._transition(self.OPEN)
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+
+        logger.warning(f"⚡ 熔断器状态: {self.state} → {state}")
+        self.state = state
+        self.generation += 1
+        self._probes_started = 0
+        self._probes_succeeded = 0
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+            self.counters["opened"] += 1
+        elif state == self.CLOSED:
+            self._outcomes.clear()
+
+    def stats(self) -> Dict:
+        total = len(self._outcomes)
+        failures = sum(1 for failed, _ in self._outcomes if failed)
+        return {
+            "state": self.state,
+            "window_calls": total,
+            "window_failure_rate": round(failures / total, 4) if total else 0.0,
+            **self.counters
+        }
+
+class UpstreamGuard:
+    """上游调用保护：熔断 → 限流 → 带抖动的重试"""
+
+    def __init__(self):
+        self.limiter = RateLimiter(
+            rps=settings.upstream_rate_limit_rps,
+            tpm=settings.upstream_rate_limit_tpm,
+            max_wait=settings.upstream_rate_limit_max_wait
+        )
+        self.breaker = CircuitBreaker(
+            window=settings.circuit_breaker_window,
+            min_calls=settings.circuit_breaker_min_calls,
+            failure_rate=settings.circuit_breaker_failure_rate,
+            slow_call_seconds=settings.circuit_breaker_slow_call_seconds,
+            slow_call_rate=settings.circuit_breaker_slow_call_rate,
+            open_seconds=settings.circuit_breaker_open_seconds,
+            half_open_calls=settings.circuit_breaker_half_open_calls
+        )
+        self.counters = {
+            "calls": 0,
+            "retries": 0,
+            "failures": 0
+        }
+
+    async def admit(self, tokens: int, generation: Optional[int] = None) -> int:
+        """检查熔断器并获取限流额度（流式调用等不需要重试的场景直接使用）
+
+        返回放行时熔断器的状态代数；重试时传入首次放行返回的值，不再占用新的半开探测名额。
+        """
+        if generation is None:
+            allowed = self.breaker.allow()
+        else:
+            allowed = self.breaker.allow_retry(generation)
+        if not allowed:
+            raise CircuitOpenError("上游熔断中，直接降级")
+        generation = self.breaker.generation
+        try:
+            await self.limiter.acquire(tokens)
+        except BaseException:
+            self.breaker.record_cancelled()
+            raise
+        return generation
+
+    def _backoff(self, previous: float, error: UpstreamError) -> float:
+        """decorrelated jitter 退避，并遵守 Retry-After"""
+        base = settings.upstream_retry_base_delay
+        delay = min(settings.upstream_retry_max_delay, random.uniform(base, previous * 3))
+        if error.retry_after is not None:
+            delay = max(delay, error.retry_after)
+        return delay
+
+    async def call(self, factory: Callable[[], Awaitable[T]], tokens: int) -> T:
+        """在熔断、限流和重试保护下执行上游调用
+
+        只有 5xx、超时和网络错误计入熔断统计；一次调用（含重试）只占用一个半开探测名额。
+        """
+        deadline = time.monotonic() + settings.upstream_retry_deadline
+        delay = settings.upstream_retry_base_delay
+        attempt = 0
+        generation = None
+
+        while True:
+            attempt += 1
+            generation = await self.admit(tokens, generation)
+            self.counters["calls"] += 1
+
+            start_time = time.monotonic()
+            try:
+                result = await factory()
+            except UpstreamError as e:
+                self.counters["failures"] += 1
+
+                if not e.retryable or attempt >= settings.upstream_retry_max_attempts:
+                    self.breaker.record_error(e)
+                    raise
+                delay = self._backoff(delay, e)
+                if time.monotonic() + delay > deadline:
+                    self.breaker.record_error(e)
+                    raise
+                # 重试前只记录上游故障，4xx（如 429）继续持有探测名额直到调用结束
+                if is_upstream_failure(e):
+                    self.breaker.record_failure()
+
+                self.counters["retries"] += 1
+                logger.warning(f"🔁 上游调用失败，{delay:.2f}s 后第{attempt}次重试: {e}")
+                try:
+                    await asyncio.sleep(delay)
+                except asyncio.CancelledError:
+                    # 退避等待期间被取消，同样归还探测名额
+                    self.breaker.record_cancelled()
+                    raise
+                continue
+            except asyncio.CancelledError:
+                self.breaker.record_cancelled()
+                raise
+            except Exception as e:
+                self.counters["failures"] += 1
+                self.breaker.record_error(e)
+                raise
+
+            self.breaker.record_success(time.monotonic() - start_time)
+            return result
+
+    def stats(self) -> Dict:
+        return {
+            "circuit_breaker": self.breaker.stats(),
+            "rate_limiter": self.limiter.stats(),
+            **self.counters
+        }
+
+# 全局上游保护实例
+upstream_guard = UpstreamGuard()
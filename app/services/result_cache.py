@@ -0,0 +1,207 @@
+import hashlib
+import json
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Redis 不可用时，暂停访问的时间（秒），避免每个请求都等待连接超时
+_REDIS_RETRY_INTERVAL = 30.0
+
+_HORIZONTAL_SPACE = re.compile(r"[ \t　]+")
+
+def normalize_text(text: str) -> str:
+    """标准化文本，使仅有空白差异的输入命中同一缓存项"""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    lines = [_HORIZONTAL_SPACE.sub(" ", line).strip() for line in text.split("\n")]
+    return "\n".join(lines).strip()
+
+class ResultCache:
+    """两级内容寻址结果缓存
+
+    第一级为进程内 LRU（按条目数、字节数和 TTL 淘汰），
+    第二级为可选的 Redis（使用 settings.redis_url），多个 worker 共享。
+    """
+
+    def __init__(self):
+        self.enabled = settings.result_cache_enabled
+        self.max_entries = settings.result_cache_max_entries
+        self.max_bytes = settings.result_cache_max_bytes
+        self.ttl = settings.result_cache_ttl
+
+        # key -> (过期时间, 字节数, 值)
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict]]" = OrderedDict()
+        self._bytes = 0
+
+        self._redis = None
+        self._redis_retry_at = 0.0
+
+        self.counters = {
+            "memory_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions_lru": 0,
+            "evictions_expired": 0,
+            "redis_errors": 0
+        }
+
+    def make_key(
+        self,
+        namespace: str,
+        text: str,
+        style: str,
+        model_id: str,
+        prompt_version: str,
+        context: str = ""
+    ) -> str:
+        """根据标准化文本、风格、模型、提示词版本（及可选上文）生成缓存键"""
+        digest = hashlib.sha256()
+        for part in (normalize_text(text), style or "", model_id, prompt_version, normalize_text(context)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return f"result-cache:{namespace}:{digest.hexdigest()}"
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """查询缓存，先查进程内 LRU，再查 Redis"""
+        if not self.enabled:
+            return None
+
+        value = self._memory_get(key)
+        if value is not None:
+            self.counters["memory_hits"] += 1
+            metrics.cache_lookups.inc(result="memory_hit")
+            return value
+
+        value = await self._redis_get(key)
+        if value is not None:
+            self.counters["redis_hits"] += 1
+            metrics.cache_lookups.inc(result="redis_hit")
+            self._memory_set(key, value, self.ttl)
+            return value
+
+        self.counters["misses"] += 1
+        metrics.cache_lookups.inc(result="miss")
+        return None
+
+    async def set(self, key: str, value: Dict, ttl: Optional[int] = None):
+        """写入缓存（两级同时写入）"""
+        if not self.enabled:
+            return
+
+        ttl = ttl or self.ttl
+        self.counters["sets"] += 1
+        self._memory_set(key, value, ttl)
+        await self._redis_set(key, value, ttl)
+
+    def _memory_get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.counters["evictions_expired"] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: Dict, ttl: int):
+        size = len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + ttl, size, value)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.counters["evictions_lru"] += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _get_redis(self):
+        if not settings.result_cache_redis_enabled or time.monotonic() < self._redis_retry_at:
+            return None
+
+        if self._redis is None:
+            try:
+                import redis.asyncio as aioredis
+            except ImportError:
+                logger.warning("⚠️ 未安装 redis，结果缓存仅使用进程内缓存")
+                self._redis_retry_at = float("inf")
+                return None
+            self._redis = aioredis.from_url(
+                settings.redis_url,
+                socket_connect_timeout=0.5,
+                socket_timeout=0.5
+            )
+        return self._redis
+
+    def _redis_failed(self, e: Exception):
+        self.counters["redis_errors"] += 1
+        self._redis_retry_at = time.monotonic() + _REDIS_RETRY_INTERVAL
+        logger.warning(f"⚠️ Redis 缓存不可用，{_REDIS_RETRY_INTERVAL:.0f}s 内跳过: {e}")
+
+    async def _redis_get(self, key: str) -> Optional[Dict]:
+        redis = self._get_redis()
+        if redis is None:
+            return None
+        try:
+            data = await redis.get(key)
+            return json.loads(data) if data else None
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+
+    async def _redis_set(self, key: str, value: Dict, ttl: int):
+        redis = self._get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.set(key, json.dumps(value, ensure_ascii=False), ex=ttl)
+        except Exception as e:
+            self._redis_failed(e)
+
+    async def close(self):
+        """关闭 Redis 连接（lifespan 关闭时调用）"""
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def clear(self):
+        """清空进程内缓存"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict:
+        """缓存统计信息"""
+        hits = self.counters["memory_hits"] + self.counters["redis_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            "enabled": self.enabled,
+            "redis_enabled": settings.result_cache_redis_enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            **self.counters
+        }
+
+# 全局结果缓存实例
+result_cache = ResultCache()
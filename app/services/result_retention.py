@@ -0,0 +1,123 @@
+import logging
+import time
+from typing import Callable, List
+from app.core.config import settings
+from app.services.blob_store import blob_key
+from app.services.task_serializer import reference_digest
+
+logger = logging.getLogger(__name__)
+
+# 结果索引：有序集合 task_id -> 写入时间，哈希 task_id -> 字节数，哈希 task_id -> 引用的 blob 哈希，以及字节总数
+INDEX_KEY = "celery-results:index"
+SIZES_KEY = "celery-results:sizes"
+BLOBS_KEY = "celery-results:blobs"
+TOTAL_KEY = "celery-results:bytes"
+# 每轮淘汰的最大结果数
+_EVICT_BATCH = 100
+# Redis 出错后暂停访问的时间（秒）
+_REDIS_RETRY_INTERVAL = 30.0
+
+class ResultRetention:
+    """任务结果的总量上限
+
+    result_expires 只限制单个结果的保留时间。worker 在任务结束后把结果登记到 Redis 索引，
+    结果数超过 celery_result_max_count 或总字节数超过 celery_result_max_bytes 时从最早的结果开始删除，
+    使结果后端占用的内存有确定的上限。字节数按后端中实际存储的大小计算，
+结果按引用存储在 blob 中时包括 blob 的大小，删除结果时一并删除 blob。
+    """
+
+    def __init__(self):
+        self._redis = None
+        self._retry_at = 0.0
+        self.counters = {
+            "tracked": 0,
+            "evicted": 0,
+            "errors": 0
+        }
+
+    def _get_redis(self):
+        if time.monotonic() < self._retry_at:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+            except ImportError:
+                logger.warning("⚠️ 未安装 redis，不限制任务结果总量")
+                self._retry_at = float("inf")
+                return None
+            self._redis = redis.Redis.from_url(
+                settings.redis_url,
+                socket_connect_timeout=0.5,
+                socket_timeout=2.0
+            )
+        return self._redis
+
+    def _failed(self, e: Exception):
+        self.counters["errors"] += 1
+        self._retry_at = time.monotonic() + _REDIS_RETRY_INTERVAL
+        logger.warning(f"⚠️ 任务结果索引不可用，{_REDIS_RETRY_INTERVAL:.0f}s 内跳过: {e}")
+
+    def track(self, task_id: str, result_key: Callable[[str], bytes]):
+        """登记一个已写入的结果，超出上限时删除最早的结果；result_key 返回任务结果在后端中的键"""
+        redis = self._get_redis()
+        if redis is None:
+            return
+        try:
+            stored = redis.get(result_key(task_id))
+            if stored is None:
+                return
+            size = len(stored)
+            digest = reference_digest(stored)
+            if digest is not None:
+                size += redis.strlen(blob_key(digest))
+                redis.hset(BLOBS_KEY, task_id, digest)
+            redis.zadd(INDEX_KEY, {task_id: time.time()})
+            previous = redis.hget(SIZES_KEY, task_id)
+            redis.hset(SIZES_KEY, task_id, size)
+            redis.incrby(TOTAL_KEY, size - int(previous or 0))
+            self.counters["tracked"] += 1
+            self._trim(redis, result_key)
+        except Exception as e:
+            self._failed(e)
+
+    def _evict(self, redis, task_ids: List[str], result_key: Callable[[str], bytes], delete_results: bool):
+        sizes = redis.hmget(SIZES_KEY, task_ids)
+        digests = redis.hmget(BLOBS_KEY, task_ids)
+        redis.zrem(INDEX_KEY, *task_ids)
+        redis.hdel(SIZES_KEY, *task_ids)
+        redis.hdel(BLOBS_KEY, *task_ids)
+        redis.decrby(TOTAL_KEY, sum(int(size or 0) for size in sizes))
+        if delete_results:
+            # 引用的 blob 与结果同时删除；内容相同的 blob 被其他结果共享时，那些结果也随之失效
+            keys = [result_key(task_id) for task_id in task_ids]
+            keys += [blob_key(self._decode(digest)) for digest in digests if digest]
+            redis.delete(*keys)
+            self.counters["evicted"] += len(task_ids)
+
+    def _trim(self, redis, result_key: Callable[[str], bytes]):
+        # 已按 result_expires 过期的结果只清理索引（结果引用的 blob 过期时间不超过 result_expires）
+        expired = redis.zrangebyscore(
+            INDEX_KEY, "-inf", time.time() - settings.celery_result_expires, start=0, num=_EVICT_BATCH
+        )
+        if expired:
+            self._evict(redis, [self._decode(task_id) for task_id in expired], result_key, False)
+
+        while True:
+            count = redis.zcard(INDEX_KEY)
+            total = int(redis.get(TOTAL_KEY) or 0)
+            excess = count - settings.celery_result_max_count
+            if excess <= 0 and total <= settings.celery_result_max_bytes:
+                return
+            oldest = redis.zrange(INDEX_KEY, 0, min(max(excess, 1), _EVICT_BATCH) - 1)
+            if not oldest:
+                return
+            task_ids = [self._decode(task_id) for task_id in oldest]
+            self._evict(redis, task_ids, result_key, True)
+            logger.info(f"🧹 任务结果超出上限，删除最早的 {len(task_ids)} 个结果")
+
+    @staticmethod
+    def _decode(value) -> str:
+        return value.decode() if isinstance(value, bytes) else value
+
+# 全局任务结果保留策略实例
+result_retention = ResultRetention()
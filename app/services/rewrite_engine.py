@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import re
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 规则文件目录：common.json 为所有风格共用，其余文件名即风格 ID
+RULES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "rewrite")
+# 两次检查规则文件是否变化的最小间隔（秒）
+_RELOAD_CHECK_INTERVAL = 1.0
+
+_CJK = r"[\u3400-\u4dbf\u4e00-\u9fff]"
+# 中文字符或全角标点
+_CJK_OR_PUNCT = r"[\u3400-\u4dbf\u4e00-\u9fff\u3000-\u303f\uff00-\uffef]"
+# 中文语境下的半角标点 → 全角标点
+_HALF_TO_FULL = {",": "，", ";": "；", ":": "：", "?": "？", "!": "！"}
+_HALF_PUNCT_AFTER_CJK = re.compile(f"(?<={_CJK_OR_PUNCT})[,;:?!]+|[,;:?!]+(?={_CJK})")
+# 成对的半角括号（括号内不跨行、不嵌套）
+_PAREN_PAIR = re.compile(r"\(([^()\n]*)\)")
+_SPACE_BETWEEN_CJK = re.compile(f"(?<={_CJK_OR_PUNCT})[ \\t]+(?={_CJK_OR_PUNCT})")
+_REPEATED_PUNCT = re.compile(r"([。，、；：！？])\1+")
+
+def _is_word_char(char: str) -> bool:
+    return char.isascii() and char.isalnum()
+
+class PhraseMatcher:
+    """Aho-Corasick 多模式匹配器
+
+    一次线性扫描找出所有短语，按“最左最长”规则不重叠地替换。
+    以字母或数字开头/结尾的英文短语要求在词边界上匹配，避免替换单词的一部分。
+    """
+
+    def __init__(self, phrases: Dict[str, str]):
+        self.replacements: List[str] = []
+        self.lengths: List[int] = []
+        self.word_bounded: List[Tuple[bool, bool]] = []
+
+        # 状态转移表、失败指针、该状态结束的模式编号、输出链（下一个有输出的后缀状态）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._pattern: List[int] = [-1]
+        self._output_link: List[int] = [-1]
+
+        for source, target in phrases.items():
+            if source:
+                self._add(source, target)
+        self._build_links()
+
+    def _add(self, source: str, target: str):
+        state = 0
+        for char in source:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._pattern.append(-1)
+                self._output_link.append(-1)
+            state = next_state
+
+        self._pattern[state] = len(self.replacements)
+        self.replacements.append(target)
+        self.lengths.append(len(source))
+        self.word_bounded.append((_is_word_char(source[0]), _is_word_char(source[-1])))
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                target = self._fail[next_state]
+                self._output_link[next_state] = target if self._pattern[target] >= 0 else self._output_link[target]
+
+    def _on_word_boundary(self, text: str, start: int, end: int, pattern: int) -> bool:
+        bound_start, bound_end = self.word_bounded[pattern]
+        if bound_start and start > 0 and _is_word_char(text[start - 1]):
+            return False
+        if bound_end and end < len(text) and _is_word_char(text[end]):
+            return False
+        return True
+
+    def replace(self, text: str) -> Tuple[str, int]:
+        """替换文本中的所有短语，返回 (结果, 替换次数)"""
+        if not self.replacements:
+            return text, 0
+
+        # 第一遍：沿输出链收集所有有效匹配，每个起始位置只保留最长的一个
+        # （不能只取每个结束位置最长的匹配：被它覆盖的较短匹配可能在左侧的替换之后仍然可用）
+        best_at_start = [-1] * len(text)
+        found = False
+        state = 0
+        goto, fail = self._goto, self._fail
+        for end, char in enumerate(text, start=1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            candidate = state if self._pattern[state] >= 0 else self._output_link[state]
+            while candidate > 0:
+                pattern = self._pattern[candidate]
+                start = end - self.lengths[pattern]
+                if self._on_word_boundary(text, start, end, pattern):
+                    previous = best_at_start[start]
+                    if previous < 0 or self.lengths[pattern] > self.lengths[previous]:
+                        best_at_start[start] = pattern
+                    found = True
+                candidate = self._output_link[candidate]
+
+        if not found:
+            return text, 0
+
+        # 第二遍：从左到右不重叠地输出替换结果
+        parts: List[str] = []
+        count = 0
+        position = 0
+        for start, pattern in enumerate(best_at_start):
+            if pattern < 0 or start < position:
+                continue
+            parts.append(text[position:start])
+            parts.append(self.replacements[pattern])
+            position = start + self.lengths[pattern]
+            count += 1
+        parts.append(text[position:])
+        return "".join(parts), count
+
+def _full_width_parens(match: re.Match) -> str:
+    """括号只成对转换：括号内有中文，或左括号前、右括号后是中文时"""
+    inner = match.group(1)
+    before = match.string[match.start() - 1:match.start()]
+    after = match.string[match.end():match.end() + 1]
+    if re.search(_CJK, inner) or re.fullmatch(_CJK_OR_PUNCT, before) or re.fullmatch(_CJK, after):
+        return f"（{inner}）"
+    return match.group(0)
+
+def normalize_punctuation(text: str) -> str:
+    """标点规范化：中文语境使用全角标点，去掉中文字符间的空格和重复标点"""
+    text = _HALF_PUNCT_AFTER_CJK.sub(lambda m: "".join(_HALF_TO_FULL[c] for c in m.group(0)), text)
+    text = _PAREN_PAIR.sub(_full_width_parens, text)
+    text = _SPACE_BETWEEN_CJK.sub("", text)
+    return _REPEATED_PUNCT.sub(r"\1", text)
+
+class RewriteEngine:
+    """本地改写引擎（上游不可用时的降级方案）
+
+    每种风格的短语替换表（叠加 common.json 中的连接词和弱化断言规则）编译为一个
+    Aho-Corasick 匹配器，线性时间完成改写；规则文件修改后自动重新编译。
+    """
+
+    def __init__(self, rules_dir: str = RULES_DIR):
+        self.rules_dir = rules_dir
+        self._matchers: Dict[str, PhraseMatcher] = {}
+        self._signature: Optional[Tuple] = None
+        self._checked_at = 0.0
+
+    def _rules_signature(self) -> Tuple:
+        files = sorted(f for f in os.listdir(self.rules_dir) if f.endswith(".json"))
+        return tuple((f, os.stat(os.path.join(self.rules_dir, f)).st_mtime_ns) for f in files)
+
+    def _load_rules(self, name: str) -> Dict:
+        path = os.path.join(self.rules_dir, f"{name}.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _ensure_current(self):
+        """按需检查规则文件，发生变化时重新编译匹配器"""
+        now = time.monotonic()
+        if self._signature is not None and now - self._checked_at < _RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+
+        signature = self._rules_signature()
+        if signature == self._signature:
+            return
+
+        common = self._load_rules("common")
+        shared_phrases = {**common.get("connectives", {}), **common.get("hedging", {})}
+
+        matchers = {"common": PhraseMatcher(shared_phrases)}
+        for filename, _ in signature:
+            style = filename[:-len(".json")]
+            if style == "common":
+                continue
+            rules = self._load_rules(style)
+            matchers[style] = PhraseMatcher({**shared_phrases, **rules.get("phrases", {})})
+
+        self._matchers = matchers
+        self._signature = signature
+        logger.info(f"📖 改写规则已编译: {', '.join(sorted(matchers))}")
+
+    def rewrite(self, text: str, style: str = "academic") -> Dict:
+        """按风格改写文本，返回改写结果和替换次数"""
+        self._ensure_current()
+        matcher = self._matchers.get(style) or self._matchers.get("academic") or self._matchers["common"]
+        rewritten, replacements = matcher.replace(text)
+        return {
+            "text": normalize_punctuation(rewritten),
+            "replacements": replacements
+        }
+
+# 全局改写引擎实例
+rewrite_engine = RewriteEngine()
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, Set, Tuple
+from app.core.config import settings
+from app.services.metrics import metrics
+from app.services.model_router import ModelLane
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKGROUND = "background"
+
+# 按优先级从高到低排列
+PRIORITIES = (INTERACTIVE, BATCH, BACKGROUND)
+
+class QueueTimeout(Exception):
+    """排队时间超过该优先级的期限"""
+
+    def __init__(self, priority: str, waited: float):
+        super().__init__(f"{priority} 请求排队 {waited:.1f}s 仍未获得上游配额")
+        self.priority = priority
+        self.waited = waited
+
+class _Waiter:
+    __slots__ = ("future", "client_id", "size", "lane", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, client_id: str, size: int, lane: Optional[ModelLane]):
+        self.future = future
+        self.client_id = client_id
+        self.size = size
+        self.lane = lane
+        self.enqueued_at = time.perf_counter()
+
+class FairScheduler:
+    """上游调用的公平排队调度器
+
+    - 优先级：interactive > batch > background，高优先级有等待时低优先级不会被放行；
+      另有 scheduler_interactive_reserve 个配额只留给 interactive，新到的交互请求无需等待批量任务结束
+    - 同一优先级内按客户端轮转，一个客户端的大批量请求不会占满该优先级的全部配额
+    - 全局限制进行中的上游请求数和请求字节数，并在放行时检查模型通道（ModelLane）的并发上限：
+      通道已满的请求继续在这里按优先级排队，而不是在通道内另外按先后排队
+    - 排队超过期限时抛出 QueueTimeout：interactive 和 batch 由调用方降级，background 直接放弃（任务可重新提交）
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.in_flight_bytes = 0
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {
+            priority: OrderedDict() for priority in PRIORITIES
+        }
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lanes: Set[ModelLane] = set()
+
+        self.counters = {
+            priority: {"admitted": 0, "timed_out": 0, "wait_total": 0.0}
+            for priority in PRIORITIES
+        }
+
+    @staticmethod
+    def deadline(priority: str) -> Optional[float]:
+        if not settings.scheduler_enabled:
+            return None
+        return getattr(settings, f"scheduler_deadline_{priority}")
+
+    def queue_depth(self, priority: str) -> int:
+        return sum(len(waiters) for waiters in self._queues[priority].values())
+
+    def _bind_loop(self):
+        # 排队的 future 绑定事件循环，切换事件循环（如测试或 Celery worker 重启循环）时清空状态
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self.in_flight = 0
+            self.in_flight_bytes = 0
+            for lane in self._lanes:
+                lane.in_flight = 0
+            for queue in self._queues.values():
+                queue.clear()
+
+    def _admit(self, priority: str, waiter: _Waiter):
+        waited = time.perf_counter() - waiter.enqueued_at
+        self.in_flight += 1
+        self.in_flight_bytes += waiter.size
+        if waiter.lane is not None:
+            waiter.lane.in_flight += 1
+            metrics.queue_wait.observe(waited, queue=f"lane_{waiter.lane.name}")
+        self.counters[priority]["admitted"] += 1
+        self.counters[priority]["wait_total"] += waited
+        metrics.queue_wait.observe(waited, queue=f"scheduler_{priority}")
+        waiter.future.set_result(None)
+
+    @staticmethod
+    def _next_waiter(queue: "OrderedDict[str, Deque[_Waiter]]") -> Optional[Tuple[str, _Waiter]]:
+        """按客户端轮转顺序找到第一个所在通道有空闲的请求"""
+        for client_id, waiters in queue.items():
+            for waiter in waiters:
+                if waiter.lane is None or not waiter.lane.saturated:
+                    return client_id, waiter
+        return None
+
+    def _dispatch(self):
+        """按优先级和客户端轮转放行排队的请求，直到达到请求数、字节数或通道并发上限
+
+        未启用调度时只检查通道并发上限，所有请求按先后放行。
+        """
+        enabled = settings.scheduler_enabled
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            limit = settings.scheduler_max_in_flight if enabled else float("inf")
+            if enabled and priority != INTERACTIVE:
+                limit -= settings.scheduler_interactive_reserve
+            while queue:
+                if self.in_flight >= limit:
+                    # 高优先级仍有等待时不放行低优先级
+                    return
+                found = self._next_waiter(queue)
+                if found is None:
+                    # 只是所需的通道已满：低优先级请求仍可使用其他通道，空出的通道配额下次仍先分给高优先级
+                    break
+                client_id, waiter = found
+                # 单个请求超过字节上限时在空闲时单独放行，避免永远排不上
+                if (
+                    enabled and self.in_flight
+                    and self.in_flight_bytes + waiter.size > settings.scheduler_max_in_flight_bytes
+                ):
+                    return
+                waiters = queue[client_id]
+                waiters.remove(waiter)
+                if waiters:
+                    queue.move_to_end(client_id)
+                else:
+                    del queue[client_id]
+                self._admit(priority, waiter)
+
+    def _remove(self, priority: str, waiter: _Waiter):
+        waiters = self._queues[priority].get(waiter.client_id)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self._queues[priority][waiter.client_id]
+        self._dispatch()
+
+    def _release(self, size: int, lane: Optional[ModelLane] = None):
+        self.in_flight -= 1
+        self.in_flight_bytes -= size
+        if lane is not None:
+            lane.in_flight -= 1
+        self._dispatch()
+
+    async def acquire(self, priority: str, client_id: str, size: int, lane: Optional[ModelLane] = None):
+        """排队获取一个上游调用配额（及所在模型通道的配额），超过期限时抛出 QueueTimeout"""
+        self._bind_loop()
+        if lane is not None:
+            self._lanes.add(lane)
+        waiter = _Waiter(self._loop.create_future(), client_id, size, lane)
+        self._queues[priority].setdefault(client_id, deque()).append(waiter)
+        self._dispatch()
+        if waiter.future.done():
+            return
+
+        try:
+            await asyncio.wait_for(waiter.future, self.deadline(priority))
+        except BaseException as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 已被放行但调用方被取消，归还配额
+                self._release(size, lane)
+            else:
+                self._remove(priority, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.counters[priority]["timed_out"] += 1
+                raise QueueTimeout(priority, time.perf_counter() - waiter.enqueued_at) from None
+            raise
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        priority: str,
+        client_id: str,
+        size: int,
+        lane: Optional[ModelLane] = None
+    ) -> AsyncIterator[None]:
+        """在调度器和模型通道的配额内执行一次上游调用
+
+        未启用调度时只按先后顺序限制通道并发，不区分优先级和客户端，也没有排队期限。
+        """
+        if not settings.scheduler_enabled:
+            priority, client_id = INTERACTIVE, ""
+        await self.acquire(priority, client_id, size, lane)
+        try:
+            yield
+        finally:
+            self._release(size, lane)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": settings.scheduler_enabled,
+            "in_flight": self.in_flight,
+            "in_flight_bytes": self.in_flight_bytes,
+            "max_in_flight": settings.scheduler_max_in_flight,
+            "classes": {
+                priority: {
+                    "queued": self.queue_depth(priority),
+                    "clients": len(self._queues[priority]),
+                    "admitted": counters["admitted"],
+                    "timed_out": counters["timed_out"],
+                    "wait_avg_ms": round(
+                        counters["wait_total"] / counters["admitted"] * 1000, 2
+                    ) if counters["admitted"] else 0.0,
+                    "deadline": self.deadline(priority)
+                }
+                for priority, counters in self.counters.items()
+            }
+        }
+
+# 全局调度器实例
+scheduler = FairScheduler()
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+class _Flight:
+    """一次进行中的上游调用及其等待者数量"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """合并相同的进行中请求
+
+    相同键的并发请求共享同一个上游调用。每个等待者通过 asyncio.shield 等待共享任务，
+    单个等待者取消（如客户端断开）不会影响其他等待者；只有全部等待者都离开时才取消上游调用。
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+
+        self.counters = {
+            "leaders": 0,
+            "coalesced": 0,
+            "abandoned": 0
+        }
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """执行或加入键为 key 的调用，返回 (结果, 是否加入了已有调用)"""
+        flight = self._flights.get(key)
+        shared = flight is not None
+
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.counters["leaders"] += 1
+        else:
+            self.counters["coalesced"] += 1
+            logger.info("🔗 合并相同的进行中请求")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # 所有等待者都已取消，上游结果已无人需要
+                flight.task.cancel()
+                self._forget(key, flight)
+                self.counters["abandoned"] += 1
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict:
+        """合并统计信息"""
+        return {
+            "in_flight": len(self._flights),
+            **self.counters
+        }
+
+# 全局请求合并实例
+single_flight = SingleFlight()
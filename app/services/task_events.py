@@ -0,0 +1,212 @@
+import asyncio
+import functools
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 任务事件频道前缀，完整频道名为 task-events:{task_id}
+CHANNEL_PREFIX = "task-events:"
+# Redis 出错后暂停重连的时间（秒）
+_REDIS_RETRY_INTERVAL = 30.0
+
+def task_channel(task_id: str) -> str:
+    return f"{CHANNEL_PREFIX}{task_id}"
+
+class TaskEventPublisher:
+    """worker 端任务事件发布器
+
+    任务状态变化和进度通过 Redis pub/sub 发布；发布失败只记录日志，客户端仍可轮询结果。
+    publish 是同步调用，供任务线程和信号处理函数使用；在 worker 事件循环内使用 publish_async。
+    """
+
+    def __init__(self):
+        self._redis = None
+        self._retry_at = 0.0
+        self.counters = {
+            "published": 0,
+            "errors": 0
+        }
+
+    def _get_redis(self):
+        if time.monotonic() < self._retry_at:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+            except ImportError:
+                logger.warning("⚠️ 未安装 redis，不推送任务事件")
+                self._retry_at = float("inf")
+                return None
+            self._redis = redis.Redis.from_url(
+                settings.redis_url,
+                socket_connect_timeout=0.5,
+                socket_timeout=0.5
+            )
+        return self._redis
+
+    def publish(self, task_id: str, status: str, **data) -> bool:
+        """发布一条任务事件，返回是否发布成功"""
+        if not task_id:
+            return False
+        redis = self._get_redis()
+        if redis is None:
+            return False
+
+        event = {"task_id": task_id, "status": status, **data}
+        try:
+            redis.publish(task_channel(task_id), json.dumps(event, ensure_ascii=False))
+        except Exception as e:
+            self.counters["errors"] += 1
+            self._retry_at = time.monotonic() + _REDIS_RETRY_INTERVAL
+            logger.warning(f"⚠️ 任务事件发布失败，{_REDIS_RETRY_INTERVAL:.0f}s 内跳过: {e}")
+            return False
+
+        self.counters["published"] += 1
+        return True
+
+    async def publish_async(self, task_id: str, status: str, **data) -> bool:
+        """在线程池中发布，同步的 Redis 调用不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.publish, task_id, status, **data)
+        )
+
+class TaskEventHub:
+    """API 进程内共享的任务事件订阅器
+
+    每个进程只用一个 Redis 连接按模式订阅所有任务频道，再按 task_id 分发到各个客户端的队列，
+    订阅连接数不随等待中的客户端数量增长。首次订阅时启动，Redis 不可用时 connected 为 False，
+    由调用方退回轮询。
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._redis = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._retry_at = 0.0
+
+        self.counters = {
+            "received": 0,
+            "delivered": 0,
+            "dropped": 0,
+            "connect_errors": 0
+        }
+
+    @property
+    def connected(self) -> bool:
+        return self._reader is not None and not self._reader.done()
+
+    async def _ensure_started(self) -> bool:
+        if self.connected:
+            return True
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+
+        async with self._start_lock:
+            if self.connected:
+                return True
+            if time.monotonic() < self._retry_at:
+                return False
+
+            await self._reset()
+            try:
+                import redis.asyncio as aioredis
+                self._redis = aioredis.from_url(settings.redis_url, socket_connect_timeout=0.5)
+                self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                await self._pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+            except Exception as e:
+                self.counters["connect_errors"] += 1
+                self._retry_at = time.monotonic() + _REDIS_RETRY_INTERVAL
+                logger.warning(f"⚠️ 任务事件订阅不可用，{_REDIS_RETRY_INTERVAL:.0f}s 内退回轮询: {e}")
+                await self._reset()
+                return False
+
+            self._reader = asyncio.create_task(self._read_loop())
+            logger.info("📡 任务事件订阅已启动")
+            return True
+
+    async def _read_loop(self):
+        try:
+            async for message in self._pubsub.listen():
+                if message.get("type") != "pmessage":
+                    continue
+                self.counters["received"] += 1
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                self._dispatch(channel[len(CHANNEL_PREFIX):], message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._retry_at = time.monotonic() + 1.0
+            logger.warning(f"⚠️ 任务事件订阅中断: {e}")
+
+    def _dispatch(self, task_id: str, data):
+        queues = self._subscribers.get(task_id)
+        if not queues:
+            return
+        try:
+            event = json.loads(data)
+        except ValueError:
+            return
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+                self.counters["delivered"] += 1
+            except asyncio.QueueFull:
+                self.counters["dropped"] += 1
+
+    @asynccontextmanager
+    async def subscribe(self, task_id: str) -> AsyncIterator[asyncio.Queue]:
+        """订阅单个任务的事件，在上下文中从返回的队列读取"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.task_events_queue_size)
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        try:
+            await self._ensure_started()
+            yield queue
+        finally:
+            queues = self._subscribers.get(task_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[task_id]
+
+    async def _reset(self):
+        if self._reader is not None and not self._reader.done():
+            self._reader.cancel()
+        self._reader = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+        if self._redis is not None:
+            try:
+                await self._redis.aclose()
+            except Exception:
+                pass
+        self._pubsub = None
+        self._redis = None
+
+    async def close(self):
+        """关闭订阅连接（lifespan 关闭时调用）"""
+        await self._reset()
+
+    def stats(self) -> Dict:
+        return {
+            "connected": self.connected,
+            "subscribed_tasks": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            **self.counters
+        }
+
+# 全局任务事件发布器（worker 端）和订阅器（API 端）
+task_event_publisher = TaskEventPublisher()
+task_event_hub = TaskEventHub()
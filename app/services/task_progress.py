@@ -0,0 +1,124 @@
+import logging
+import time
+from typing import Dict, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 进度键前缀，完整键名为 task-progress:{task_id}
+KEY_PREFIX = "task-progress:"
+# Redis 出错后暂停重连的时间（秒）
+_REDIS_RETRY_INTERVAL = 30.0
+
+def progress_key(task_id: str) -> str:
+    return f"{KEY_PREFIX}{task_id}"
+
+class TaskProgressStore:
+    """分发到多个 worker 的长文本任务的进度
+
+    每个任务对应一个 Redis 哈希：total 字段为总段数，chunk:{序号} 字段为已完成分段的润色结果。
+    各分段任务并发写入互不覆盖，查询接口据此返回完成数和部分结果。写入失败只记录日志，不影响任务本身。
+    """
+
+    def __init__(self):
+        self._redis = None
+        self._retry_at = 0.0
+        self.counters = {
+            "recorded": 0,
+            "errors": 0
+        }
+
+    def _get_redis(self):
+        if time.monotonic() < self._retry_at:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+            except ImportError:
+                logger.warning("⚠️ 未安装 redis，不记录分段进度")
+                self._retry_at = float("inf")
+                return None
+            self._redis = redis.Redis.from_url(
+                settings.redis_url,
+                socket_connect_timeout=0.5,
+                socket_timeout=0.5
+            )
+        return self._redis
+
+    def _failed(self, e: Exception):
+        self.counters["errors"] += 1
+        self._retry_at = time.monotonic() + _REDIS_RETRY_INTERVAL
+        logger.warning(f"⚠️ 任务进度不可用，{_REDIS_RETRY_INTERVAL:.0f}s 内跳过: {e}")
+
+    def start(self, task_id: str, total: int):
+        """登记任务的总段数"""
+        redis = self._get_redis()
+        if redis is None:
+            return
+        try:
+            pipe = redis.pipeline()
+            pipe.delete(progress_key(task_id))
+            pipe.hset(progress_key(task_id), "total", total)
+            pipe.expire(progress_key(task_id), settings.long_text_fanout_progress_ttl)
+            pipe.execute()
+        except Exception as e:
+            self._failed(e)
+
+    def record(self, task_id: str, index: int, text: str) -> Optional[int]:
+        """记录一个已完成的分段，返回当前已完成的段数（不可用时返回 None）"""
+        redis = self._get_redis()
+        if redis is None:
+            return None
+        key = progress_key(task_id)
+        try:
+            pipe = redis.pipeline()
+            pipe.hset(key, f"chunk:{index}", text)
+            # start 未成功写入时哈希由这里创建，同样设置过期时间
+            pipe.expire(key, settings.long_text_fanout_progress_ttl)
+            pipe.hkeys(key)
+            _, _, fields = pipe.execute()
+        except Exception as e:
+            self._failed(e)
+            return None
+        self.counters["recorded"] += 1
+        return sum(1 for field in fields if self._decode(field).startswith("chunk:"))
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        """返回 {completed, total, segments: [{index, text}]}，没有进度记录时返回 None"""
+        redis = self._get_redis()
+        if redis is None:
+            return None
+        try:
+            data = redis.hgetall(progress_key(task_id))
+        except Exception as e:
+            self._failed(e)
+            return None
+        if not data:
+            return None
+
+        segments = []
+        total = 0
+        for field, value in data.items():
+            field = self._decode(field)
+            if field == "total":
+                total = int(value)
+            elif field.startswith("chunk:"):
+                segments.append({"index": int(field[len("chunk:"):]), "text": value.decode("utf-8")})
+        segments.sort(key=lambda segment: segment["index"])
+        return {"completed": len(segments), "total": total, "segments": segments}
+
+    @staticmethod
+    def _decode(value) -> str:
+        return value.decode() if isinstance(value, bytes) else value
+
+    def clear(self, task_id: str):
+        redis = self._get_redis()
+        if redis is None:
+            return
+        try:
+            redis.delete(progress_key(task_id))
+        except Exception as e:
+            self._failed(e)
+
+# 全局任务进度实例
+task_progress_store = TaskProgressStore()
@@ -0,0 +1,117 @@
+import logging
+from datetime import date, datetime
+from typing import Any, Optional
+from kombu.serialization import register
+from kombu.utils import json as kombu_json
+from app.core.config import settings
+from app.services.blob_store import blob_store
+from app.utils.compression import CODEC_RAW, CODEC_ZLIB, CODEC_ZSTD, compress, decompress
+
+try:
+    import msgpack
+except ImportError:  # 未安装 msgpack 时消息体使用 JSON，仍然压缩和按引用传输
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+SERIALIZER_NAME = "compact"
+CONTENT_TYPE = "application/x-ai-processor-compact"
+# 任务结果使用同一编码，只是 blob 的过期时间不超过 celery_result_expires
+RESULT_SERIALIZER_NAME = "compact-result"
+RESULT_CONTENT_TYPE = "application/x-ai-processor-compact-result"
+
+# 帧头：版本、编码格式、压缩编码、是否为引用，各 1 字节
+_VERSION = 1
+_FORMAT_MSGPACK = 1
+_FORMAT_JSON = 2
+_CODEC_IDS = {CODEC_RAW: 0, CODEC_ZLIB: 1, CODEC_ZSTD: 2}
+_CODEC_NAMES = {value: key for key, value in _CODEC_IDS.items()}
+_INLINE = 0
+_REFERENCE = 1
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+def _pack(body: Any) -> bytes:
+    if msgpack is not None:
+        return bytes([_FORMAT_MSGPACK]) + msgpack.packb(body, use_bin_type=True, default=_msgpack_default)
+    return bytes([_FORMAT_JSON]) + kombu_json.dumps(body).encode("utf-8")
+
+def _unpack(data: bytes) -> Any:
+    fmt, payload = data[0], data[1:]
+    if fmt == _FORMAT_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("消息使用 msgpack 编码，但未安装 msgpack")
+        return msgpack.unpackb(payload, raw=False)
+    if fmt == _FORMAT_JSON:
+        return kombu_json.loads(payload.decode("utf-8"))
+    raise ValueError(f"未知的消息编码格式: {fmt}")
+
+def dumps(body: Any, blob_ttl: Optional[int] = None) -> bytes:
+    """编码 Celery 消息体或任务结果
+
+    msgpack 编码（未安装时为 JSON），超过 celery_payload_compress_min_bytes 时压缩（zstd 或 zlib），
+    压缩后仍超过 celery_payload_inline_max_bytes 时存入 blob 存储（过期时间为 blob_ttl，
+    默认 celery_blob_ttl），消息中只保留内容哈希；
+    超过 celery_payload_max_bytes 时拒绝编码（任务结果过大时任务失败，而不是占满 Redis 内存）。
+    """
+    packed = _pack(body)
+    codec, data = CODEC_RAW, packed
+    if len(packed) >= settings.celery_payload_compress_min_bytes:
+        codec, data = compress(packed)
+
+    if len(data) > settings.celery_payload_max_bytes:
+        raise ValueError(
+            f"消息体压缩后 {len(data)} 字节，超过上限 {settings.celery_payload_max_bytes} 字节"
+        )
+
+    if len(data) > settings.celery_payload_inline_max_bytes:
+        digest = blob_store.put(data, blob_ttl or settings.celery_blob_ttl)
+        if digest is not None:
+            return bytes([_VERSION, _CODEC_IDS[codec], _REFERENCE]) + digest.encode("ascii")
+        logger.warning(f"⚠️ Blob 存储不可用，{len(data)} 字节的消息体内联传输")
+
+    return bytes([_VERSION, _CODEC_IDS[codec], _INLINE]) + data
+
+def dumps_result(body: Any) -> bytes:
+    """编码任务结果：引用的 blob 不比结果本身保留更久"""
+    return dumps(body, min(settings.celery_blob_ttl, settings.celery_result_expires))
+
+def reference_digest(data: bytes) -> Optional[str]:
+    """dumps 的输出按引用存储时返回 blob 的内容哈希，否则返回 None"""
+    if isinstance(data, bytes) and len(data) > 3 and data[0] == _VERSION and data[2] == _REFERENCE:
+        return data[3:].decode("ascii")
+    return None
+
+def loads(data: bytes) -> Any:
+    """解码 dumps 的输出，引用的内容已过期时抛出 LookupError
+
+    不以帧头版本号开头的数据按 JSON 解码：结果后端总是按当前的 result_serializer 解码，
+    切换前写入的 JSON 结果也要经过这里。
+    """
+    if isinstance(data, str) or not data or data[0] != _VERSION:
+        return kombu_json.loads(data)
+    codec_id, kind = data[1], data[2]
+    payload = data[3:]
+    if kind == _REFERENCE:
+        payload = blob_store.get(payload.decode("ascii"))
+    return _unpack(decompress(_CODEC_NAMES[codec_id], payload))
+
+def register_compact_serializer():
+    """注册到 kombu，Celery 配置中以 SERIALIZER_NAME（消息）和 RESULT_SERIALIZER_NAME（结果）引用"""
+    register(
+        SERIALIZER_NAME,
+        dumps,
+        loads,
+        content_type=CONTENT_TYPE,
+        content_encoding="binary"
+    )
+    register(
+        RESULT_SERIALIZER_NAME,
+        dumps_result,
+        loads,
+        content_type=RESULT_CONTENT_TYPE,
+        content_encoding="binary"
+    )
@@ -0,0 +1,53 @@
+import math
+from dataclasses import dataclass
+from app.core.config import settings
+from app.utils.token_estimator import estimate_tokens
+
+# 各风格输出与输入的 token 比例（润色通常略长于原文，创意改写更长）
+STYLE_OUTPUT_RATIO = {
+    "academic": 1.3,
+    "formal": 1.2,
+    "casual": 1.2,
+    "creative": 1.5
+}
+# 系统提示词、风格提示和消息格式占用的 token 数
+PROMPT_OVERHEAD_TOKENS = 64
+
+class ContextBudgetExceeded(Exception):
+    """请求的估算 token 数超出单次调用的上限，应拒绝或改走长文本分段"""
+
+    def __init__(self, message: str, budget: "TokenBudget"):
+        super().__init__(message)
+        self.budget = budget
+
+@dataclass(frozen=True)
+class TokenBudget:
+    input_tokens: int  # 估算的输入 token 数（含提示词）
+    max_tokens: int  # 请求中设置的输出上限
+
+    @property
+    def total(self) -> int:
+        """一次调用最多占用的 token 数，用于 TPM 限流预留"""
+        return self.input_tokens + self.max_tokens
+
+def plan_budget(text: str, style: str = "academic", context: str = "") -> TokenBudget:
+    """按输入长度和风格计算 max_tokens，超出模型上下文或输出上限时抛出 ContextBudgetExceeded"""
+    text_tokens = estimate_tokens(text)
+    input_tokens = text_tokens + estimate_tokens(context) + PROMPT_OVERHEAD_TOKENS
+    ratio = STYLE_OUTPUT_RATIO.get(style, STYLE_OUTPUT_RATIO["academic"])
+    needed = math.ceil(text_tokens * ratio) + settings.output_token_margin
+    budget = TokenBudget(
+        input_tokens=input_tokens,
+        max_tokens=min(max(needed, settings.output_tokens_min), settings.output_tokens_max)
+    )
+
+    # 输出上限不足时结果会被截断，与其让用户重试不如提前拒绝
+    if needed > settings.output_tokens_max:
+        raise ContextBudgetExceeded(
+            f"预计输出 {needed} tokens，超出单次调用上限 {settings.output_tokens_max}", budget
+        )
+    if budget.total > settings.model_context_tokens:
+        raise ContextBudgetExceeded(
+            f"预计占用 {budget.total} tokens，超出模型上下文 {settings.model_context_tokens}", budget
+        )
+    return budget
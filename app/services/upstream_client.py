@@ -0,0 +1,234 @@
+import asyncio
+import httpx
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+from app.core.config import settings
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 出现以下 trace 事件时，请求已经从连接池拿到连接
+_CONNECTION_ACQUIRED_EVENTS = (
+    "connection.connect_tcp.started",
+    "http11.send_request_headers.started",
+    "http2.send_request_headers.started",
+)
+# 出现以下 trace 事件时，已收到上游响应头（TTFB）
+_RESPONSE_HEADERS_EVENTS = (
+    "http11.receive_response_headers.complete",
+    "http2.receive_response_headers.complete",
+)
+
+class UpstreamClient:
+    """火山引擎 ARK 上游共享连接池
+
+    每个 worker 进程持有一个长连接 httpx.AsyncClient，由应用 lifespan 负责创建和关闭。
+    未启动时（如脚本或测试中直接调用）退化为每次请求临时创建客户端。
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+        self.http2_enabled = False
+
+        # 连接池统计
+        self.requests_total = 0
+        self.in_flight = 0
+        self.pool_wait_total = 0.0
+        self.pool_wait_max = 0.0
+        self.pool_wait_count = 0
+
+    @property
+    def is_started(self) -> bool:
+        return self._client is not None and not self._client.is_closed
+
+    def _build_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.upstream_max_connections,
+            max_keepalive_connections=settings.upstream_max_keepalive_connections,
+            keepalive_expiry=settings.upstream_keepalive_expiry
+        )
+
+    def _build_timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=settings.upstream_connect_timeout,
+            read=settings.upstream_read_timeout,
+            write=settings.upstream_write_timeout,
+            pool=settings.upstream_pool_timeout
+        )
+
+    def _http2_available(self) -> bool:
+        if not settings.upstream_http2:
+            return False
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            logger.warning("⚠️ 未安装 h2，HTTP/2 已禁用，使用 HTTP/1.1")
+            return False
+
+    async def start(self):
+        """创建共享客户端（lifespan 启动时调用）"""
+        if self.is_started:
+            return
+
+        self.http2_enabled = self._http2_available()
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=self._build_limits(),
+            http2=self.http2_enabled
+        )
+        self._client = httpx.AsyncClient(
+            transport=self._transport,
+            timeout=self._build_timeout()
+        )
+        logger.info(
+            f"🔌 上游连接池已创建: 最大连接 {settings.upstream_max_connections}, "
+            f"keep-alive {settings.upstream_max_keepalive_connections}/"
+            f"{settings.upstream_keepalive_expiry}s, HTTP/2 {'开启' if self.http2_enabled else '关闭'}"
+        )
+
+    async def close(self):
+        """关闭共享客户端（lifespan 关闭时调用）"""
+        if self._client is not None:
+            await self._client.aclose()
+            logger.info("🔌 上游连接池已关闭")
+        self._client = None
+        self._transport = None
+
+    async def warm_up(self, url: str, connections: int, timeout: float) -> Dict:
+        """预热上游：解析 DNS 并并发建立 connections 个连接（含 TLS 握手），使其留在 keep-alive 池中
+
+        预热请求只用于建立连接，任何响应状态码都视为成功；失败只记录日志，不阻止启动。
+        """
+        start_time = time.perf_counter()
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        result = {"resolved": 0, "connections": 0, "errors": 0}
+
+        try:
+            addresses = await asyncio.wait_for(
+                asyncio.get_running_loop().getaddrinfo(parts.hostname, port),
+                timeout
+            )
+            result["resolved"] = len(addresses)
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.warning(f"⚠️ 上游 DNS 解析失败，跳过预热: {parts.hostname} {e!r}")
+            result["errors"] += 1
+            return result
+
+        if self.is_started:
+            connections = min(connections, settings.upstream_max_keepalive_connections)
+
+            async def open_connection():
+                response = await self._client.head(url, timeout=timeout)
+                await response.aclose()
+
+            outcomes = await asyncio.gather(
+                *[open_connection() for _ in range(connections)],
+                return_exceptions=True
+            )
+            result["errors"] += sum(1 for outcome in outcomes if isinstance(outcome, Exception))
+            result["connections"] = self.stats()["idle_connections"]
+
+        logger.info(
+            f"🔥 上游预热完成: {parts.hostname} 解析 {result['resolved']} 个地址, "
+            f"空闲连接 {result['connections']}, 失败 {result['errors']}, "
+            f"耗时 {(time.perf_counter() - start_time) * 1000:.0f}ms"
+        )
+        return result
+
+    def _trace_extensions(self, mode: str, extensions: Optional[Dict] = None) -> Dict:
+        """构建 trace 扩展，记录等待空闲连接的时间和上游首字节时间"""
+        start_time = time.perf_counter()
+        acquired = False
+
+        async def trace(event_name: str, info: Dict):
+            nonlocal acquired
+            if not acquired and event_name in _CONNECTION_ACQUIRED_EVENTS:
+                acquired = True
+                self._record_pool_wait(time.perf_counter() - start_time)
+            elif event_name in _RESPONSE_HEADERS_EVENTS:
+                metrics.upstream_ttfb.observe(time.perf_counter() - start_time, mode=mode)
+
+        extensions = dict(extensions or {})
+        extensions["trace"] = trace
+        return extensions
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        """通过共享连接池发送 POST 请求，并记录等待空闲连接的时间"""
+        kwargs["extensions"] = self._trace_extensions("request", kwargs.get("extensions"))
+
+        self.requests_total += 1
+        self.in_flight += 1
+        start_time = time.perf_counter()
+        try:
+            if self.is_started:
+                return await self._client.post(url, **kwargs)
+
+            async with httpx.AsyncClient(timeout=self._build_timeout()) as client:
+                return await client.post(url, **kwargs)
+        finally:
+            self.in_flight -= 1
+            metrics.upstream_latency.observe(time.perf_counter() - start_time, mode="request")
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """通过共享连接池发送流式请求，响应体在上下文中逐步读取"""
+        kwargs["extensions"] = self._trace_extensions("stream", kwargs.get("extensions"))
+
+        self.requests_total += 1
+        self.in_flight += 1
+        start_time = time.perf_counter()
+        try:
+            if self.is_started:
+                async with self._client.stream(method, url, **kwargs) as response:
+                    yield response
+            else:
+                async with httpx.AsyncClient(timeout=self._build_timeout()) as client:
+                    async with client.stream(method, url, **kwargs) as response:
+                        yield response
+        finally:
+            self.in_flight -= 1
+            metrics.upstream_latency.observe(time.perf_counter() - start_time, mode="stream")
+
+    def _record_pool_wait(self, wait: float):
+        self.pool_wait_count += 1
+        self.pool_wait_total += wait
+        self.pool_wait_max = max(self.pool_wait_max, wait)
+        metrics.queue_wait.observe(wait, queue="upstream_pool")
+
+    def stats(self) -> Dict:
+        """连接池统计信息，用于容量规划"""
+        active = idle = queued = 0
+        pool = getattr(self._transport, "_pool", None)
+        if pool is not None:
+            for connection in pool.connections:
+                if connection.is_closed():
+                    continue
+                if connection.is_idle():
+                    idle += 1
+                else:
+                    active += 1
+            queued = sum(1 for request in getattr(pool, "_requests", []) if request.is_queued())
+
+        avg_wait = self.pool_wait_total / self.pool_wait_count if self.pool_wait_count else 0.0
+
+        return {
+            "started": self.is_started,
+            "http2": self.http2_enabled,
+            "max_connections": settings.upstream_max_connections,
+            "max_keepalive_connections": settings.upstream_max_keepalive_connections,
+            "active_connections": active,
+            "idle_connections": idle,
+            "queued_requests": queued,
+            "in_flight_requests": self.in_flight,
+            "requests_total": self.requests_total,
+            "pool_wait_avg_ms": round(avg_wait * 1000, 3),
+            "pool_wait_max_ms": round(self.pool_wait_max * 1000, 3)
+        }
+
+# 全局上游客户端实例
+upstream_client = UpstreamClient()
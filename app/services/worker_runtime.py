@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Dict, Optional, TypeVar
+from app.services.upstream_client import upstream_client
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class WorkerRuntime:
+    """Celery worker 进程级异步运行时
+
+    每个 worker 进程持有一个在后台线程中常驻的事件循环，上游连接池在该循环上创建，
+    任务通过 run_coroutine_threadsafe 提交协程。使用 threads 池时，多个任务线程共享
+    同一个循环和连接池，网络等待期间可以并发执行。
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+        self.tasks_total = 0
+        self.in_flight = 0
+
+    @property
+    def is_running(self) -> bool:
+        return (
+            self._pid == os.getpid()
+            and self._loop is not None
+            and self._loop.is_running()
+        )
+
+    def start(self):
+        """启动事件循环线程并创建上游连接池（worker 进程初始化时调用）"""
+        with self._lock:
+            if self.is_running:
+                return
+
+            # fork 出的子进程不会继承父进程的线程，需要重新创建
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            thread = threading.Thread(
+                target=self._run_loop,
+                args=(loop, ready),
+                name="worker-runtime",
+                daemon=True
+            )
+            thread.start()
+            ready.wait()
+
+            self._loop = loop
+            self._thread = thread
+            self._pid = os.getpid()
+
+            asyncio.run_coroutine_threadsafe(upstream_client.start(), loop).result()
+            logger.info(f"🔁 worker 运行时已启动: pid {self._pid}")
+
+    def _run_loop(self, loop: asyncio.AbstractEventLoop, ready: threading.Event):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """在常驻事件循环中执行协程并阻塞等待结果（供任务线程调用）"""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+        self.tasks_total += 1
+        self.in_flight += 1
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def stop(self):
+        """关闭上游连接池并停止事件循环（worker 进程退出时调用）"""
+        with self._lock:
+            if not self.is_running:
+                return
+
+            loop = self._loop
+            try:
+                asyncio.run_coroutine_threadsafe(upstream_client.close(), loop).result(timeout=5)
+            except Exception as e:
+                logger.warning(f"⚠️ 关闭上游连接池失败: {e}")
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(timeout=5)
+            loop.close()
+
+            self._loop = None
+            self._thread = None
+            logger.info(f"🔁 worker 运行时已停止: pid {self._pid}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running,
+            "pid": self._pid,
+            "tasks_total": self.tasks_total,
+            "in_flight_tasks": self.in_flight
+        }
+
+# 全局 worker 运行时实例
+worker_runtime = WorkerRuntime()
@@ -0,0 +1,48 @@
+import zlib
+from typing import Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # 未安装 zstandard 时使用标准库 zlib
+    zstandard = None
+
+CODEC_RAW = "raw"
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+
+# 小于该字节数的数据压缩收益很小，直接原样存储
+MIN_COMPRESS_BYTES = 64
+
+_ZLIB_LEVEL = 6
+_ZSTD_LEVEL = 3
+
+def default_codec() -> str:
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+def compress(data: bytes, codec: Optional[str] = None) -> Tuple[str, bytes]:
+    """压缩数据，返回 (编码, 压缩后数据)；压缩后不变小时原样返回"""
+    if len(data) < MIN_COMPRESS_BYTES:
+        return CODEC_RAW, data
+
+    codec = codec or default_codec()
+    if codec == CODEC_ZSTD and zstandard is not None:
+        compressed = zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(data)
+    else:
+        codec = CODEC_ZLIB
+        compressed = zlib.compress(data, _ZLIB_LEVEL)
+
+    if len(compressed) >= len(data):
+        return CODEC_RAW, data
+    return codec, compressed
+
+def decompress(codec: str, data: bytes) -> bytes:
+    """按编码解压数据"""
+    if codec == CODEC_RAW:
+        return data
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("数据使用 zstd 压缩，但未安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"未知的压缩编码: {codec}")
@@ -0,0 +1,164 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 拉丁字母和数字按单词切分（可含撇号和连字符），空白连续为一个单元，其余（含汉字和标点）按单个字符切分
+_TOKEN = re.compile(
+    r"[A-Za-z0-9\u00c0-\u024f]+(?:['’\-][A-Za-z0-9\u00c0-\u024f]+)*|\s+|.",
+    re.S
+)
+
+# 编辑距离（插入 + 删除的 token 数）默认上限，超过时退化为整段替换
+DEFAULT_MAX_COST = 2000
+
+def tokenize(text: str) -> Tuple[List[str], List[int]]:
+    """切分为 token，返回 (token 列表, 各 token 起始偏移 + 文本长度)"""
+    tokens = []
+    offsets = []
+    for match in _TOKEN.finditer(text):
+        tokens.append(match.group())
+        offsets.append(match.start())
+    offsets.append(len(text))
+    return tokens, offsets
+
+def _myers(a: Sequence[int], b: Sequence[int], max_cost: int) -> Optional[List[Tuple[int, int, int, int]]]:
+    """Myers O(ND) 差分，返回 (a 起点, a 终点, b 起点, b 终点) 形式的差异块；超过 max_cost 时返回 None"""
+    n, m = len(a), len(b)
+    trace: List[List[int]] = []
+    prev: List[int] = []
+    found = False
+
+    # row[k + d] 为第 d 轮对角线 k 上能到达的最远 x
+    for d in range(min(n + m, max_cost) + 1):
+        row = [0] * (2 * d + 1)
+        for k in range(-d, d + 1, 2):
+            if d == 0:
+                x = 0
+            elif k == -d or (k != d and prev[k - 1 + d - 1] < prev[k + 1 + d - 1]):
+                x = prev[k + 1 + d - 1]
+            else:
+                x = prev[k - 1 + d - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            row[k + d] = x
+            if x >= n and y >= m:
+                found = True
+                break
+        trace.append(row)
+        if found:
+            break
+        prev = row
+
+    if not found:
+        return None
+
+    # 回溯得到逐个 token 的插入 / 删除
+    steps = []
+    x, y = n, m
+    for d in range(len(trace) - 1, 0, -1):
+        prev = trace[d - 1]
+        k = x - y
+        if k == -d or (k != d and prev[k - 1 + d - 1] < prev[k + 1 + d - 1]):
+            prev_k = k + 1
+            prev_x = prev[prev_k + d - 1]
+            prev_y = prev_x - prev_k
+            steps.append((prev_x, prev_x, prev_y, prev_y + 1))
+        else:
+            prev_k = k - 1
+            prev_x = prev[prev_k + d - 1]
+            prev_y = prev_x - prev_k
+            steps.append((prev_x, prev_x + 1, prev_y, prev_y))
+        x, y = prev_x, prev_y
+
+    # 合并相邻（中间没有相同 token）的插入和删除
+    hunks: List[List[int]] = []
+    for a_start, a_end, b_start, b_end in reversed(steps):
+        if hunks and hunks[-1][1] == a_start and hunks[-1][3] == b_start:
+            hunks[-1][1] = a_end
+            hunks[-1][3] = b_end
+        else:
+            hunks.append([a_start, a_end, b_start, b_end])
+    return [tuple(hunk) for hunk in hunks]
+
+def diff_text(original: str, processed: str, max_cost: int = DEFAULT_MAX_COST) -> Dict:
+    """计算从原文到润色结果的编辑操作
+
+    中文按字、英文按词比较：先去掉相同的前缀和后缀，再对中间部分做 Myers 差分，
+    耗时与文本长度和差异大小的乘积成正比，轻度润色接近线性。差异超过 max_cost 个 token 时
+    退化为一个整段替换（stats.exact 为 False）。
+
+    返回 {"edits": [{op, start, end, text}], "stats": {...}}，start/end 为原文中的字符偏移，
+    按顺序对原文应用 edits（见 apply_edits）即可得到润色结果。
+    """
+    a_tokens, a_offsets = tokenize(original)
+    b_tokens, b_offsets = tokenize(processed)
+
+    # 去掉相同的前缀和后缀
+    prefix = 0
+    limit = min(len(a_tokens), len(b_tokens))
+    while prefix < limit and a_tokens[prefix] == b_tokens[prefix]:
+        prefix += 1
+    suffix = 0
+    while (
+        suffix < limit - prefix
+        and a_tokens[len(a_tokens) - 1 - suffix] == b_tokens[len(b_tokens) - 1 - suffix]
+    ):
+        suffix += 1
+
+    # token 映射为整数，比较更快
+    ids: Dict[str, int] = {}
+    a_ids = [ids.setdefault(token, len(ids)) for token in a_tokens[prefix:len(a_tokens) - suffix]]
+    b_ids = [ids.setdefault(token, len(ids)) for token in b_tokens[prefix:len(b_tokens) - suffix]]
+
+    exact = True
+    if not a_ids and not b_ids:
+        hunks = []
+    else:
+        hunks = _myers(a_ids, b_ids, max_cost)
+        if hunks is None:
+            exact = False
+            hunks = [(0, len(a_ids), 0, len(b_ids))]
+
+    edits = []
+    inserted = deleted = 0
+    for a_start, a_end, b_start, b_end in hunks:
+        start = a_offsets[prefix + a_start]
+        end = a_offsets[prefix + a_end]
+        text = processed[b_offsets[prefix + b_start]:b_offsets[prefix + b_end]]
+        if start == end:
+            op = "insert"
+        elif not text:
+            op = "delete"
+        else:
+            op = "replace"
+        edits.append({"op": op, "start": start, "end": end, "text": text})
+        inserted += len(text)
+        deleted += end - start
+
+    total = len(original) + len(processed)
+    unchanged = len(original) - deleted
+    return {
+        "edits": edits,
+        "stats": {
+            "original_length": len(original),
+            "processed_length": len(processed),
+            "edit_count": len(edits),
+            "inserted_chars": inserted,
+            "deleted_chars": deleted,
+            "unchanged_chars": unchanged,
+            "similarity": round(2 * unchanged / total, 4) if total else 1.0,
+            "exact": exact
+        }
+    }
+
+def apply_edits(original: str, edits: List[Dict]) -> str:
+    """按顺序把编辑操作应用到原文，还原润色结果"""
+    parts = []
+    position = 0
+    for edit in edits:
+        parts.append(original[position:edit["start"]])
+        parts.append(edit["text"])
+        position = edit["end"]
+    parts.append(original[position:])
+    return "".join(parts)
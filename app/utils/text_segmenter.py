@@ -0,0 +1,139 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Tuple
+from app.utils.token_estimator import char_tokens, estimate_tokens
+
+# 中文句末标点（可跟随右引号/括号）
+_CJK_SENTENCE_END = r"[。！？；]+[”’」』）\)]*"
+# 英文句末标点，只有后面是空白或文本结尾时才断句，避免切开小数和缩写中间
+_LATIN_SENTENCE_END = r"[.!?]+[”’\"'\)]*(?=\s|$)"
+_SENTENCE_END = re.compile(f"{_CJK_SENTENCE_END}|{_LATIN_SENTENCE_END}")
+_PARAGRAPH_BREAK = re.compile(r"(\n\s*)")
+_LEADING_SPACE = re.compile(r"^\s*")
+
+def split_paragraphs(text: str) -> List[Tuple[str, str]]:
+    """按换行切分段落，返回 (段前分隔符, 段落) 列表
+
+    最后一个段落之后的空白不在列表中，拼接后加上原文的这部分末尾即可还原原文。
+    """
+    parts = _PARAGRAPH_BREAK.split(text)
+    paragraphs = []
+    separator = ""
+    for i, part in enumerate(parts):
+        if i % 2 == 1:
+            separator += part
+        elif part.strip():
+            paragraphs.append((separator, part))
+            separator = ""
+        else:
+            separator += part
+    return paragraphs
+
+def split_sentences(text: str) -> List[str]:
+    """按中英文句末标点（。！？；和 .!?）切分句子，句子保留前导空白"""
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        sentence = text[start:match.end()]
+        if sentence.strip():
+            sentences.append(sentence)
+        start = match.end()
+
+    if text[start:].strip():
+        sentences.append(text[start:])
+    return sentences
+
+@dataclass
+class TextChunk:
+    """分段结果：text 为待润色文本，context 为只读上文，separator 为与前一段拼接时的分隔符
+
+    第一个分段的 separator 为文档开头的空白，最后一个分段的 trailing 为文档末尾的空白，
+    依次拼接 separator + text 并加上 trailing 即还原原文。
+    """
+    index: int
+    text: str
+    separator: str = ""
+    trailing: str = ""
+    context: str = ""
+    estimated_tokens: int = 0
+    units: List[str] = field(default_factory=list, repr=False)
+
+def _hard_split(sentence: str, max_tokens: int) -> List[str]:
+    """按估算的 token 数切分超长句子，每片不超过 max_tokens（单个字符超出时单独成片）"""
+    pieces = []
+    start = 0
+    tokens = 0.0
+    for offset, char in enumerate(sentence):
+        weight = char_tokens(char)
+        if offset > start and tokens + weight > max_tokens:
+            pieces.append(sentence[start:offset])
+            start, tokens = offset, 0.0
+        tokens += weight
+    pieces.append(sentence[start:])
+    return pieces
+
+def _split_units(text: str, max_tokens: int) -> Tuple[List[Tuple[str, str]], str]:
+    """把文本切成 (前导分隔符, 句子) 单元，超长句子按 token 数硬切；同时返回文档末尾的空白
+
+    句子之间、段落末尾的空白并入下一个单元的分隔符，不会丢失。
+    """
+    units = []
+    pending = ""
+    consumed = 0
+    for paragraph_separator, paragraph in split_paragraphs(text):
+        pending += paragraph_separator
+        consumed += len(paragraph_separator) + len(paragraph)
+        sentences = split_sentences(paragraph)
+        for sentence in sentences:
+            leading = _LEADING_SPACE.match(sentence).group(0)
+            separator = pending + leading
+            pending = ""
+            sentence = sentence[len(leading):]
+
+            if estimate_tokens(sentence) <= max_tokens:
+                units.append((separator, sentence))
+                continue
+
+            for i, piece in enumerate(_hard_split(sentence, max_tokens)):
+                units.append((separator if i == 0 else "", piece))
+        # split_sentences 不保留段落末尾只有空白的部分
+        pending += paragraph[sum(len(sentence) for sentence in sentences):]
+    return units, pending + text[consumed:]
+
+def chunk_text(text: str, max_tokens: int, overlap_sentences: int = 1) -> List[TextChunk]:
+    """按段落和句子边界把长文本切成不超过 token 预算的分段
+
+    每个分段附带前一分段末尾 overlap_sentences 个句子作为只读上文，帮助保持衔接。
+    """
+    chunks: List[TextChunk] = []
+    current: List[Tuple[str, str]] = []
+    current_tokens = 0
+    units, trailing = _split_units(text, max_tokens)
+
+    def flush():
+        if not current:
+            return
+        previous_units = chunks[-1].units if chunks else []
+        context = "".join(previous_units[-overlap_sentences:]) if overlap_sentences > 0 else ""
+        body = current[0][1] + "".join(sep + sentence for sep, sentence in current[1:])
+        chunks.append(TextChunk(
+            index=len(chunks),
+            text=body,
+            separator=current[0][0],
+            context=context.strip(),
+            estimated_tokens=current_tokens,
+            units=[sep + sentence for sep, sentence in current]
+        ))
+
+    for separator, sentence in units:
+        tokens = estimate_tokens(sentence)
+        if current and current_tokens + tokens > max_tokens:
+            flush()
+            current, current_tokens = [], 0
+        current.append((separator, sentence))
+        current_tokens += tokens
+
+    flush()
+    if chunks:
+        chunks[-1].trailing = trailing
+    return chunks
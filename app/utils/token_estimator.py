@@ -0,0 +1,48 @@
+import math
+import re
+from functools import lru_cache
+
+# 各字符类别的平均 token 数（按 DeepSeek 分词器在中英混排文本上的统计取近似值）
+# 汉字多为 1 字 0.6 token；拉丁字母按单词切分，约 3~4 个字母一个 token
+_CHAR_CLASSES = (
+    (re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]"), 0.6),  # 汉字
+    (re.compile(r"[\u3000-\u303f\uff00-\uffef]"), 1.0),  # 中文及全角标点
+    (re.compile(r"[\u3040-\u30ff\uac00-\ud7af]"), 0.7),  # 假名、谚文
+    (re.compile(r"[A-Za-z]"), 0.3),
+    (re.compile(r"[0-9]"), 0.4),
+    (re.compile(r"\s"), 0.1),
+)
+# 其余字符（ASCII 标点、符号、其他文字）
+_OTHER_WEIGHT = 0.5
+
+# 只缓存较短的文本，避免缓存长文本占用内存
+_CACHE_MAX_CHARS = 4096
+
+def _estimate(text: str) -> int:
+    remaining = len(text)
+    total = 0.0
+    for pattern, weight in _CHAR_CLASSES:
+        count = len(pattern.findall(text))
+        total += count * weight
+        remaining -= count
+    total += remaining * _OTHER_WEIGHT
+    # 去掉浮点误差（如 30 × 0.1 = 3.0000000000000004）后再向上取整
+    return math.ceil(round(total, 6))
+
+_estimate_cached = lru_cache(maxsize=4096)(_estimate)
+
+@lru_cache(maxsize=4096)
+def char_tokens(char: str) -> float:
+    """单个字符的平均 token 数（estimate_tokens 即按此累加后向上取整）"""
+    for pattern, weight in _CHAR_CLASSES:
+        if pattern.match(char):
+            return weight
+    return _OTHER_WEIGHT
+
+def estimate_tokens(text: str) -> int:
+    """按字符类别估算中英混排文本的 token 数（向上取整，空文本为 0）"""
+    if not text:
+        return 0
+    if len(text) <= _CACHE_MAX_CHARS:
+        return _estimate_cached(text)
+    return _estimate(text)
@@ -0,0 +1,168 @@
+"""火山引擎 ARK /chat/completions 的本地模拟服务
+
+用于压测，不访问付费 API。支持可配置的延迟分布、流式输出、429/5xx 注入和思考过程长度。
+
+单独启动：
+    python -m benchmarks.mock_ark --port 8799 --latency lognormal:0.8:0.4 --error-429 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+@dataclass
+class MockConfig:
+    # 延迟分布：fixed:秒 / uniform:最小:最大 / lognormal:中位数:sigma
+    latency: str = "fixed:0.05"
+    # 流式输出时每个数据块之间的间隔（秒）
+    chunk_interval: float = 0.005
+    # 正文按该长度切分为流式数据块
+    chunk_chars: int = 8
+    # 思考过程（reasoning_content）的字符数
+    reasoning_chars: int = 200
+    # 错误注入概率
+    error_429_rate: float = 0.0
+    error_5xx_rate: float = 0.0
+    retry_after: Optional[float] = 1.0
+
+def sample_latency(spec: str) -> float:
+    """按延迟分布描述采样一次延迟（秒）"""
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed":
+        return values[0]
+    if kind == "uniform":
+        return random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return random.lognormvariate(0, sigma) * median
+    raise ValueError(f"未知的延迟分布: {spec}")
+
+def create_mock_app(config: MockConfig) -> FastAPI:
+    app = FastAPI(title="Mock ARK")
+    app.state.config = config
+    app.state.requests = 0
+
+    def injected_error() -> Optional[JSONResponse]:
+        roll = random.random()
+        if roll < config.error_429_rate:
+            headers = {"Retry-After": str(config.retry_after)} if config.retry_after is not None else {}
+            return JSONResponse({"error": {"code": "RateLimitExceeded"}}, status_code=429, headers=headers)
+        if roll < config.error_429_rate + config.error_5xx_rate:
+            return JSONResponse({"error": {"code": "InternalServiceError"}}, status_code=random.choice([500, 502, 503]))
+        return None
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        content = body["messages"][-1]["content"]
+        answer = "润色结果：" + content[-200:]
+        reasoning = ("思" * config.reasoning_chars)
+        usage = {
+            "prompt_tokens": len(content),
+            "completion_tokens": len(answer) + len(reasoning),
+            "total_tokens": len(content) + len(answer) + len(reasoning),
+            "completion_tokens_details": {"reasoning_tokens": len(reasoning)}
+        }
+
+        error = injected_error()
+        if error is not None:
+            return error
+
+        latency = sample_latency(config.latency)
+        if not body.get("stream"):
+            await asyncio.sleep(latency)
+            return {
+                "id": f"mock-{app.state.requests}",
+                "model": body.get("model"),
+                "choices": [{"message": {"role": "assistant", "content": answer, "reasoning_content": reasoning}}],
+                "usage": usage
+            }
+
+        async def stream():
+            # 首个数据块前的等待即上游 TTFB
+            await asyncio.sleep(latency)
+            size = config.chunk_chars
+            for i in range(0, len(reasoning), size * 4):
+                delta = {"reasoning_content": reasoning[i:i + size * 4]}
+                yield f"data: {json.dumps({'choices': [{'delta': delta}]}, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(config.chunk_interval)
+            for i in range(0, len(answer), size):
+                delta = {"content": answer[i:i + size]}
+                yield f"data: {json.dumps({'choices': [{'delta': delta}]}, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(config.chunk_interval)
+            yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class MockArkServer:
+    """在后台线程中运行模拟服务，用作上下文管理器"""
+
+    def __init__(self, config: MockConfig, port: Optional[int] = None):
+        self.config = config
+        self.port = port or free_port()
+        self.app = create_mock_app(config)
+        self._server = uvicorn.Server(uvicorn.Config(
+            self.app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False, ws="none"
+        ))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def requests(self) -> int:
+        return self.app.state.requests
+
+    def __enter__(self) -> "MockArkServer":
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("模拟服务启动超时")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+def main():
+    parser = argparse.ArgumentParser(description="火山引擎 ARK 模拟服务")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--latency", default="fixed:0.05")
+    parser.add_argument("--reasoning-chars", type=int, default=200)
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-5xx", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency,
+        reasoning_chars=args.reasoning_chars,
+        error_429_rate=args.error_429,
+        error_5xx_rate=args.error_5xx
+    )
+    uvicorn.run(create_mock_app(config), host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
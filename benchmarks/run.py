@@ -0,0 +1,371 @@
+"""压测脚本：用本地模拟的火山引擎 API 驱动 FastAPI 应用，输出吞吐、延迟分位数和内存占用
+
+    python -m benchmarks.run                          # 默认场景，与 baseline.json 对比
+    python -m benchmarks.run --scenarios process,detect --concurrency 1,16 --duration 5
+    python -m benchmarks.run --update-baseline        # 以本次结果作为新基线
+
+任一场景的 RPS 下降或 p95 延迟上升超过 --threshold 时以非零状态退出。
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.mock_ark import MockArkServer, MockConfig, free_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# 模拟模式下使用的 API Key（长度需大于 10 才会走上游调用）
+BENCH_API_KEY = "benchmark-api-key"
+# 被测应用的默认环境变量：放宽客户端限流，测量应用本身而不是限流器（可用 --env 覆盖）
+BENCH_ENV = {
+    "UPSTREAM_RATE_LIMIT_RPS": "10000",
+    "UPSTREAM_RATE_LIMIT_TPM": "1000000000",
+}
+
+APPS = {
+    "production": "app.main_production:app",
+    "main": "app.main:app",
+}
+
+SAMPLE_TEXT = (
+    "人工智能技术在学术写作中的应用越来越广泛。首先，它能够帮助研究者快速整理文献。"
+    "其次，它可以对语言表达进行润色。然而，过度依赖工具也可能带来学术规范方面的问题。"
+)
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法计算分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(q / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0
+    }
+
+# ---------- HTTP 场景 ----------
+
+def _unique_text(counter) -> str:
+    # 每个请求使用不同的文本，避免命中结果缓存
+    return f"{SAMPLE_TEXT}（编号{next(counter)}）"
+
+async def _process(client: httpx.AsyncClient, counter) -> httpx.Response:
+    return await client.post("/api/v1/process", json={"content": _unique_text(counter), "style": "academic"})
+
+async def _stream(client: httpx.AsyncClient, counter) -> httpx.Response:
+    payload = {"content": _unique_text(counter), "style": "academic"}
+    async with client.stream("POST", "/api/v1/process/stream", json=payload) as response:
+        await response.aread()
+        return response
+
+async def _batch(client: httpx.AsyncClient, counter) -> httpx.Response:
+    texts = [{"content": _unique_text(counter), "style": "academic"} for _ in range(5)]
+    return await client.post("/api/v1/batch", json=texts)
+
+async def _detect(client: httpx.AsyncClient, counter) -> httpx.Response:
+    return await client.post("/api/v1/detect", json={"content": _unique_text(counter)})
+
+HTTP_SCENARIOS = {
+    "process": _process,
+    "stream": _stream,
+    "batch": _batch,
+    "detect": _detect,
+}
+
+async def drive_http(base_url: str, request: Callable, concurrency: int, duration: float) -> Dict:
+    """以固定并发持续发送请求 duration 秒"""
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        # 预热：建立连接、填充各级缓存和规则编译
+        for _ in range(min(concurrency, 4)):
+            await request(client, counter)
+
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await request(client, counter)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start_time
+
+    return summarize(latencies, errors, elapsed)
+
+# ---------- Celery 场景 ----------
+
+def drive_celery(concurrency: int, duration: float) -> Dict:
+    """在本进程中以 concurrency 个线程执行长文本任务（模拟 threads 池 worker）"""
+    from app.services.celery_app import long_text_processing
+    from app.services.worker_runtime import worker_runtime
+
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors = 0
+    text = "\n\n".join([SAMPLE_TEXT] * 6)
+
+    def run_one() -> bool:
+        result = long_text_processing.apply(args=(f"{text}{next(counter)}", "benchmark")).get()
+        return result["status"] == "completed"
+
+    worker_runtime.start()
+    run_one()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if run_one():
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - start_time
+    worker_runtime.stop()
+
+    return summarize(latencies, errors, elapsed)
+
+# ---------- 被测应用进程 ----------
+
+def _rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+def worker_memory_mb(pid: int) -> List[float]:
+    """被测服务各 worker 进程的常驻内存（仅 Linux）"""
+    children = []
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    # 多 worker 时主进程只负责管理子进程，单 worker 时主进程即 worker
+    pids = [p for p in children if _rss_mb(p) is not None] or [pid]
+    return [m for m in (_rss_mb(p) for p in pids) if m is not None]
+
+class AppServer:
+    """以子进程方式启动被测应用（uvicorn），环境变量指向模拟服务"""
+
+    def __init__(self, app: str, workers: int, env: Dict[str, str]):
+        self.app = app
+        self.workers = workers
+        self.port = free_port()
+        self.env = {**os.environ, **env}
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "AppServer":
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", self.app,
+                "--host", "127.0.0.1", "--port", str(self.port),
+                "--workers", str(self.workers), "--log-level", "warning", "--no-access-log"
+            ],
+            cwd=ROOT,
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(f"{self.base_url}/api/v1/health", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            if self.process.poll() is not None:
+                break
+            time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError(f"被测应用 {self.app} 启动失败")
+
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+# ---------- 基线对比 ----------
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """与基线对比，返回超过阈值的退化项"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get("results", {}).get(key)
+        if not previous:
+            continue
+        if previous["rps"] and current["rps"] < previous["rps"] * (1 - threshold):
+            regressions.append(f"{key}: RPS {previous['rps']} → {current['rps']}")
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{key}: p95 {previous['p95_ms']}ms → {current['p95_ms']}ms")
+        if current["error_rate"] > previous["error_rate"] + threshold:
+            regressions.append(f"{key}: 错误率 {previous['error_rate']} → {current['error_rate']}")
+    return regressions
+
+def _print_table(results: Dict):
+    print(f"{'场景@并发':<18}{'RPS':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'错误率':>8}{'内存MB':>16}")
+    for key, r in results.items():
+        memory = ",".join(str(m) for m in r.get("worker_rss_mb", [])) or "-"
+        print(
+            f"{key:<18}{r['rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+            f"{r['p99_ms']:>10}{r['error_rate']:>8}{memory:>16}"
+        )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AI学术润色系统压测")
+    parser.add_argument("--app", choices=sorted(APPS), default="production")
+    parser.add_argument("--scenarios", default="process,stream,batch,detect,celery")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--duration", type=float, default=10.0, help="每个场景的持续时间（秒）")
+    parser.add_argument("--workers", type=int, default=1, help="被测应用的 worker 进程数")
+    parser.add_argument("--latency", default="lognormal:0.05:0.3", help="模拟上游的延迟分布")
+    parser.add_argument("--reasoning-chars", type=int, default=200)
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-5xx", type=float, default=0.0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的相对退化比例")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="结果 JSON 的输出路径")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="被测应用的额外环境变量")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    levels = [int(c) for c in args.concurrency.split(",")]
+    config = MockConfig(
+        latency=args.latency,
+        reasoning_chars=args.reasoning_chars,
+        error_429_rate=args.error_429,
+        error_5xx_rate=args.error_5xx
+    )
+
+    results: Dict[str, Dict] = {}
+    with MockArkServer(config) as mock:
+        env = {
+            **BENCH_ENV,
+            "ARK_API_KEY": BENCH_API_KEY,
+            "ARK_BASE_URL": mock.base_url,
+            "DEBUG": "false",
+            **dict(item.split("=", 1) for item in args.env)
+        }
+        # Celery 场景在本进程内执行，导入应用模块前设置环境变量
+        os.environ.update(env)
+        http_scenarios = [s for s in scenarios if s in HTTP_SCENARIOS]
+
+        if http_scenarios:
+            with AppServer(APPS[args.app], args.workers, env) as server:
+                for scenario, concurrency in itertools.product(http_scenarios, levels):
+                    result = asyncio.run(
+                        drive_http(server.base_url, HTTP_SCENARIOS[scenario], concurrency, args.duration)
+                    )
+                    result["worker_rss_mb"] = worker_memory_mb(server.process.pid)
+                    results[f"{scenario}@{concurrency}"] = result
+                    print(f"✅ {scenario}@{concurrency}: {result['rps']} req/s, p95 {result['p95_ms']}ms")
+
+        if "celery" in scenarios:
+            for concurrency in levels:
+                result = drive_celery(concurrency, args.duration)
+                result["worker_rss_mb"] = [_rss_mb(os.getpid())]
+                results[f"celery@{concurrency}"] = result
+                print(f"✅ celery@{concurrency}: {result['rps']} task/s, p95 {result['p95_ms']}ms")
+
+        upstream_requests = mock.requests
+
+    report = {
+        "meta": {
+            "timestamp": int(time.time()),
+            "app": args.app,
+            "workers": args.workers,
+            "duration": args.duration,
+            "mock": asdict(config),
+            "env": {k: v for k, v in env.items() if k not in ("ARK_API_KEY", "ARK_BASE_URL")},
+            "upstream_requests": upstream_requests,
+            "python": platform.python_version(),
+            "machine": platform.machine()
+        },
+        "results": results
+    }
+
+    _print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📝 基线已更新: {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"❌ 超过 {args.threshold:.0%} 的性能退化:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("✅ 未发现超过阈值的性能退化")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
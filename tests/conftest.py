@@ -0,0 +1,34 @@
+import importlib
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database(tmp_path_factory):
+    """测试使用临时 SQLite 数据库，不写入开发环境的 ai_processor.db"""
+    from app.core.config import settings
+    from app.models import database
+
+    main = importlib.import_module("app.main")
+    history_store = importlib.import_module("app.services.history_store")
+
+    url = f"sqlite:///{tmp_path_factory.mktemp('db') / 'test.db'}"
+    engine = create_engine(url)
+    async_engine = create_async_engine(database.async_database_url(url))
+    event.listen(engine, "connect", database._enable_sqlite_wal)
+    event.listen(async_engine.sync_engine, "connect", database._enable_sqlite_wal)
+    async_session = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "database_url", url)
+        mp.setattr(database, "engine", engine)
+        mp.setattr(database, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine))
+        mp.setattr(database, "async_engine", async_engine)
+        mp.setattr(database, "AsyncSessionLocal", async_session)
+        mp.setattr(main, "async_engine", async_engine)
+        mp.setattr(history_store, "AsyncSessionLocal", async_session)
+        database.create_tables()
+        yield database
+    engine.dispose()
@@ -0,0 +1,34 @@
+import httpx
+from benchmarks.mock_ark import MockArkServer, MockConfig, sample_latency
+from benchmarks.run import compare, percentile
+
+
+def test_mock_ark_injects_errors_and_streams():
+    """测试模拟服务的错误注入和流式输出"""
+    payload = {"model": "mock", "messages": [{"role": "user", "content": "测试文本"}]}
+
+    with MockArkServer(MockConfig(latency="fixed:0", error_429_rate=1.0)) as mock:
+        response = httpx.post(f"{mock.base_url}/chat/completions", json=payload)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1.0"
+
+    with MockArkServer(MockConfig(latency="fixed:0", chunk_interval=0, reasoning_chars=64)) as mock:
+        response = httpx.post(f"{mock.base_url}/chat/completions", json=payload)
+        assert response.json()["usage"]["completion_tokens_details"]["reasoning_tokens"] == 64
+
+        with httpx.stream("POST", f"{mock.base_url}/chat/completions", json={**payload, "stream": True}) as r:
+            lines = [line for line in r.iter_lines() if line.startswith("data:")]
+        assert lines[-1] == "data: [DONE]"
+        assert '"usage"' in lines[-2]
+
+
+def test_percentile_and_regression_check():
+    """测试分位数计算和基线对比"""
+    assert percentile([0.1 * i for i in range(1, 101)], 95) == 9.5
+    assert sample_latency("fixed:0.2") == 0.2
+
+    baseline = {"results": {"process@8": {"rps": 100.0, "p95_ms": 200.0, "error_rate": 0.0}}}
+    ok = {"process@8": {"rps": 90.0, "p95_ms": 220.0, "error_rate": 0.0}}
+    slow = {"process@8": {"rps": 70.0, "p95_ms": 300.0, "error_rate": 0.0}}
+    assert compare(ok, baseline, threshold=0.2) == []
+    assert len(compare(slow, baseline, threshold=0.2)) == 2
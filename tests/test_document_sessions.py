@@ -0,0 +1,124 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.main_production import app
+from app.services.deepseek_processor import FALLBACK_API
+from app.services.document_sessions import DocumentPolisher, DocumentSessionStore
+
+
+class StubProcessor:
+    """记录每次上游调用的假处理器"""
+
+    def __init__(self, api_used="火山引擎 测试 API"):
+        self.api_used = api_used
+        self.calls = []
+
+    async def process_text(self, text, style="academic", use_cache=True, context="", **kwargs):
+        self.calls.append((text, context))
+        return {"text": f"[{text}]", "ai_score": 0.2, "api_used": self.api_used}
+
+
+DOCUMENT = "第一段内容。\n\n第二段内容。\n\n第三段内容。"
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_resubmit_recomputes_only_changed_paragraph():
+    """测试再次提交时只重新润色变化的段落，并以相邻段落作为上下文"""
+    processor = StubProcessor()
+    polisher = DocumentPolisher(DocumentSessionStore(), processor=processor)
+
+    first = run(polisher.process_document("doc", DOCUMENT))
+    assert first["recomputed"] == [0, 1, 2]
+    assert first["text"] == "[第一段内容。]\n\n[第二段内容。]\n\n[第三段内容。]"
+
+    processor.calls.clear()
+    edited = DOCUMENT.replace("第二段内容。", "第二段改过了。")
+    second = run(polisher.process_document("doc", edited))
+
+    assert second["recomputed"] == [1]
+    assert processor.calls == [("第二段改过了。", "第一段内容。\n\n第三段内容。")]
+    assert second["text"] == "[第一段内容。]\n\n[第二段改过了。]\n\n[第三段内容。]"
+    assert [p["recomputed"] for p in second["paragraphs"]] == [False, True, False]
+
+
+def test_document_whitespace_roundtrip():
+    """测试段落原样返回时输出与原文一致，包括文档开头和末尾的空白"""
+    class EchoProcessor(StubProcessor):
+        async def process_text(self, text, style="academic", use_cache=True, context="", **kwargs):
+            return {"text": text, "ai_score": 0.2, "api_used": self.api_used}
+
+    polisher = DocumentPolisher(DocumentSessionStore(), processor=EchoProcessor())
+    for document in ("a\n\nb\n\n", "\n  第一段。\n\n第二段。  \n \n", DOCUMENT, "  \n"):
+        assert run(polisher.process_document("doc", document, use_cache=False))["text"] == document
+
+
+def test_style_change_and_cache_bypass_recompute_everything():
+    """测试切换风格或跳过缓存时全部重新润色"""
+    processor = StubProcessor()
+    polisher = DocumentPolisher(DocumentSessionStore(), processor=processor)
+    run(polisher.process_document("doc", DOCUMENT, style="academic"))
+
+    assert run(polisher.process_document("doc", DOCUMENT, style="formal"))["recomputed"] == [0, 1, 2]
+    assert run(polisher.process_document("doc", DOCUMENT, style="formal"))["recomputed"] == []
+    assert run(polisher.process_document("doc", DOCUMENT, style="formal", use_cache=False))["recomputed"] == [0, 1, 2]
+
+
+def test_fallback_results_are_not_stored():
+    """测试降级结果不写入会话"""
+    processor = StubProcessor(api_used=FALLBACK_API)
+    polisher = DocumentPolisher(DocumentSessionStore(), processor=processor)
+    run(polisher.process_document("doc", DOCUMENT))
+
+    assert run(polisher.process_document("doc", DOCUMENT))["recomputed"] == [0, 1, 2]
+
+
+def test_store_evicts_least_recently_used(monkeypatch):
+    """测试会话数超过上限时淘汰最久未使用的文档"""
+    monkeypatch.setattr(settings, "document_session_max_documents", 2)
+    store = DocumentSessionStore()
+
+    run(store.set("a", {"style": "academic", "paragraphs": {}}))
+    run(store.set("b", {"style": "academic", "paragraphs": {}}))
+    run(store.get("a"))
+    run(store.set("c", {"style": "academic", "paragraphs": {}}))
+
+    assert run(store.get("b")) is None
+    assert run(store.get("a")) is not None
+    assert store.stats()["evictions"] == 1
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_document_endpoints(client, monkeypatch):
+    """测试文档处理接口、删除接口和文档ID校验"""
+    from app.services.document_sessions import document_polisher
+
+    # 不访问上游和 Redis，会话只保存在进程内
+    monkeypatch.setattr(document_polisher, "processor", StubProcessor())
+    monkeypatch.setattr(document_polisher, "store", DocumentSessionStore())
+    monkeypatch.setattr("app.main_production.document_session_store", document_polisher.store)
+    monkeypatch.setattr(settings, "document_session_redis_enabled", False)
+
+    response = client.post(
+        "/api/v1/documents/paper-1/process",
+        json={"content": DOCUMENT, "style": "academic"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["document_id"] == "paper-1"
+    assert data["paragraph_count"] == 3
+    assert data["recomputed"] == [0, 1, 2]
+
+    invalid = client.post("/api/v1/documents/bad%20id/process", json={"content": DOCUMENT})
+    assert invalid.status_code == 422
+
+    assert client.delete("/api/v1/documents/paper-1").status_code == 200
+    assert client.delete("/api/v1/documents/paper-1").status_code == 404
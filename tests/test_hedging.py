@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services.hedging import Hedger
+
+
+@pytest.fixture
+def hedger(monkeypatch):
+    """启用对冲、延迟下限 10ms，并预先填入足够的延迟样本"""
+    monkeypatch.setattr(settings, "upstream_hedging_enabled", True)
+    monkeypatch.setattr(settings, "upstream_hedge_min_delay", 0.01)
+    monkeypatch.setattr(settings, "upstream_hedge_max_ratio", 1.0)
+    instance = Hedger()
+    for tracker in instance.trackers.values():
+        for _ in range(100):
+            tracker.record(0.01)
+    return instance
+
+
+def test_hedge_wins_and_cancels_slow_primary(hedger):
+    """测试主请求变慢时发出对冲请求，先完成的胜出，另一个被取消"""
+    cancelled = []
+
+    async def slow_primary():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append("primary")
+            raise
+        return "primary"
+
+    async def fast_hedge():
+        return "hedge"
+
+    assert asyncio.run(hedger.run(slow_primary, fast_hedge, tokens=10)) == (True, "hedge")
+    assert cancelled == ["primary"]
+    assert hedger.counters["hedged"] == hedger.counters["hedge_wins"] == 1
+
+
+def test_fast_primary_is_not_hedged(hedger):
+    """测试主请求在对冲延迟内完成时不发出对冲请求"""
+    async def primary():
+        return "primary"
+
+    async def hedge():
+        raise AssertionError("不应发出对冲请求")
+
+    assert asyncio.run(hedger.run(primary, hedge, tokens=10)) == (False, "primary")
+    assert hedger.counters["hedged"] == 0
+
+
+def test_hedge_budget_and_failed_hedge(hedger, monkeypatch):
+    """测试对冲额度耗尽后不再对冲，对冲失败时仍返回主请求结果"""
+    async def primary():
+        await asyncio.sleep(0.05)
+        return "primary"
+
+    async def failing_hedge():
+        raise RuntimeError("对冲请求失败")
+
+    async def main():
+        return [await hedger.run(primary, failing_hedge, tokens=10) for _ in range(3)]
+
+    hedger.budget = type(hedger.budget)(ratio=0.0)
+    hedger.budget.credits = 1.0
+    assert asyncio.run(main()) == [(False, "primary")] * 3
+    assert hedger.counters["hedged"] == 1
+    assert hedger.counters["primary_wins"] == 1
+    assert hedger.counters["budget_skipped"] == 2
+
+
+def test_stream_hedge_switches_to_faster_stream(hedger):
+    """测试流式对冲以首个事件决定胜出的流"""
+    closed = []
+
+    async def slow_stream():
+        try:
+            await asyncio.sleep(5)
+            yield {"event": "content", "data": {"delta": "慢"}}
+        finally:
+            closed.append("primary")
+
+    async def fast_stream():
+        for delta in ("快", "速"):
+            yield {"event": "content", "data": {"delta": delta}}
+
+    async def collect():
+        return [e["data"]["delta"] async for e in hedger.stream(slow_stream, fast_stream, tokens=10)]
+
+    assert asyncio.run(collect()) == ["快", "速"]
+    assert closed == ["primary"]
+    assert hedger.counters["hedge_wins"] == 1
+
+
+def test_processor_labels_and_caches_hedge_winner(hedger, monkeypatch):
+    """测试对冲请求胜出时按对冲模型标注 api_used，并写入对冲模型的缓存项"""
+    from app.services import deepseek_processor as processor_module
+    from app.services.deepseek_processor import deepseek_processor
+    from app.services.model_router import REASONING_LANE, model_router
+
+    monkeypatch.setattr(settings, "upstream_hedge_model_id", "hedge-model")
+    monkeypatch.setattr(processor_module, "hedger", hedger)
+    monkeypatch.setattr(deepseek_processor, "api_key", "test-key-123456789")
+    primary_model = model_router.lanes[REASONING_LANE].model_id
+
+    async def fake_call(text, style, context, max_tokens, model_id=None, base_url=None):
+        if model_id == primary_model:
+            await asyncio.sleep(5)
+        return {"text": f"{model_id} 的结果", "reasoning": "", "ai_score": 0.1}
+
+    cached = {}
+
+    async def fake_set(key, value):
+        cached[key] = value
+
+    monkeypatch.setattr(deepseek_processor, "_call_ark_api", fake_call)
+    monkeypatch.setattr(processor_module.result_cache, "set", fake_set)
+
+    result = asyncio.run(deepseek_processor.process_text("对冲文本", use_cache=False, preference="quality"))
+
+    assert result["text"] == "hedge-model 的结果"
+    assert "hedge-model" in result["api_used"]
+    assert list(cached) == [deepseek_processor._cache_key("对冲文本", "academic", "hedge-model", "")]
@@ -0,0 +1,164 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.config import settings
+from app.models.database import ProcessingHistory, async_database_url
+from app.services.history_writer import HistoryWriter
+
+
+def _history_count(database) -> int:
+    with database.SessionLocal() as db:
+        return db.query(ProcessingHistory).count()
+
+
+def test_async_database_url():
+    """测试同步数据库 URL 转换为异步驱动"""
+    assert async_database_url("sqlite:///./ai_processor.db") == "sqlite+aiosqlite:///./ai_processor.db"
+    assert async_database_url("postgresql://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+    assert async_database_url("postgresql+asyncpg://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+
+
+def test_writer_batches_and_drains_on_stop(monkeypatch, database):
+    """测试记录按批量写入，关闭时排空队列"""
+    monkeypatch.setattr(settings, "history_batch_size", 10)
+    monkeypatch.setattr(settings, "history_flush_interval", 5.0)
+    with TestClient(app):
+        pass
+    before = _history_count(database)
+    writer = HistoryWriter()
+
+    async def main():
+        await writer.start()
+        for i in range(25):
+            assert writer.enqueue("test-user", f"原文{i}", f"结果{i}", 0.1, 0.01)
+        await asyncio.sleep(0.1)
+        # 攒满的两批已写入，剩余 5 条在关闭时写入
+        assert writer.stats()["batches"] == 2
+        await writer.stop()
+        await database.async_engine.dispose()
+
+    asyncio.run(main())
+    assert writer.stats()["written"] == 25
+    assert writer.stats()["batches"] == 3
+    assert not writer.enqueue("test-user", "原文", "结果", 0.1, 0.01)
+    assert _history_count(database) == before + 25
+
+
+def test_process_request_persists_history(database):
+    """测试同步处理接口的历史记录在应用关闭前写入"""
+    with TestClient(app) as client:
+        before = _history_count(database)
+        response = client.post("/api/v1/process", json={"content": "这是一个历史记录测试。", "style": "academic"})
+        assert response.status_code == 200
+    assert _history_count(database) == before + 1
+
+
+def test_history_store_dedupes_and_paginates(database):
+    """测试正文去重存储和游标分页"""
+    from datetime import datetime, timedelta
+    from app.models.database import TextBlob
+    from app.services.history_store import history_store
+
+    with TestClient(app):
+        pass
+    user_id = f"page-user-{datetime.utcnow().timestamp()}"
+    now = datetime.utcnow()
+    records = [
+        {
+            "user_id": user_id,
+            "original_text": "重复的输入文本。" * 20 + user_id,
+            "processed_text": f"{user_id}第{i}次的处理结果。",
+            "ai_probability": 0.2,
+            "processing_time": 0.01,
+            "created_at": now - timedelta(seconds=i // 2)  # 成对的相同时间戳
+        }
+        for i in range(7)
+    ]
+
+    async def main():
+        with database.SessionLocal() as db:
+            blobs_before = db.query(TextBlob).count()
+        await history_store.write(records)
+        with database.SessionLocal() as db:
+            # 7 条记录共享同一份原文
+            assert db.query(TextBlob).count() == blobs_before + 8
+
+        seen, cursor = [], None
+        while True:
+            page = await history_store.list_history(user_id, limit=3, cursor=cursor)
+            seen.extend(item["processed_text"][len(user_id):] for item in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        # 时间倒序，同一时间戳按 id 倒序，跨页不重不漏
+        assert seen == [f"第{i}次的处理结果。" for i in (1, 0, 3, 2, 5, 4, 6)]
+
+        page = await history_store.list_history(user_id, limit=10, include_text=False)
+        assert all(item["original_text"] is None for item in page["items"])
+        await database.async_engine.dispose()
+
+    asyncio.run(main())
+
+
+def test_history_endpoint_rejects_bad_cursor():
+    """测试无效游标返回 400"""
+    with TestClient(app) as client:
+        response = client.get("/api/v1/history", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+        response = client.get("/api/v1/history", params={"limit": 5})
+        assert response.status_code == 200
+        assert "items" in response.json()
+
+
+def test_create_tables_migrates_legacy_history(tmp_path, monkeypatch, database):
+    """测试旧版历史表（正文列）升级为按哈希引用 text_blobs，已有记录可以继续读取"""
+    from datetime import datetime
+    from sqlalchemy import create_engine, inspect, text
+    from app.services.history_store import history_store
+    from app.utils.compression import decompress
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE processing_history (id INTEGER PRIMARY KEY, user_id VARCHAR, "
+            "original_text TEXT, processed_text TEXT, ai_probability FLOAT, "
+            "processing_time FLOAT, created_at DATETIME)"
+        ))
+        connection.execute(text("CREATE INDEX ix_processing_history_user_id ON processing_history (user_id)"))
+        for i, original in enumerate(["旧的原文。", "旧的原文。", "另一段原文。"]):
+            connection.execute(
+                text("INSERT INTO processing_history VALUES (:id, 'legacy-user', :o, :p, 0.2, 0.1, :t)"),
+                {"id": i + 1, "o": original, "p": f"旧的结果{i}。", "t": datetime(2024, 1, 1, 0, 0, i)}
+            )
+
+    monkeypatch.setattr(database, "engine", engine)
+    database.create_tables()
+    database.create_tables()  # 重复执行不做任何操作
+
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("processing_history")}
+    assert "original_text" not in columns and {"original_hash", "processed_hash"} <= columns
+    assert "ix_processing_history_user_created" in {
+        index["name"] for index in inspector.get_indexes("processing_history")
+    }
+
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT h.id, o.codec, o.data FROM processing_history h "
+            "JOIN text_blobs o ON o.hash = h.original_hash ORDER BY h.id"
+        )).all()
+        blob_count = connection.execute(text("SELECT COUNT(*) FROM text_blobs")).scalar()
+    assert [decompress(codec, data).decode() for _, codec, data in rows] == ["旧的原文。", "旧的原文。", "另一段原文。"]
+    # 两条记录共享同一份原文
+    assert blob_count == 5
+
+    _, prepared = history_store.prepare([{
+        "user_id": "legacy-user", "original_text": "旧的原文。", "processed_text": "旧的结果0。",
+        "ai_probability": 0.2, "processing_time": 0.1, "created_at": datetime(2024, 1, 1)
+    }])
+    with engine.connect() as connection:
+        assert connection.execute(
+            text("SELECT original_hash FROM processing_history WHERE id = 1")
+        ).scalar() == prepared[0]["original_hash"]
+    engine.dispose()
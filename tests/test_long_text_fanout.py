@@ -0,0 +1,164 @@
+import pytest
+from celery.backends.cache import CacheBackend
+from app.api.v1 import endpoints
+from app.core.config import settings
+from app.services import celery_app as celery_module
+from app.services.long_text_pipeline import long_text_pipeline
+from app.services.worker_runtime import worker_runtime
+
+
+class StubProcessor:
+    async def process_text(self, text, style="academic", use_cache=True, context="", **kwargs):
+        return {"text": f"[{text}]", "ai_score": 0.2, "api_used": "stub", "processing_time": 0.0}
+
+
+TEXT = "\n\n".join(f"第{i}段。这是用于测试分发的段落内容，句子足够长以便切分。" for i in range(6))
+
+
+@pytest.fixture
+def stub_pipeline(monkeypatch):
+    # chord 在 eager 模式下也会访问结果后端，测试中改用进程内的缓存后端
+    backend = CacheBackend(app=celery_module.celery_app, url="memory://")
+    monkeypatch.setattr(type(celery_module.celery_app), "backend", property(lambda app: backend))
+    monkeypatch.setattr(long_text_pipeline, "processor", StubProcessor())
+    monkeypatch.setattr(settings, "long_text_chunk_tokens", 30)
+    monkeypatch.setattr(settings, "long_text_overlap_sentences", 0)
+    recorded = []
+    monkeypatch.setattr(celery_module.task_progress_store, "start", lambda task_id, total: None)
+    monkeypatch.setattr(
+        celery_module.task_progress_store, "record",
+        lambda task_id, index, text: recorded.append(index) or len(recorded)
+    )
+    monkeypatch.setattr(celery_module.task_progress_store, "clear", lambda task_id: None)
+    yield recorded
+    worker_runtime.stop()
+
+
+def test_fanout_matches_inline_result(stub_pipeline, monkeypatch):
+    """测试分发到子任务后按原顺序合并，结果与单任务处理一致"""
+    monkeypatch.setattr(settings, "long_text_fanout_enabled", False)
+    inline = celery_module.long_text_processing.apply(args=(TEXT, "user-1")).get()
+
+    monkeypatch.setattr(settings, "long_text_fanout_enabled", True)
+    monkeypatch.setattr(settings, "long_text_fanout_min_chunks", 2)
+    monkeypatch.setattr(settings, "long_text_fanout_chunks_per_task", 2)
+    fanned_out = celery_module.long_text_processing.apply(args=(TEXT, "user-1")).get()
+
+    assert fanned_out["status"] == "completed"
+    assert fanned_out["result"]["text"] == inline["result"]["text"]
+    chunk_count = len(inline["result"]["chunks"])
+    assert chunk_count >= 2
+    assert sorted(stub_pipeline) == list(range(chunk_count))
+    assert [chunk["index"] for chunk in fanned_out["result"]["chunks"]] == list(range(chunk_count))
+
+
+def test_task_status_reports_partial_progress(monkeypatch):
+    """测试处理中的分发任务返回完成数和部分结果"""
+    class StubResult:
+        state = "PROGRESS"
+        info = {"completed": 0, "total": 4}
+
+    monkeypatch.setattr(endpoints.celery_app, "AsyncResult", lambda task_id: StubResult())
+    monkeypatch.setattr(
+        endpoints.task_progress_store, "get",
+        lambda task_id: {"completed": 1, "total": 4, "segments": [{"index": 2, "text": "润色结果"}]}
+    )
+
+    status = endpoints._task_status("task-1")
+    assert status["status"] == "processing"
+    assert status["progress"] == {"completed": 1, "total": 4}
+    assert status["partial_result"] == [{"index": 2, "text": "润色结果"}]
+
+
+def test_inline_failure_fails_the_task(stub_pipeline, monkeypatch):
+    """测试不分发时处理出错同样使任务失败，与分发方式的 ChordError 一致"""
+    class FailingProcessor:
+        async def process_text(self, *args, **kwargs):
+            raise RuntimeError("上游不可用")
+
+    monkeypatch.setattr(settings, "long_text_fanout_enabled", False)
+    monkeypatch.setattr(long_text_pipeline, "processor", FailingProcessor())
+    result = celery_module.long_text_processing.apply(args=(TEXT, "user-1"))
+
+    assert result.state == "FAILURE"
+    with pytest.raises(RuntimeError):
+        result.get()
+
+
+def test_progress_record_counts_chunks_and_expires(monkeypatch):
+    """测试进度只统计分段字段，并在记录时设置过期时间"""
+    from app.services.task_progress import TaskProgressStore
+
+    class FakePipeline:
+        def __init__(self, redis):
+            self.redis = redis
+            self.results = []
+
+        def hset(self, key, field, value):
+            self.redis.hashes.setdefault(key, {})[field] = value
+            self.results.append(1)
+
+        def expire(self, key, ttl):
+            self.redis.ttls[key] = ttl
+            self.results.append(True)
+
+        def hkeys(self, key):
+            self.results.append([field.encode() for field in self.redis.hashes.get(key, {})])
+
+        def execute(self):
+            return self.results
+
+    class FakeRedis:
+        def __init__(self):
+            self.hashes = {}
+            self.ttls = {}
+
+        def pipeline(self):
+            return FakePipeline(self)
+
+    redis = FakeRedis()
+    store = TaskProgressStore()
+    monkeypatch.setattr(store, "_get_redis", lambda: redis)
+    monkeypatch.setattr(settings, "long_text_fanout_progress_ttl", 600)
+
+    # start 未写入 total 时也不会少算
+    assert store.record("task-1", 0, "第一段") == 1
+    assert store.record("task-1", 3, "第四段") == 2
+    redis.hashes["task-progress:task-1"]["total"] = "4"
+    assert store.record("task-1", 1, "第二段") == 3
+    assert redis.ttls["task-progress:task-1"] == 600
+
+
+def test_failed_segment_publishes_parent_failure(stub_pipeline, monkeypatch):
+    """测试分段子任务失败时 chord 的回调为父任务推送 failed 并清除进度"""
+    class FailingProcessor:
+        async def process_text(self, *args, **kwargs):
+            raise RuntimeError("上游不可用")
+
+    monkeypatch.setattr(long_text_pipeline, "processor", FailingProcessor())
+    published, cleared = [], []
+    monkeypatch.setattr(
+        celery_module.task_event_publisher, "publish",
+        lambda task_id, status, **data: published.append((task_id, status, data))
+    )
+    monkeypatch.setattr(celery_module.task_progress_store, "clear", cleared.append)
+
+    chunks = long_text_pipeline.split(TEXT)
+    groups = [[celery_module._chunk_payload(chunk)] for chunk in chunks]
+    signature = celery_module._fanout_chord("parent-1", len(chunks), groups, "user-1", "academic", 0.0)
+    signature.freeze("parent-1")
+
+    # 与 Redis 结果后端处理失败分段的流程一致：在异常处理中调用 chord 回调的错误回调
+    segment = celery_module.long_text_segment.apply(args=("parent-1", len(chunks), groups[0], "user-1"))
+    assert segment.state == "FAILURE"
+    backend = celery_module.celery_app.backend
+    try:
+        raise segment.result
+    except RuntimeError as exc:
+        backend.chord_error_from_stack(signature.body, exc)
+
+    assert cleared == ["parent-1"]
+    parent_events = [(status, data) for task_id, status, data in published if task_id == "parent-1"]
+    assert [status for status, _ in parent_events] == ["failed"]
+    assert "上游不可用" in parent_events[0][1]["error"]
+    assert backend.get_task_meta("parent-1")["status"] == "FAILURE"
@@ -0,0 +1,32 @@
+from app.services.metrics import Counter, Histogram, Metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    """测试直方图按累计分桶输出"""
+    histogram = Histogram("demo_seconds", "示例", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, route="/a")
+
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="/a",le="1"} 3' in lines
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{route="/a"} 4' in lines
+    assert histogram.count(route="/a") == 4
+
+
+def test_counter_labels_and_usage():
+    """测试计数器标签转义和 usage 累加"""
+    counter = Counter("demo_total", "示例", ("api",))
+    counter.inc(api='say "hi"')
+    assert 'demo_total{api="say \\"hi\\""} 1' in counter.render()
+
+    metrics = Metrics()
+    metrics.record_usage({
+        "prompt_tokens": 12,
+        "completion_tokens": 30,
+        "completion_tokens_details": {"reasoning_tokens": 18}
+    })
+    assert metrics.tokens.value(type="prompt") == 12
+    assert metrics.tokens.value(type="reasoning") == 18
+    assert "# TYPE upstream_tokens_total counter" in metrics.render()
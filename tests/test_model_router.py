@@ -0,0 +1,33 @@
+from app.core.config import settings
+from app.services.model_router import FAST_LANE, REASONING_LANE, ModelRouter
+
+SHORT_TEXT = "今天天气不错。"
+LONG_TEXT = "人工智能技术在学术写作中的应用越来越广泛，研究者需要关注其规范使用。" * 10
+
+
+def test_route_by_length_style_and_preference():
+    """测试按长度、风格和客户端偏好选择通道"""
+    router = ModelRouter()
+    assert router.route(SHORT_TEXT, "academic").name == FAST_LANE
+    assert router.route(LONG_TEXT, "academic").name == REASONING_LANE
+    assert router.route(LONG_TEXT, "casual").name == FAST_LANE
+    assert router.route(SHORT_TEXT, "academic", "quality").name == REASONING_LANE
+    assert router.route(LONG_TEXT, "academic", "speed").name == FAST_LANE
+
+    lane = router.route(SHORT_TEXT)
+    assert lane.model_id == settings.fast_model_id
+    assert lane.model_id in lane.api_used and lane.title in lane.api_used
+
+
+def test_route_spills_over_when_lane_saturated(monkeypatch):
+    """测试自动路由时所选通道已满则溢出，显式偏好不溢出"""
+    router = ModelRouter()
+    fast = router.lanes[FAST_LANE]
+    fast.in_flight = fast.concurrency
+
+    assert router.route(SHORT_TEXT).name == REASONING_LANE
+    assert router.route(SHORT_TEXT, preference="speed").name == FAST_LANE
+    assert router.counters["spilled"] == 1
+
+    monkeypatch.setattr(settings, "model_routing_enabled", False)
+    assert router.route(SHORT_TEXT, preference="speed").name == REASONING_LANE
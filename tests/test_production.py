@@ -0,0 +1,262 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.main_production import app
+from app.services.deepseek_processor import PROMPT_VERSION
+from app.services.model_router import model_router
+from app.services.result_cache import result_cache
+
+
+@pytest.fixture(scope="module")
+def client():
+    """运行生产应用的 lifespan（创建并关闭上游连接池）"""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_upstream_pool_stats(client):
+    """测试上游连接池统计"""
+    response = client.get("/api/v1/stats")
+    assert response.status_code == 200
+
+    pool = response.json()["upstream_pool"]
+    assert pool["started"] is True
+    assert pool["active_connections"] >= 0
+    assert pool["idle_connections"] >= 0
+    assert "pool_wait_avg_ms" in pool
+
+def test_process_stream(client):
+    """测试流式处理接口的 SSE 事件"""
+    test_data = {
+        "content": "人工智能技术在学术写作中的应用越来越广泛。",
+        "style": "academic"
+    }
+
+    with client.stream("POST", "/api/v1/process/stream", json=test_data) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+
+    events = [block.split("\n")[0] for block in body.strip().split("\n\n")]
+    assert "event: content" in events
+    assert events[-1] == "event: done"
+    assert '"ai_probability"' in body
+    assert '"api_used"' in body
+
+def test_result_cache_and_bypass(client):
+    """测试结果缓存命中及 X-Cache-Bypass 请求头"""
+    test_data = {"content": "缓存测试：重复提交的相同文本。", "style": "formal"}
+    cache_key = result_cache.make_key(
+        "deepseek", test_data["content"], "formal",
+        model_router.route(test_data["content"], "formal").model_id, PROMPT_VERSION
+    )
+    asyncio.run(result_cache.set(cache_key, {
+        "text": "缓存的润色结果",
+        "reasoning": "",
+        "ai_score": 0.15,
+        "api_used": "火山引擎 DeepSeek-R1 API",
+        "style_used": "formal"
+    }))
+
+    response = client.post("/api/v1/process", json=test_data)
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "HIT"
+    assert response.json()["processed_text"] == "缓存的润色结果"
+
+    response = client.post("/api/v1/process", json=test_data, headers={"X-Cache-Bypass": "1"})
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "MISS"
+
+    stats = client.get("/api/v1/stats").json()["result_cache"]
+    assert stats["memory_hits"] >= 1
+
+
+def test_local_processor_bypass_refreshes_cache():
+    """测试本地处理器跳过缓存时用新结果刷新缓存项"""
+    from app.services import ai_processor as module
+
+    text = "本地处理器缓存刷新测试。"
+    cache_key = result_cache.make_key("mock", text, "academic", module.MODEL_ID, module.PROMPT_VERSION)
+    asyncio.run(result_cache.set(cache_key, {"text": "过期的结果", "ai_score": 0.5}))
+
+    result = asyncio.run(module.ai_processor.process_text(text, use_cache=False))
+    assert result["cache_hit"] is False
+    assert asyncio.run(result_cache.get(cache_key))["text"] == result["text"]
+
+
+def test_cache_key_normalization():
+    """测试仅有空白差异的文本使用同一缓存键"""
+    key_a = result_cache.make_key("deepseek", "第一行  文本\r\n第二行 ", "academic", "m", "v1")
+    key_b = result_cache.make_key("deepseek", " 第一行 文本\n第二行", "academic", "m", "v1")
+    key_c = result_cache.make_key("deepseek", "第一行 文本\n第二行", "formal", "m", "v1")
+    assert key_a == key_b
+    assert key_a != key_c
+
+def test_batch_process(client):
+    """测试并发批量处理"""
+    test_data = [
+        {"content": "第一段测试文本。", "style": "academic"},
+        {"content": "第二段测试文本。", "style": "casual"}
+    ]
+
+    response = client.post("/api/v1/batch", json=test_data)
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["total_count"] == 2
+    assert data["success_count"] == 2
+    assert [r["index"] for r in data["results"]] == [0, 1]
+
+
+def test_batch_process_ndjson_stream(client):
+    """测试批量处理的 NDJSON 流式输出"""
+    test_data = [{"content": f"第{i}段测试文本。"} for i in range(12)]
+
+    response = client.post("/api/v1/batch?stream=true", json=test_data)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.strip().split("\n")]
+    assert sorted(line["index"] for line in lines[:-1]) == list(range(12))
+    assert lines[-1]["type"] == "summary"
+    assert lines[-1]["total_count"] == 12
+
+    # 非流式模式仍然限制条目数
+    response = client.post("/api/v1/batch", json=test_data)
+    assert response.status_code == 400
+
+def test_process_long_text(client):
+    """测试长文本分段处理接口（超过单次请求的长度上限）"""
+    paragraph = "人工智能技术在学术写作中的应用越来越广泛，研究者需要关注其规范使用。" * 10
+    content = "\n\n".join([paragraph] * 40)
+    assert len(content) > 10000
+
+    response = client.post("/api/v1/process/long", json={"content": content, "style": "academic"})
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["chunk_count"] == len(data["chunks"]) > 1
+    assert [c["index"] for c in data["chunks"]] == list(range(data["chunk_count"]))
+    assert all(c["processing_time"] >= 0 for c in data["chunks"])
+
+def test_detect_local_engine(client):
+    """测试本地AI检测接口返回逐句结果"""
+    content = (
+        "首先，人工智能技术在教育领域具有重要意义。其次，人工智能技术可以提高学习效率。"
+        "最后，人工智能技术将改变传统教学模式。"
+    )
+    response = client.post("/api/v1/detect", json={"content": content})
+    assert response.status_code == 200
+
+    data = response.json()
+    assert 0.0 <= data["ai_probability"] <= 1.0
+    assert data["confidence_level"] in ("low", "medium", "high")
+    assert {"pattern_score", "complexity_score", "semantic_score"} <= set(data["analysis"])
+    assert len(data["sentences"]) == 3
+    assert content[data["sentences"][1]["start"]:data["sentences"][1]["end"]] == data["sentences"][1]["text"]
+
+
+def test_detect_batch(client):
+    """测试批量AI检测接口"""
+    texts = [
+        {"content": "首先，这是一个测试。其次，这也是测试。综上所述，测试完成。"},
+        {"content": "昨天去图书馆忘了带卡！只好在门口等了半小时，唉。"}
+    ]
+    response = client.post("/api/v1/detect/batch", json={"texts": texts})
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["total_count"] == 2
+    assert data["results"][0]["ai_probability"] > data["results"][1]["ai_probability"]
+
+def test_metrics_endpoint(client):
+    """测试 Prometheus 指标接口"""
+    client.post("/api/v1/process", json={"content": "用于指标统计的测试文本。", "style": "academic"})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    body = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_requests_total{method="POST",route="/api/v1/process",status="200"}' in body
+    assert 'fallback_activations_total{reason="no_api_key"}' in body
+    assert 'api_used_total{api="Fallback Mode"}' in body
+    assert "upstream_pool_connections" in body
+
+def test_process_reroutes_oversized_input(client, monkeypatch):
+    """测试超出单次调用 token 上限的请求改走长文本分段，流式接口返回 413"""
+    monkeypatch.setattr(settings, "model_context_tokens", 400)
+    monkeypatch.setattr(settings, "long_text_chunk_tokens", 50)
+    content = "人工智能正在改变学术写作的方式。" * 30
+
+    response = client.post("/api/v1/process", json={"content": content, "style": "academic"})
+    assert response.status_code == 200
+    assert response.json()["processed_text"]
+
+    response = client.post("/api/v1/process/stream", json={"content": content, "style": "academic"})
+    assert response.status_code == 413
+
+def test_readiness_probe(client):
+    """测试 lifespan 启动完成后就绪检查返回 ready"""
+    response = client.get("/api/v1/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+def test_process_field_selection(client):
+    """测试 ?fields= 只返回指定字段，未知字段返回 400"""
+    test_data = {"content": "字段选择测试：只返回润色结果和AI概率。", "style": "academic"}
+
+    response = client.post("/api/v1/process?fields=processed_text,ai_probability", json=test_data)
+    assert response.status_code == 200
+    assert set(response.json()) == {"processed_text", "ai_probability"}
+    assert response.headers["X-Cache"] in ("HIT", "MISS")
+
+    response = client.post("/api/v1/process?fields=processed_text,unknown", json=test_data)
+    assert response.status_code == 400
+
+    # 字段按所选的 response_mode 校验
+    response = client.post("/api/v1/process?fields=stats", json=test_data)
+    assert response.status_code == 400
+    response = client.post("/api/v1/process?response_mode=diff&fields=processed_text", json=test_data)
+    assert response.status_code == 400
+
+def test_response_compression(client):
+    """测试超过阈值的响应按 Accept-Encoding 压缩，小响应不压缩"""
+    content = "人工智能技术在学术写作中的应用越来越广泛，研究者需要关注其规范使用。" * 20
+    response = client.post(
+        "/api/v1/process",
+        json={"content": content, "style": "academic"},
+        headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["original_text"] == content
+
+    response = client.get("/api/v1/ready", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+def test_process_diff_mode(client):
+    """测试 diff 响应模式返回可还原润色结果的编辑操作"""
+    from app.utils.text_diff import apply_edits
+
+    content = "首先，人工智能技术在教育领域具有重要意义。其次，它可以提高学习效率。"
+    full = client.post("/api/v1/process", json={"content": content, "style": "academic"}).json()
+
+    response = client.post(
+        "/api/v1/process?response_mode=diff",
+        json={"content": content, "style": "academic"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert "processed_text" not in data and "original_text" not in data
+    assert apply_edits(content, data["edits"]) == full["processed_text"]
+    assert data["stats"]["original_length"] == len(content)
+
+    response = client.post(
+        "/api/v1/process?response_mode=diff&fields=stats",
+        json={"content": content, "style": "academic"}
+    )
+    assert set(response.json()) == {"stats"}
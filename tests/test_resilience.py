@@ -0,0 +1,175 @@
+import asyncio
+import pytest
+from app.services.resilience import (
+    CircuitBreaker, CircuitOpenError, RateLimiter, RateLimitExceeded, UpstreamError, UpstreamGuard
+)
+
+
+def make_breaker(**overrides):
+    options = dict(
+        window=10,
+        min_calls=4,
+        failure_rate=0.5,
+        slow_call_seconds=1.0,
+        slow_call_rate=0.8,
+        open_seconds=60.0,
+        half_open_calls=1
+    )
+    options.update(overrides)
+    return CircuitBreaker(**options)
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """测试熔断器在持续失败时打开，半开探测成功后关闭"""
+    breaker = make_breaker()
+    for _ in range(4):
+        assert breaker.allow()
+        breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    # 模拟打开时间已过，进入半开状态，只放行一个探测请求
+    breaker.opened_at -= 61
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_opens_on_slow_calls():
+    """测试慢调用比例过高时打开熔断器"""
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.allow()
+        breaker.record_success(5.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_rate_limiter_rejects_when_wait_too_long():
+    """测试限流等待超过上限时拒绝"""
+    limiter = RateLimiter(rps=1, tpm=600, max_wait=0.05)
+
+    async def main():
+        await limiter.acquire(10)
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire(10)
+
+    asyncio.run(main())
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_guard_retries_and_short_circuits(monkeypatch):
+    """测试可重试错误会重试，熔断打开后直接拒绝"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "upstream_retry_base_delay", 0.001)
+    monkeypatch.setattr(settings, "upstream_retry_max_delay", 0.002)
+
+    guard = UpstreamGuard()
+    guard.breaker = make_breaker(min_calls=100)
+    attempts = 0
+
+    async def flaky():
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise UpstreamError("busy", status_code=429, retry_after=0)
+        return "ok"
+
+    assert asyncio.run(guard.call(flaky, tokens=10)) == "ok"
+    assert attempts == 3
+    assert guard.stats()["retries"] == 2
+
+    async def bad_request():
+        raise UpstreamError("bad", status_code=400)
+
+    with pytest.raises(UpstreamError):
+        asyncio.run(guard.call(bad_request, tokens=10))
+    assert guard.stats()["retries"] == 2
+
+    guard.breaker._transition(CircuitBreaker.OPEN)
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(guard.call(flaky, tokens=10))
+
+
+def test_client_errors_do_not_trip_the_breaker():
+    """测试 4xx 不计入熔断统计，5xx、超时和网络错误计入"""
+    guard = UpstreamGuard()
+    guard.breaker = make_breaker(min_calls=2)
+
+    async def fail_with(status_code):
+        raise UpstreamError("error", status_code=status_code, retryable=False)
+
+    for status_code in (400, 401, 422, 400):
+        with pytest.raises(UpstreamError):
+            asyncio.run(guard.call(lambda: fail_with(status_code), tokens=10))
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+    assert guard.breaker.stats()["window_calls"] == 0
+
+    for status_code in (503, None):
+        with pytest.raises(UpstreamError):
+            asyncio.run(guard.call(lambda: fail_with(status_code), tokens=10))
+    assert guard.breaker.state == CircuitBreaker.OPEN
+
+
+def test_retries_share_one_half_open_probe(monkeypatch):
+    """测试半开状态下一次调用的重试沿用同一个探测名额"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "upstream_retry_base_delay", 0.001)
+    monkeypatch.setattr(settings, "upstream_retry_max_delay", 0.002)
+
+    guard = UpstreamGuard()
+    guard.breaker = make_breaker(half_open_calls=1, open_seconds=0.0)
+    guard.breaker._transition(CircuitBreaker.OPEN)
+    attempts = 0
+
+    async def throttled_then_ok():
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise UpstreamError("busy", status_code=429, retry_after=0)
+        return "ok"
+
+    assert asyncio.run(guard.call(throttled_then_ok, tokens=10)) == "ok"
+    assert attempts == 3
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+    # 探测调用遇到上游故障时重新打开，剩余的重试不再发出
+    guard.breaker._transition(CircuitBreaker.OPEN)
+    calls = 0
+
+    async def unavailable():
+        nonlocal calls
+        calls += 1
+        raise UpstreamError("down", status_code=503)
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(guard.call(unavailable, tokens=10))
+    assert calls == 1
+
+
+def test_cancel_during_backoff_releases_probe(monkeypatch):
+    """测试在重试退避期间取消调用时归还半开探测名额"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "upstream_retry_max_delay", 10.0)
+    monkeypatch.setattr(settings, "upstream_retry_deadline", 30.0)
+
+    guard = UpstreamGuard()
+    guard.breaker = make_breaker(half_open_calls=1, open_seconds=0.0)
+    guard.breaker._transition(CircuitBreaker.OPEN)
+
+    async def throttled():
+        raise UpstreamError("busy", status_code=429, retry_after=5)
+
+    async def cancel_during_backoff():
+        task = asyncio.create_task(guard.call(throttled, tokens=10))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_during_backoff())
+    assert guard.breaker.state == CircuitBreaker.HALF_OPEN
+    assert guard.breaker._probes_started == 0
@@ -0,0 +1,136 @@
+import time
+import pytest
+from app.core.config import settings
+from app.services.blob_store import blob_key
+from app.services.result_retention import BLOBS_KEY, INDEX_KEY, SIZES_KEY, TOTAL_KEY, ResultRetention
+
+
+class FakeRedis:
+    """只实现 ResultRetention 用到的命令"""
+
+    def __init__(self):
+        self.zsets = {}
+        self.hashes = {}
+        self.values = {}
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def _sorted(self, key):
+        return sorted(self.zsets.get(key, {}).items(), key=lambda item: item[1])
+
+    def zrange(self, key, start, end):
+        return [member for member, _ in self._sorted(key)][start:end + 1]
+
+    def zrangebyscore(self, key, low, high, start=0, num=None):
+        members = [member for member, score in self._sorted(key) if score <= high]
+        return members[start:start + num]
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hmget(self, key, fields):
+        return [self.hget(key, field) for field in fields]
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+    def incrby(self, key, amount):
+        self.values[key] = int(self.values.get(key, 0)) + amount
+
+    def decrby(self, key, amount):
+        self.incrby(key, -amount)
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+    def strlen(self, key):
+        return len(self.values.get(key, b""))
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
+@pytest.fixture
+def retention():
+    store = ResultRetention()
+    store._redis = FakeRedis()
+    return store
+
+
+def _result_key(task_id):
+    return f"celery-task-meta-{task_id}"
+
+
+def test_evicts_oldest_results_over_count_cap(retention, monkeypatch):
+    """测试结果数超过上限时删除最早的结果"""
+    monkeypatch.setattr(settings, "celery_result_max_count", 2)
+    redis = retention._redis
+    for task_id in ("a", "b", "c"):
+        redis.set(_result_key(task_id), b"r" * 10)
+        retention.track(task_id, _result_key)
+        time.sleep(0.001)
+
+    assert redis.get(_result_key("a")) is None
+    assert redis.get(_result_key("c")) == b"r" * 10
+    assert redis.zcard(INDEX_KEY) == 2
+    assert redis.get(TOTAL_KEY) == 20
+
+
+def test_evicts_oldest_results_over_byte_cap(retention, monkeypatch):
+    """测试结果总字节数超过上限时删除最早的结果"""
+    monkeypatch.setattr(settings, "celery_result_max_bytes", 100)
+    redis = retention._redis
+    for task_id in ("a", "b", "c"):
+        redis.set(_result_key(task_id), b"r" * 40)
+        retention.track(task_id, _result_key)
+        time.sleep(0.001)
+
+    assert redis.get(_result_key("a")) is None
+    assert redis.get(TOTAL_KEY) == 80
+    assert set(redis.hashes[SIZES_KEY]) == {"b", "c"}
+    assert retention.counters["evicted"] == 1
+
+
+def test_referenced_blob_counted_and_evicted(retention, monkeypatch):
+    """测试按引用存储的结果计入 blob 的大小，淘汰结果时一并删除 blob"""
+    monkeypatch.setattr(settings, "celery_result_max_count", 1)
+    redis = retention._redis
+    digest = "0" * 64
+    reference = bytes([1, 0, 1]) + digest.encode("ascii")
+    redis.set(blob_key(digest), b"b" * 1000)
+    redis.set(_result_key("a"), reference)
+    retention.track("a", _result_key)
+
+    assert redis.get(TOTAL_KEY) == len(reference) + 1000
+    assert redis.hashes[BLOBS_KEY] == {"a": digest}
+
+    time.sleep(0.001)
+    redis.set(_result_key("b"), b"r" * 10)
+    retention.track("b", _result_key)
+
+    assert redis.get(blob_key(digest)) is None
+    assert redis.get(_result_key("a")) is None
+    assert redis.get(TOTAL_KEY) == 10
+    assert redis.hashes[BLOBS_KEY] == {}
+
+
+def test_missing_result_is_not_tracked(retention):
+    """测试后端中没有结果（已过期或未写入）时不登记"""
+    retention.track("a", _result_key)
+    assert retention._redis.zcard(INDEX_KEY) == 0
@@ -0,0 +1,49 @@
+import json
+import os
+from app.services.rewrite_engine import PhraseMatcher, RewriteEngine, normalize_punctuation
+
+
+def test_phrase_matcher_leftmost_longest():
+    """测试多模式匹配按最左最长规则替换"""
+    matcher = PhraseMatcher({"他": "X", "她们": "Y", "们的": "Z", "他们的书": "W"})
+    assert matcher.replace("她们的他们的书他") == ("Y的WX", 3)
+
+
+def test_phrase_matcher_keeps_shorter_match_hidden_by_overlap():
+    """测试同一位置结束的较长匹配被左侧替换占用时，较短的匹配仍然生效"""
+    # 即 {"yx", "xab", "ab"} 与 "yxab"；英文短语要求词边界，这里用中文字符
+    matcher = PhraseMatcher({"甲乙": "1", "乙丙丁": "2", "丙丁": "3"})
+    assert matcher.replace("甲乙丙丁") == ("13", 2)
+    assert matcher.replace("乙丙丁") == ("2", 1)
+
+
+def test_phrase_matcher_word_boundary():
+    """测试英文短语只在词边界上替换"""
+    matcher = PhraseMatcher({"changes": "reshapes", "a lot of": "many"})
+    text, count = matcher.replace("exchanges changes, a lot of data")
+    assert text == "exchanges reshapes, many data"
+    assert count == 2
+
+
+def test_normalize_punctuation():
+    """测试中文语境下的标点规范化"""
+    assert normalize_punctuation("你好,世界!!  真的 吗?。。") == "你好，世界！真的吗？。"
+    assert normalize_punctuation("研究(2020)表明") == "研究（2020）表明"
+    assert normalize_punctuation("见文献(Smith, 2020)") == "见文献（Smith, 2020）"
+    assert normalize_punctuation("函数 f(x) 的定义(见附录") == "函数 f(x) 的定义(见附录"
+
+
+def test_engine_reloads_changed_rules(tmp_path, monkeypatch):
+    """测试规则文件修改后重新编译"""
+    import app.services.rewrite_engine as module
+    monkeypatch.setattr(module, "_RELOAD_CHECK_INTERVAL", 0.0)
+
+    rules_file = tmp_path / "academic.json"
+    rules_file.write_text(json.dumps({"phrases": {"很多": "诸多"}}), encoding="utf-8")
+    engine = RewriteEngine(rules_dir=str(tmp_path))
+    assert engine.rewrite("很多人", "academic")["text"] == "诸多人"
+
+    rules_file.write_text(json.dumps({"phrases": {"很多": "许多"}}), encoding="utf-8")
+    stat = os.stat(rules_file)
+    os.utime(rules_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert engine.rewrite("很多人", "academic")["text"] == "许多人"
@@ -0,0 +1,167 @@
+import asyncio
+import time
+import pytest
+from app.core.config import settings
+from app.services.scheduler import (
+    BACKGROUND, BATCH, INTERACTIVE, FairScheduler, QueueTimeout
+)
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(settings, "scheduler_enabled", True)
+    monkeypatch.setattr(settings, "scheduler_max_in_flight", 1)
+    monkeypatch.setattr(settings, "scheduler_max_in_flight_bytes", 1024)
+    monkeypatch.setattr(settings, "scheduler_interactive_reserve", 0)
+    return FairScheduler()
+
+
+async def _run_in_order(scheduler, submissions):
+    """占住唯一配额后依次提交请求，释放后记录放行顺序"""
+    order = []
+
+    async def job(name, priority, client_id, size=1):
+        async with scheduler.slot(priority, client_id, size):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async with scheduler.slot(INTERACTIVE, "holder", 1):
+        tasks = []
+        for submission in submissions:
+            tasks.append(asyncio.create_task(job(*submission)))
+            await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_higher_priority_is_admitted_first(scheduler):
+    """测试高优先级请求先于先到的低优先级请求放行"""
+    order = asyncio.run(_run_in_order(scheduler, [
+        ("bg", BACKGROUND, "a"),
+        ("batch", BATCH, "a"),
+        ("interactive", INTERACTIVE, "a")
+    ]))
+    assert order == ["interactive", "batch", "bg"]
+
+
+def test_clients_take_turns_within_a_class(scheduler):
+    """测试同一优先级内按客户端轮转"""
+    order = asyncio.run(_run_in_order(scheduler, [
+        ("a1", BATCH, "a"),
+        ("a2", BATCH, "a"),
+        ("a3", BATCH, "a"),
+        ("b1", BATCH, "b")
+    ]))
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_queue_deadline_raises_queue_timeout(scheduler, monkeypatch):
+    """测试排队超过期限时抛出 QueueTimeout 并移出队列"""
+    monkeypatch.setattr(settings, "scheduler_deadline_batch", 0.05)
+
+    async def scenario():
+        async with scheduler.slot(INTERACTIVE, "holder", 1):
+            with pytest.raises(QueueTimeout):
+                async with scheduler.slot(BATCH, "a", 1):
+                    pass
+            assert scheduler.queue_depth(BATCH) == 0
+        assert scheduler.in_flight == 0
+
+    asyncio.run(scenario())
+    assert scheduler.stats()["classes"][BATCH]["timed_out"] == 1
+
+
+def test_byte_cap_and_interactive_reserve(scheduler, monkeypatch):
+    """测试字节上限和只留给交互请求的配额"""
+    monkeypatch.setattr(settings, "scheduler_max_in_flight", 3)
+    monkeypatch.setattr(settings, "scheduler_interactive_reserve", 1)
+
+    async def scenario():
+        await scheduler.acquire(BATCH, "a", 600)
+        # 字节数超出上限，即使请求数有空余也要排队
+        waiting = asyncio.create_task(scheduler.acquire(BATCH, "b", 600))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+
+        scheduler._release(600)
+        await waiting
+        await scheduler.acquire(BATCH, "c", 10)
+        assert scheduler.in_flight == 2
+
+        # 剩余的一个配额只留给交互请求
+        background = asyncio.create_task(scheduler.acquire(BACKGROUND, "d", 10))
+        await asyncio.sleep(0)
+        assert not background.done()
+        await scheduler.acquire(INTERACTIVE, "e", 10)
+        assert scheduler.in_flight == 3
+        background.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_lane_capacity_is_scheduled_by_priority(scheduler, monkeypatch):
+    """测试通道已满时按优先级放行，且不阻塞其他通道的请求"""
+    from app.services.model_router import ModelLane
+
+    monkeypatch.setattr(settings, "scheduler_max_in_flight", 8)
+    reasoning = ModelLane("reasoning", "推理通道", "r1", 1)
+    fast = ModelLane("fast", "快速通道", "v3", 1)
+    order = []
+
+    async def job(name, priority, lane):
+        async with scheduler.slot(priority, name, 1, lane):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        async with scheduler.slot(BATCH, "holder", 1, reasoning):
+            tasks = [asyncio.create_task(job(f"batch{i}", BATCH, reasoning)) for i in range(3)]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(job("interactive", INTERACTIVE, reasoning)))
+            tasks.append(asyncio.create_task(job("fast", BACKGROUND, fast)))
+            await asyncio.sleep(0)
+            # 推理通道已满，快速通道的后台请求不受影响
+            assert order == ["fast"]
+            assert reasoning.in_flight == 1
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert order[:2] == ["fast", "interactive"]
+    assert reasoning.in_flight == 0 and fast.in_flight == 0
+
+
+def test_interactive_request_overtakes_queued_batch_in_same_lane(monkeypatch):
+    """测试同一通道排满批量请求时，交互请求在下一个空出的通道配额上执行"""
+    from app.services.deepseek_processor import deepseek_processor
+    from app.services.model_router import REASONING_LANE, model_router
+
+    monkeypatch.setattr(settings, "scheduler_enabled", True)
+    monkeypatch.setattr(settings, "scheduler_max_in_flight", 8)
+    monkeypatch.setattr(settings, "scheduler_interactive_reserve", 2)
+    monkeypatch.setattr(model_router.lanes[REASONING_LANE], "concurrency", 2)
+    monkeypatch.setattr(deepseek_processor, "api_key", "test-key-123456789")
+
+    async def fake_call(text, style, context, max_tokens, model_id=None, base_url=None):
+        await asyncio.sleep(0.1)
+        return {"text": text, "reasoning": "", "ai_score": 0.1}
+
+    monkeypatch.setattr(deepseek_processor, "_call_ark_api", fake_call)
+
+    async def scenario():
+        batch = [
+            asyncio.create_task(deepseek_processor.process_text(
+                f"批量文本{i}", use_cache=False, preference="quality", priority=BATCH, client_id="bulk"
+            ))
+            for i in range(6)
+        ]
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await deepseek_processor.process_text(
+            "交互文本", use_cache=False, preference="quality", client_id="user"
+        )
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*batch)
+        return elapsed
+
+    # 先进先出时需要等待三轮批量请求（约 0.4s）
+    assert asyncio.run(scenario()) < 0.25
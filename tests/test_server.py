@@ -0,0 +1,38 @@
+import asyncio
+from app.core.config import settings
+from app.server import build_options
+from app.services.upstream_client import UpstreamClient
+from benchmarks.mock_ark import MockArkServer, MockConfig
+
+
+def test_build_options(monkeypatch):
+    """测试生产服务参数：多 worker，开发模式下改为单进程热重载"""
+    options = build_options(port=9000, workers=3)
+    assert options["port"] == 9000
+    assert options["workers"] == 3
+    assert options["loop"] in ("uvloop", "asyncio")
+    assert options["http"] in ("httptools", "h11")
+
+    monkeypatch.setattr(settings, "debug", True)
+    options = build_options()
+    assert options["reload"] is True
+    assert "workers" not in options
+
+
+def test_upstream_warm_up_opens_connections():
+    """测试预热后连接池中已有空闲的上游连接"""
+    async def main(base_url):
+        client = UpstreamClient()
+        await client.start()
+        try:
+            result = await client.warm_up(base_url, connections=3, timeout=5.0)
+            return result, client.stats()
+        finally:
+            await client.close()
+
+    with MockArkServer(MockConfig()) as mock:
+        result, stats = asyncio.run(main(mock.base_url))
+
+    assert result["resolved"] >= 1
+    assert result["errors"] == 0
+    assert stats["idle_connections"] == result["connections"] >= 1
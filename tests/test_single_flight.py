@@ -0,0 +1,56 @@
+import asyncio
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    """测试相同键的并发调用只执行一次"""
+    flights = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"text": "done"}
+
+    async def main():
+        return await asyncio.gather(*[flights.do("same-key", work) for _ in range(5)])
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert all(result == {"text": "done"} for result, _ in results)
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert flights.stats()["coalesced"] == 4
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_does_not_cancel_others():
+    """测试单个等待者取消不影响其他等待者，全部取消时才取消上游调用"""
+    flights = SingleFlight()
+
+    async def main():
+        started = asyncio.Event()
+
+        async def work():
+            started.set()
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        first = asyncio.create_task(flights.do("key", work))
+        second = asyncio.create_task(flights.do("key", work))
+        await started.wait()
+
+        first.cancel()
+        result, shared = await second
+        assert result == "ok" and shared
+        assert first.cancelled()
+
+        # 所有等待者都离开时取消共享调用
+        lonely = asyncio.create_task(flights.do("other", work))
+        await asyncio.sleep(0.01)
+        lonely.cancel()
+        await asyncio.sleep(0)
+        assert flights.stats()["abandoned"] == 1
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(main())
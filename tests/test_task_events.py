@@ -0,0 +1,121 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.v1 import endpoints
+from app.core.config import settings
+from app.services.task_events import TaskEventHub
+
+
+def test_hub_fans_out_to_task_subscribers():
+    """测试共享订阅器把事件分发给同一任务的所有订阅者"""
+    hub = TaskEventHub()
+
+    async def main():
+        async with hub.subscribe("task-1") as first, hub.subscribe("task-1") as second:
+            async with hub.subscribe("task-2") as other:
+                hub._dispatch("task-1", json.dumps({"task_id": "task-1", "status": "progress"}))
+                assert (await first.get())["status"] == "progress"
+                assert (await second.get())["status"] == "progress"
+                assert other.empty()
+                assert hub.stats()["subscribed_tasks"] == 2
+        await hub.close()
+
+    asyncio.run(main())
+    assert hub.stats()["subscribers"] == 0
+
+
+def test_task_events_fall_back_to_polling(monkeypatch):
+    """测试订阅不可用时事件流退回轮询，任务结束后推送结果并关闭"""
+    states = iter([
+        {"task_id": "abc", "status": "pending", "message": "任务等待中"},
+        {"task_id": "abc", "status": "pending", "message": "任务等待中"},
+        {"task_id": "abc", "status": "completed", "result": {"status": "completed"}},
+    ])
+    monkeypatch.setattr(endpoints, "_task_status", lambda task_id: next(states))
+    monkeypatch.setattr(settings, "task_events_poll_interval", 0.01)
+
+    with TestClient(app) as client:
+        with client.stream("GET", "/api/v1/task/abc/events") as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            body = "".join(response.iter_text())
+
+    events = [line[len("event: "):] for line in body.splitlines() if line.startswith("event: ")]
+    assert events == ["pending", "completed"]
+    assert ": keep-alive" in body
+
+
+def test_task_events_close_for_unknown_task(monkeypatch):
+    """测试一直为 pending 且没有进度记录的任务在期限后推送 not_found 并关闭"""
+    monkeypatch.setattr(
+        endpoints, "_task_status",
+        lambda task_id: {"task_id": task_id, "status": "pending", "message": "任务等待中"}
+    )
+    monkeypatch.setattr(endpoints.task_progress_store, "get", lambda task_id: None)
+    monkeypatch.setattr(settings, "task_events_poll_interval", 0.01)
+    monkeypatch.setattr(settings, "task_events_pending_timeout", 0.05)
+
+    with TestClient(app) as client:
+        with client.stream("GET", "/api/v1/task/missing/events") as response:
+            body = "".join(response.iter_text())
+
+    events = [line[len("event: "):] for line in body.splitlines() if line.startswith("event: ")]
+    assert events == ["pending", "not_found"]
+
+
+def test_publish_async_runs_off_the_event_loop(monkeypatch):
+    """测试 publish_async 在线程池中执行同步的 Redis 发布"""
+    import threading
+    from app.services.task_events import TaskEventPublisher
+
+    published = []
+
+    class FakeRedis:
+        def publish(self, channel, message):
+            published.append((channel, json.loads(message), threading.current_thread()))
+
+    publisher = TaskEventPublisher()
+    monkeypatch.setattr(publisher, "_get_redis", lambda: FakeRedis())
+
+    assert asyncio.run(publisher.publish_async("t1", "progress", completed=1, total=2))
+    channel, event, thread = published[0]
+    assert channel == "task-events:t1"
+    assert event == {"task_id": "t1", "status": "progress", "completed": 1, "total": 2}
+    assert thread is not threading.main_thread()
+
+
+def test_publisher_without_redis_package(monkeypatch):
+    """测试未安装 redis 时发布直接跳过"""
+    import sys
+    from app.services.task_events import TaskEventPublisher
+
+    monkeypatch.setitem(sys.modules, "redis", None)
+    publisher = TaskEventPublisher()
+    assert publisher.publish("t1", "started") is False
+    assert publisher.publish("t1", "started") is False
+
+
+def test_task_events_repoll_when_terminal_event_is_lost(monkeypatch):
+    """测试订阅可用但结束事件丢失时，定期查询结果后端并在任务结束后关闭"""
+    states = iter([
+        {"task_id": "abc", "status": "processing"},
+        {"task_id": "abc", "status": "processing"},
+        {"task_id": "abc", "status": "failed", "error": "ChordError"},
+    ])
+    monkeypatch.setattr(endpoints, "_task_status", lambda task_id: next(states))
+    monkeypatch.setattr(TaskEventHub, "connected", property(lambda self: True))
+
+    async def started(self):
+        return True
+
+    monkeypatch.setattr(TaskEventHub, "_ensure_started", started)
+    monkeypatch.setattr(settings, "task_events_heartbeat", 0.01)
+    monkeypatch.setattr(settings, "task_events_repoll_heartbeats", 1)
+
+    with TestClient(app) as client:
+        with client.stream("GET", "/api/v1/task/abc/events") as response:
+            body = "".join(response.iter_text())
+
+    events = [line[len("event: "):] for line in body.splitlines() if line.startswith("event: ")]
+    assert events == ["processing", "failed"]
@@ -0,0 +1,118 @@
+import pytest
+from kombu import serialization
+from app.core.config import settings
+from app.services import task_serializer
+from app.services.task_serializer import (
+    RESULT_SERIALIZER_NAME,
+    SERIALIZER_NAME,
+    dumps,
+    loads,
+    reference_digest,
+    register_compact_serializer
+)
+
+LARGE_TEXT = "人工智能技术在学术写作中的应用越来越广泛。" * 5000
+
+
+class _BlobDict(dict):
+    def __init__(self):
+        super().__init__()
+        self.ttls = {}
+
+
+@pytest.fixture
+def blobs(monkeypatch):
+    """用字典代替 Redis blob 存储，ttls 记录每个 blob 的过期时间"""
+    stored = _BlobDict()
+
+    def put(data, ttl):
+        digest = f"{len(stored):064d}"
+        stored[digest] = data
+        stored.ttls[digest] = ttl
+        return digest
+
+    monkeypatch.setattr(task_serializer.blob_store, "put", put)
+    monkeypatch.setattr(task_serializer.blob_store, "get", lambda digest: stored[digest])
+    return stored
+
+
+def test_small_and_compressible_bodies_roundtrip(blobs):
+    """测试小消息体原样内联，较大的消息体压缩后内联"""
+    small = [["短文本", "user-1"], {"style": "academic"}, {"callbacks": None}]
+    assert loads(dumps(small)) == small
+
+    body = {"text": "重复的正文。" * 500, "ai_score": 0.2}
+    encoded = dumps(body)
+    assert len(encoded) < len(body["text"].encode("utf-8")) / 5
+    assert loads(encoded) == body
+    assert blobs == {}
+
+
+def test_large_body_travels_by_reference(blobs, monkeypatch):
+    """测试压缩后仍超过内联上限的消息体存入 blob 存储，消息中只有引用"""
+    monkeypatch.setattr(settings, "celery_payload_inline_max_bytes", 256)
+    body = {"text": LARGE_TEXT}
+    encoded = dumps(body)
+
+    assert len(blobs) == 1
+    assert len(encoded) < 100
+    assert loads(encoded) == body
+    assert reference_digest(encoded) in blobs
+    assert reference_digest(dumps({"text": "短文本"})) is None
+
+
+def test_result_blobs_expire_with_results(blobs, monkeypatch):
+    """测试结果序列化器写入的 blob 过期时间不超过 celery_result_expires"""
+    register_compact_serializer()
+    monkeypatch.setattr(settings, "celery_payload_inline_max_bytes", 256)
+    monkeypatch.setattr(settings, "celery_result_expires", 600)
+    body = {"text": LARGE_TEXT}
+
+    _, _, data = serialization.dumps(body, serializer=RESULT_SERIALIZER_NAME)
+    assert blobs.ttls[reference_digest(data)] == 600
+    assert serialization.loads(data, "application/x-ai-processor-compact-result", "binary") == body
+
+    _, _, data = serialization.dumps({"text": LARGE_TEXT + "。"}, serializer=SERIALIZER_NAME)
+    assert blobs.ttls[reference_digest(data)] == settings.celery_blob_ttl
+
+
+def test_blob_store_unavailable_falls_back_to_inline(monkeypatch):
+    """测试 blob 存储不可用时内联传输"""
+    monkeypatch.setattr(task_serializer.blob_store, "put", lambda data, ttl: None)
+    monkeypatch.setattr(settings, "celery_payload_inline_max_bytes", 16)
+    body = {"text": "重复的正文。" * 500}
+    assert loads(dumps(body)) == body
+
+
+def test_oversized_body_is_rejected(monkeypatch):
+    """测试压缩后超过上限的消息体拒绝编码"""
+    monkeypatch.setattr(settings, "celery_payload_max_bytes", 32)
+    with pytest.raises(ValueError):
+        dumps({"text": LARGE_TEXT})
+
+
+def test_json_fallback_without_msgpack(monkeypatch):
+    """测试未安装 msgpack 时使用 JSON 编码"""
+    monkeypatch.setattr(task_serializer, "msgpack", None)
+    body = [["文本"], {"style": "formal"}, {}]
+    assert loads(dumps(body)) == body
+
+
+def test_registered_with_kombu():
+    """测试通过 kombu 注册表编码和解码"""
+    register_compact_serializer()
+    body = {"status": "completed", "result": {"text": "润色结果"}}
+    content_type, content_encoding, data = serialization.dumps(body, serializer=SERIALIZER_NAME)
+    assert content_encoding == "binary"
+    assert serialization.loads(
+        data, content_type, content_encoding, accept=[content_type]
+    ) == body
+
+
+def test_backend_reads_results_written_as_json():
+    """测试切换序列化前以 JSON 写入的结果仍可通过结果后端读取"""
+    from app.services.celery_app import celery_app
+
+    meta = celery_app.backend.decode(b'{"status": "SUCCESS", "result": {"status": "completed"}}')
+    assert meta == {"status": "SUCCESS", "result": {"status": "completed"}}
+    assert celery_app.backend.decode(celery_app.backend.encode(meta)) == meta
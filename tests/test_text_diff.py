@@ -0,0 +1,42 @@
+import random
+from app.utils.text_diff import apply_edits, diff_text
+
+
+def test_diff_cjk_and_latin():
+    """测试中文按字、英文按词生成编辑操作"""
+    original = "人工智能技术在学术写作中的应用越来越广泛。"
+    processed = "人工智能技术在学术写作领域的应用日益广泛。"
+    result = diff_text(original, processed)
+    assert result["edits"] == [
+        {"op": "replace", "start": 11, "end": 12, "text": "领域"},
+        {"op": "replace", "start": 15, "end": 18, "text": "日益"}
+    ]
+    assert result["stats"]["unchanged_chars"] == len(original) - 4
+    assert result["stats"]["exact"] is True
+
+    result = diff_text("The quick brown fox.", "The quick red fox.")
+    assert result["edits"] == [{"op": "replace", "start": 10, "end": 15, "text": "red"}]
+
+    assert diff_text("相同", "相同")["edits"] == []
+    assert diff_text("", "新增")["edits"] == [{"op": "insert", "start": 0, "end": 0, "text": "新增"}]
+
+
+def test_diff_roundtrip_random_edits():
+    """测试随机编辑后应用编辑操作可还原润色结果，超过代价上限时退化为整段替换"""
+    rng = random.Random(7)
+    alphabet = "人工智能技术在学术写作中的应用研究。，ab cd"
+    for _ in range(300):
+        original = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 50)))
+        chars = list(original)
+        for _ in range(rng.randint(0, 8)):
+            position = rng.randint(0, len(chars))
+            if rng.random() < 0.5:
+                chars.insert(position, rng.choice(alphabet))
+            elif chars:
+                chars.pop(min(position, len(chars) - 1))
+        processed = "".join(chars)
+
+        assert apply_edits(original, diff_text(original, processed)["edits"]) == processed
+        capped = diff_text(original, processed, max_cost=2)
+        assert apply_edits(original, capped["edits"]) == processed
+        assert len(capped["edits"]) <= 1 or capped["stats"]["exact"]
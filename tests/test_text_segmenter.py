@@ -0,0 +1,49 @@
+from app.utils.text_segmenter import chunk_text, split_paragraphs, split_sentences
+
+
+def test_split_sentences_mixed_language():
+    """测试中英文句末标点切分，小数点不断句"""
+    sentences = split_sentences("结果为3.14。效果显著！Is it true? Yes.")
+    assert [s.strip() for s in sentences] == ["结果为3.14。", "效果显著！", "Is it true?", "Yes."]
+
+
+def test_split_paragraphs_roundtrip():
+    """测试段落切分保留分隔符"""
+    text = "第一段。\n\n第二段。\n第三段。"
+    assert "".join(sep + para for sep, para in split_paragraphs(text)) == text
+
+
+def test_chunk_text_budget_and_order():
+    """测试分段不超过预算、带有上文且可按顺序还原"""
+    text = "\n\n".join("这是第%d段，包含一些用于测试的内容。它还有第二句话！" % i for i in range(20))
+    chunks = chunk_text(text, max_tokens=40, overlap_sentences=1)
+
+    assert len(chunks) > 1
+    assert all(chunk.estimated_tokens <= 40 for chunk in chunks)
+    assert chunks[0].context == ""
+    assert all(chunk.context for chunk in chunks[1:])
+
+    rebuilt = "".join((c.separator if c.index else "") + c.text for c in chunks)
+    assert rebuilt == text
+
+
+def test_chunk_text_keeps_surrounding_whitespace():
+    """测试开头、段落末尾和结尾的空白都能还原"""
+    text = "\n  第一段。第一段第二句。  \n\n第二段。\n\n\n第三段！ \n\n"
+    chunks = chunk_text(text, max_tokens=8, overlap_sentences=0)
+
+    assert len(chunks) > 1
+    rebuilt = "".join(c.separator + c.text for c in chunks) + chunks[-1].trailing
+    assert rebuilt == text
+
+
+def test_hard_split_respects_token_budget():
+    """测试超长句子按 token 数硬切，字符密度不均匀时每片也不超过预算"""
+    from app.utils.token_estimator import estimate_tokens
+
+    text = "a" * 200 + "，" * 50 + "b" * 100
+    chunks = chunk_text(text, max_tokens=20, overlap_sentences=0)
+
+    assert all(estimate_tokens(c.text) <= 20 for c in chunks)
+    assert all(c.estimated_tokens <= 20 for c in chunks)
+    assert "".join(c.separator + c.text for c in chunks) + chunks[-1].trailing == text
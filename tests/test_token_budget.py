@@ -0,0 +1,56 @@
+import pytest
+from app.core.config import settings
+from app.services.token_budget import ContextBudgetExceeded, plan_budget
+from app.utils.token_estimator import estimate_tokens
+
+
+def test_estimate_tokens_mixed_text():
+    """测试中英混排文本的 token 估算"""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("人工智能") == 3  # 4 × 0.6 向上取整
+    assert estimate_tokens("hello") == 2  # 5 × 0.3 向上取整
+    # 中文按字计，英文按字母计，同等字符数下中文 token 更多
+    assert estimate_tokens("人工智能" * 100) > estimate_tokens("abcd" * 100)
+    long_text = "人工智能技术在学术写作中的应用。" * 1000
+    assert estimate_tokens(long_text) == estimate_tokens(long_text)
+
+def test_plan_budget_scales_with_input_and_style():
+    """测试 max_tokens 随输入长度和风格变化，并受上下限约束"""
+    short = plan_budget("你好。", "academic")
+    assert short.max_tokens == settings.output_tokens_min
+
+    text = "人工智能技术在学术写作中的应用越来越广泛。" * 50
+    academic = plan_budget(text, "academic")
+    creative = plan_budget(text, "creative")
+    assert short.max_tokens < academic.max_tokens < creative.max_tokens <= settings.output_tokens_max
+    assert academic.total == academic.input_tokens + academic.max_tokens
+    assert plan_budget(text, "academic", context="上文。").input_tokens > academic.input_tokens
+
+def test_plan_budget_rejects_oversized_input(monkeypatch):
+    """测试超出输出上限或模型上下文时拒绝"""
+    text = "人工智能技术在学术写作中的应用越来越广泛。" * 50
+
+    monkeypatch.setattr(settings, "output_tokens_max", 300)
+    with pytest.raises(ContextBudgetExceeded):
+        plan_budget(text)
+
+    monkeypatch.setattr(settings, "output_tokens_max", 8192)
+    monkeypatch.setattr(settings, "model_context_tokens", 1000)
+    with pytest.raises(ContextBudgetExceeded) as exc_info:
+        plan_budget(text)
+    assert exc_info.value.budget.total > 1000
+
+
+def test_stream_rejects_oversized_input_before_any_event(monkeypatch):
+    """测试流式处理与 process_text 一样直接拒绝超出上限的输入，而不是降级"""
+    import asyncio
+    from app.services.deepseek_processor import deepseek_processor
+
+    monkeypatch.setattr(settings, "output_tokens_max", 300)
+    text = "人工智能技术在学术写作中的应用越来越广泛。" * 50
+
+    async def first_event():
+        return await deepseek_processor.stream_text(text).__anext__()
+
+    with pytest.raises(ContextBudgetExceeded):
+        asyncio.run(first_event())
@@ -0,0 +1,55 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.services.worker_runtime import WorkerRuntime
+
+
+def test_tasks_share_one_persistent_loop():
+    """测试多次任务在同一个常驻事件循环中执行"""
+    runtime = WorkerRuntime()
+
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    try:
+        first = runtime.run(current_loop())
+        second = runtime.run(current_loop())
+        assert first is second
+        assert runtime.stats()["running"]
+        assert runtime.stats()["tasks_total"] == 2
+    finally:
+        runtime.stop()
+    assert not runtime.is_running
+
+
+def test_concurrent_tasks_overlap_in_loop():
+    """测试多个任务线程提交的协程在循环中并发执行"""
+    runtime = WorkerRuntime()
+
+    async def wait():
+        await asyncio.sleep(0.2)
+        return True
+
+    try:
+        runtime.start()
+        start_time = time.monotonic()
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            results = list(pool.map(lambda _: runtime.run(wait()), range(5)))
+        assert all(results)
+        assert time.monotonic() - start_time < 0.6
+    finally:
+        runtime.stop()
+
+
+def test_long_text_task_uses_runtime():
+    """测试长文本任务通过 worker 运行时执行"""
+    from app.services.celery_app import long_text_processing
+    from app.services.worker_runtime import worker_runtime
+
+    try:
+        result = long_text_processing("首先，这个方法非常重要。其次，它很好用。", "user-1")
+        assert result["status"] == "completed"
+        assert result["result"]["text"]
+        assert worker_runtime.stats()["tasks_total"] >= 1
+    finally:
+        worker_runtime.stop()